@@ -0,0 +1,381 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Arc fitting of G1 line segment runs
+#
+# CAM output for surfacing is mostly short G1 moves that follow arcs.
+# fit_file() copies a program, replacing runs of at least MIN_ARC_SEGMENTS
+# plain XY G1 moves (same Z and feed, absolute, G17, nothing else on the
+# line) with G2/G3 moves whose arc passes within the tolerance of every
+# original point and segment.  The tolerance is in machine units, inches,
+# and is scaled to millimeters under G21; until the program sets its units
+# it is taken as it is, the tighter of the two.  Nothing is fitted under
+# G93, where each move's F is its own time.  Arc centers are written relative
+# to the arc start, or absolute under G90.1.  Anything it does not understand ends the
+# current run and is copied as it is, so the result runs the same path
+# with far fewer lines.
+#
+# The fitted program is kept in a preview_cache keyed by the source's
+# content and the tolerance; fit_job makes it in a worker process so a
+# large program never holds up the GTK thread.
+#
+
+import os
+import sys
+import math
+import tempfile
+import traceback
+import multiprocessing
+import glib
+import gcode_search
+import preview_cache
+
+
+# bump when the output changes, part of the cache key
+FIT_FORMAT = 3
+
+MIN_ARC_SEGMENTS = 3
+MAX_ARC_SEGMENTS = 256
+
+# near-straight runs give huge, badly conditioned arcs, leave those as lines
+MAX_RADIUS = 1000.0
+
+# at most a half circle per arc
+MAX_SWEEP = math.pi
+
+# words a line in a run may hold
+RUN_WORDS = frozenset('NXYZF')
+
+FIT_POLL_MS = 250
+
+
+def _circle(a, b, c):
+    # center and radius of the circle through three points, None if they are in line
+    d = 2.0 * (a[0] * (b[1] - c[1]) + b[0] * (c[1] - a[1]) + c[0] * (a[1] - b[1]))
+    if abs(d) < 1e-12:
+        return None
+    a2 = a[0] * a[0] + a[1] * a[1]
+    b2 = b[0] * b[0] + b[1] * b[1]
+    c2 = c[0] * c[0] + c[1] * c[1]
+    cx = (a2 * (b[1] - c[1]) + b2 * (c[1] - a[1]) + c2 * (a[1] - b[1])) / d
+    cy = (a2 * (c[0] - b[0]) + b2 * (a[0] - c[0]) + c2 * (b[0] - a[0])) / d
+    return (cx, cy), math.hypot(a[0] - cx, a[1] - cy)
+
+
+def fit_arc(points, first, last, tolerance):
+    # (center, clockwise) if points[first..last] lie on one arc within tolerance, else None
+    found = _circle(points[first], points[(first + last) // 2], points[last])
+    if found is None:
+        return None
+    (cx, cy), radius = found
+    if radius > MAX_RADIUS:
+        return None
+    sweep = 0.0
+    direction = 0
+    previous_angle = math.atan2(points[first][1] - cy, points[first][0] - cx)
+    for ix in xrange(first + 1, last + 1):
+        x, y = points[ix]
+        if abs(math.hypot(x - cx, y - cy) - radius) > tolerance:
+            return None
+        # the chord of each original segment must stay within tolerance of the arc too
+        half_chord = math.hypot(x - points[ix - 1][0], y - points[ix - 1][1]) / 2.0
+        if half_chord >= radius or radius - math.sqrt(radius * radius - half_chord * half_chord) > tolerance:
+            return None
+        angle = math.atan2(y - cy, x - cx)
+        step = angle - previous_angle
+        if step > math.pi:
+            step -= 2 * math.pi
+        elif step < -math.pi:
+            step += 2 * math.pi
+        step_direction = 1 if step > 0 else -1
+        if step == 0 or (direction and step_direction != direction):
+            return None
+        direction = step_direction
+        sweep += abs(step)
+        if sweep > MAX_SWEEP:
+            return None
+        previous_angle = angle
+    return (cx, cy), direction < 0
+
+
+class fit_stats:
+    def __init__(self):
+        self.lines_in = 0
+        self.lines_out = 0
+        self.arcs = 0
+
+
+class _fitter:
+    def __init__(self, out, tolerance, stats):
+        self.out = out
+        # inches, self.tolerance is in the program's units
+        self.machine_tolerance = tolerance
+        self.tolerance = tolerance
+        self.inverse_time = False
+        self.stats = stats
+        self.motion = None
+        self.absolute = True
+        # G90.1, arc centers in absolute coordinates
+        self.arc_absolute = False
+        self.xy_plane = True
+        self.position = [None, None, None]
+        self.feed = None
+        # the run: start point, then (point, original line) per move
+        self.run_points = []
+        self.run_lines = []
+        self.run_z = None
+        # G2/G3 written since the program last set G1 itself
+        self.motion_changed = False
+
+    def write(self, text):
+        self.out.write(text + '\n')
+        self.stats.lines_out += 1
+
+    def copy(self, text):
+        if self.motion_changed:
+            # the program relies on G1 being modal, put it back
+            self.write('G1')
+            self.motion_changed = False
+        self.write(text)
+
+    def line(self, text):
+        self.stats.lines_in += 1
+        code = gcode_search.COMMENT_RE.sub('', text).upper().strip()
+        if '#' in code or '[' in code or code.startswith(('/', 'O')):
+            # expressions, block delete, O-words: the position is only known again once programmed
+            self.flush()
+            self.position = [None, None, None]
+            self.motion = None
+            self.copy(text)
+            return
+        words = [(letter, float(number)) for letter, number in gcode_search.WORD_RE.findall(code)]
+        # lines with comments are kept as they are
+        if code == text.upper().strip() and self.run_candidate(text, words):
+            return
+        self.flush()
+        self.track(words)
+        self.copy(text)
+
+    def run_candidate(self, text, words):
+        letters = [letter for letter, value in words]
+        g_words = [value for letter, value in words if letter == 'G']
+        if g_words not in ([], [1.0]):
+            return False
+        if not set(l for l in letters if l != 'G') <= RUN_WORDS or len(set(letters)) != len(letters):
+            return False
+        if not g_words and self.motion != 1:
+            return False
+        if not (self.absolute and self.xy_plane) or self.inverse_time or None in self.position:
+            return False
+        values = dict(words)
+        if 'X' not in values and 'Y' not in values:
+            return False
+        z = values.get('Z', self.position[2])
+        feed = values.get('F', self.feed)
+        if self.run_points and (z != self.run_z or feed != self.feed):
+            self.flush()
+        if z != self.position[2]:
+            # a move in Z starts a run at its end point, it is not part of one
+            return False
+        if not self.run_points:
+            self.run_points = [(self.position[0], self.position[1])]
+            self.run_z = z
+        self.feed = feed
+        self.motion = 1
+        point = (values.get('X', self.position[0]), values.get('Y', self.position[1]))
+        self.position[0], self.position[1] = point
+        self.run_points.append(point)
+        self.run_lines.append((text, 'F' in values))
+        if len(self.run_lines) >= MAX_ARC_SEGMENTS * 4:
+            self.flush()
+        return True
+
+    def track(self, words):
+        # modal state and position from a line copied as it is
+        values = {}
+        machine_coords = False
+        for letter, value in words:
+            if letter == 'G':
+                if value in (0.0, 1.0, 2.0, 3.0):
+                    self.motion = int(value)
+                    # the line sets its own motion mode, no G1 needs restoring before it
+                    self.motion_changed = False
+                elif value == 90.0:
+                    self.absolute = True
+                elif value == 91.0:
+                    self.absolute = False
+                elif value == 90.1:
+                    self.arc_absolute = True
+                elif value == 91.1:
+                    self.arc_absolute = False
+                elif value == 20.0:
+                    self.tolerance = self.machine_tolerance
+                elif value == 21.0:
+                    self.tolerance = self.machine_tolerance * 25.4
+                elif value == 93.0:
+                    self.inverse_time = True
+                elif value in (94.0, 95.0):
+                    self.inverse_time = False
+                elif value == 17.0:
+                    self.xy_plane = True
+                elif value in (18.0, 19.0):
+                    self.xy_plane = False
+                elif value == 53.0:
+                    machine_coords = True
+                elif value in (28.0, 30.0, 92.0, 10.0) or 38.0 <= value < 39.0:
+                    # stored positions, offset changes and probing
+                    self.position = [None, None, None]
+                elif 73.0 <= value <= 89.0:
+                    # canned cycles
+                    self.position = [None, None, None]
+                    self.motion = None
+            else:
+                values[letter] = value
+        if 'F' in values:
+            self.feed = values['F']
+        if machine_coords or not self.absolute:
+            if any(letter in values for letter in 'XYZ'):
+                self.position = [None, None, None]
+            return
+        for axis, letter in enumerate('XYZ'):
+            if letter in values:
+                self.position[axis] = values[letter]
+
+    def flush(self):
+        points = self.run_points
+        lines = self.run_lines
+        self.run_points = []
+        self.run_lines = []
+        ix = 0
+        count = len(lines)
+        while ix < count:
+            end = self.longest_arc(points, ix, count)
+            if end is None:
+                self.copy(lines[ix][0])
+                ix += 1
+                continue
+            center, clockwise = fit_arc(points, ix, end, self.tolerance)
+            start = points[ix]
+            x, y = points[end]
+            if self.arc_absolute:
+                i, j = center
+            else:
+                i, j = center[0] - start[0], center[1] - start[1]
+            arc = '%s X%.4f Y%.4f I%.4f J%.4f' % ('G2' if clockwise else 'G3', x, y, i, j)
+            if any(has_feed for text, has_feed in lines[ix:end]):
+                # keep a feed change made in the lines the arc replaces
+                arc += ' F%s' % ('%.4f' % self.feed).rstrip('0').rstrip('.')
+            self.write(arc)
+            self.motion_changed = True
+            self.stats.arcs += 1
+            ix = end
+
+    def longest_arc(self, points, ix, count):
+        # furthest end point index giving an arc from points[ix], None if not even the shortest fits
+        shortest = ix + MIN_ARC_SEGMENTS
+        if shortest > count or fit_arc(points, ix, shortest, self.tolerance) is None:
+            return None
+        good = shortest
+        # grow until it fails, then bisect between the last good and the first bad end
+        step = MIN_ARC_SEGMENTS
+        bad = None
+        while bad is None:
+            trial = min(good + step, count, ix + MAX_ARC_SEGMENTS)
+            if trial == good:
+                return good
+            if fit_arc(points, ix, trial, self.tolerance) is None:
+                bad = trial
+            else:
+                good = trial
+                step *= 2
+        while bad - good > 1:
+            middle = (good + bad) // 2
+            if fit_arc(points, ix, middle, self.tolerance) is None:
+                bad = middle
+            else:
+                good = middle
+        return good
+
+
+def fit_file(source, destination, tolerance):
+    stats = fit_stats()
+    with open(source, 'rb') as src:
+        with open(destination, 'wb') as out:
+            fitter = _fitter(out, tolerance, stats)
+            for text in src:
+                fitter.line(text.rstrip('\r\n'))
+            fitter.flush()
+    return stats
+
+
+def cached_path(cache, source, tolerance):
+    # (key, path) of the fitted program, path is None until it has been made
+    key = cache.key(source, (FIT_FORMAT, tolerance))
+    path = cache.path(key)
+    if not os.path.exists(path):
+        return key, None
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+    return key, path
+
+
+def _fit_worker(source, tolerance, cache, key):
+    fd, temp_path = tempfile.mkstemp(suffix=preview_cache.TEMP_SUFFIX, dir=cache.directory)
+    os.close(fd)
+    try:
+        stats = fit_file(source, temp_path, tolerance)
+        os.rename(temp_path, cache.path(key))
+        print 'arc fit %s: %d lines to %d, %d arcs' % (source, stats.lines_in, stats.lines_out, stats.arcs)
+        cache.evict()
+    except Exception:
+        traceback.print_exc(file=sys.stdout)
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        sys.exit(1)
+
+
+class fit_job:
+    def __init__(self, cache):
+        self.cache = cache
+        self.process = None
+        self.timer_id = None
+        self.on_done = None
+
+    def busy(self):
+        return self.process is not None
+
+    def start(self, source, tolerance, key, on_done):
+        # on_done(source, fitted path or None) is called on the GTK thread
+        self.cancel()
+        if not os.path.isdir(self.cache.directory):
+            os.makedirs(self.cache.directory)
+        self.on_done = lambda path: on_done(source, path)
+        self.key = key
+        self.process = multiprocessing.Process(target=_fit_worker, args=(source, tolerance, self.cache, key))
+        self.process.daemon = True
+        self.process.start()
+        self.timer_id = glib.timeout_add(FIT_POLL_MS, self._on_poll)
+
+    def cancel(self):
+        if self.timer_id is not None:
+            glib.source_remove(self.timer_id)
+            self.timer_id = None
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process.join()
+            self.process = None
+
+    def _on_poll(self):
+        if self.process.is_alive():
+            return True
+        self.process.join()
+        ok = self.process.exitcode == 0
+        self.process = None
+        self.timer_id = None
+        self.on_done(self.cache.path(self.key) if ok else None)
+        return False
@@ -0,0 +1,207 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# File change notification for the loaded program, the tool table and
+# other files the UI reloads when they are edited
+#
+# Uses inotify (through ctypes) on the directory holding each file, so
+# editors that save by writing a new file and renaming it over the old one
+# are caught too.  If inotify is not available the files are polled for
+# mtime/size changes instead.  Either way a change is only reported after
+# the content hash differs from the last one seen, so a touch or a save
+# without edits never triggers a reload.  Callbacks run on the GTK thread.
+#
+
+import os
+import sys
+import errno
+import struct
+import hashlib
+import traceback
+import ctypes
+import ctypes.util
+import glib
+
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+EVENT_HEADER = 'iIII'
+EVENT_HEADER_SIZE = struct.calcsize(EVENT_HEADER)
+
+# editors write in bursts, wait this long after the last event before hashing
+SETTLE_MS = 200
+
+# polling fallback interval
+POLL_INTERVAL_MS = 1000
+
+
+def hash_file(path):
+    sha = hashlib.sha1()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), ''):
+                sha.update(block)
+    except (IOError, OSError):
+        return None
+    return sha.hexdigest()
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size)
+
+
+class _inotify:
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+    def add_watch(self, path, mask):
+        wd = self._add_watch(self.fd, path, mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed for %s' % path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self):
+        # list of (wd, mask, name)
+        events = []
+        try:
+            buf = os.read(self.fd, 65536)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return events
+            raise
+        offset = 0
+        while offset + EVENT_HEADER_SIZE <= len(buf):
+            wd, mask, cookie, length = struct.unpack_from(EVENT_HEADER, buf, offset)
+            offset += EVENT_HEADER_SIZE
+            name = buf[offset:offset + length].rstrip('\0')
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+
+class _watched_file:
+    def __init__(self, path, callback):
+        self.path = path
+        self.callback = callback
+        self.signature = file_signature(path)
+        self.digest = hash_file(path)
+
+
+class file_watcher:
+    def __init__(self):
+        # key -> _watched_file, the key lets a subsystem swap the file it watches
+        self.files = {}
+        # directory -> inotify watch descriptor, and back
+        self.dir_watches = {}
+        self.wd_dirs = {}
+        self.pending = set()
+        self.settle_id = None
+        self.poll_id = None
+        try:
+            self.inotify = _inotify()
+            glib.io_add_watch(self.inotify.fd, glib.IO_IN, self._on_inotify)
+        except (OSError, AttributeError) as e:
+            # AttributeError: libc without inotify_init1
+            print 'file_watcher: inotify unavailable (%s), polling every %d ms' % (str(e), POLL_INTERVAL_MS)
+            self.inotify = None
+
+    def watch(self, key, path, callback):
+        # callback(path) is called after each real change to the file's content
+        self.unwatch(key)
+        path = os.path.abspath(path)
+        self.files[key] = _watched_file(path, callback)
+        if self.inotify is not None:
+            directory = os.path.dirname(path)
+            if directory not in self.dir_watches:
+                try:
+                    wd = self.inotify.add_watch(directory, WATCH_MASK)
+                    self.dir_watches[directory] = wd
+                    self.wd_dirs[wd] = directory
+                except OSError as e:
+                    print 'file_watcher: %s, falling back to polling' % str(e)
+                    self._start_polling()
+        else:
+            self._start_polling()
+
+    def unwatch(self, key):
+        watched = self.files.pop(key, None)
+        if watched is None or self.inotify is None:
+            return
+        directory = os.path.dirname(watched.path)
+        if not any(os.path.dirname(f.path) == directory for f in self.files.itervalues()):
+            wd = self.dir_watches.pop(directory, None)
+            if wd is not None:
+                del self.wd_dirs[wd]
+                self.inotify.rm_watch(wd)
+
+    def _start_polling(self):
+        if self.poll_id is None:
+            self.poll_id = glib.timeout_add(POLL_INTERVAL_MS, self._on_poll)
+
+    def _on_inotify(self, fd, condition):
+        try:
+            for wd, mask, name in self.inotify.read_events():
+                directory = self.wd_dirs.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, name)
+                for key, watched in self.files.iteritems():
+                    if watched.path == path:
+                        self.pending.add(key)
+        except Exception:
+            print 'file_watcher: exception reading inotify events'
+            traceback.print_exc(file=sys.stdout)
+        if self.pending and self.settle_id is None:
+            self.settle_id = glib.timeout_add(SETTLE_MS, self._on_settled)
+        return True
+
+    def _on_poll(self):
+        for key, watched in self.files.iteritems():
+            if file_signature(watched.path) != watched.signature:
+                self.pending.add(key)
+        self._check_pending()
+        return True
+
+    def _on_settled(self):
+        self.settle_id = None
+        self._check_pending()
+        return False
+
+    def _check_pending(self):
+        pending = self.pending
+        self.pending = set()
+        for key in pending:
+            watched = self.files.get(key)
+            if watched is None:
+                continue
+            watched.signature = file_signature(watched.path)
+            digest = hash_file(watched.path)
+            if digest is None or digest == watched.digest:
+                # gone for the moment (mid-save) or only touched
+                continue
+            watched.digest = digest
+            try:
+                watched.callback(watched.path)
+            except Exception:
+                print 'file_watcher: exception in callback for %s' % watched.path
+                traceback.print_exc(file=sys.stdout)
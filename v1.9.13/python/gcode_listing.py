@@ -0,0 +1,184 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Line index and windowed G code listing
+#
+# line_index finds the start of every line of a program in one pass over a
+# memory map of the file and keeps the offsets in a compact array, so any
+# line or range of lines can be read straight from the file.
+#
+# gcode_listing keeps only a window of the program in the source view
+# buffer, refilled around the line being run, the start line or whatever
+# the operator scrolls to.  Line numbers given to and returned from it are
+# program line numbers (1 based, like status.motion_line); buffer_line()
+# and program_line() translate to and from the buffer.  A program shorter
+# than the window is loaded whole, so buffer and program line numbers are
+# the same.
+#
+
+import mmap
+import array
+import gtk
+
+
+# lines held in the buffer at once
+WINDOW_LINES = 4000
+
+# refill when the view gets this close to either end of the window
+WINDOW_MARGIN = 500
+
+
+def decode_text(data):
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('latin-1')
+
+
+class line_index:
+    def __init__(self, path):
+        self.path = path
+        # offsets[n] is where line n (0 based) starts, the last entry is the file size
+        self.offsets = array.array('L', [0])
+        self.build()
+
+    def build(self):
+        offsets = array.array('L', [0])
+        with open(self.path, 'rb') as f:
+            f.seek(0, 2)
+            size = f.tell()
+            if size > 0:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    find = mm.find
+                    append = offsets.append
+                    pos = find('\n')
+                    while pos >= 0:
+                        append(pos + 1)
+                        pos = find('\n', pos + 1)
+                finally:
+                    mm.close()
+                if offsets[-1] != size:
+                    # last line without a newline
+                    offsets.append(size)
+        self.offsets = offsets
+
+    def line_count(self):
+        return len(self.offsets) - 1
+
+    def read_lines(self, first, last):
+        # raw bytes of lines first..last-1, 0 based
+        first = max(0, min(first, self.line_count()))
+        last = max(first, min(last, self.line_count()))
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[first])
+            return f.read(self.offsets[last] - self.offsets[first])
+
+    def line(self, line_ix):
+        return self.read_lines(line_ix, line_ix + 1).rstrip('\r\n')
+
+
+class gcode_listing:
+    def __init__(self, sourceview, buffer):
+        self.sourceview = sourceview
+        self.buffer = buffer
+        self.index = None
+        # buffer holds program lines window_start+1 .. window_end
+        self.window_start = 0
+        self.window_end = 0
+        self.refilling = False
+        self.gutter_renderer = None
+        scrolled = sourceview.get_parent()
+        if isinstance(scrolled, gtk.ScrolledWindow):
+            scrolled.get_vadjustment().connect('value-changed', self.on_scrolled)
+
+    def load(self, path):
+        self.index = line_index(path)
+        self.window_start = self.window_end = 0
+        self._set_gutter(self.index.line_count() > WINDOW_LINES)
+        self._fill(0, min(self.index.line_count(), WINDOW_LINES))
+
+    def clear(self):
+        self.index = None
+        self.window_start = self.window_end = 0
+        self._set_gutter(False)
+        self.buffer.set_text('')
+
+    def line_count(self):
+        return self.index.line_count() if self.index else 0
+
+    def windowed(self):
+        return self.line_count() > WINDOW_LINES
+
+    def program_line(self, buffer_line):
+        return buffer_line + self.window_start
+
+    def buffer_line(self, line):
+        # 0 (no line) stays 0
+        if line <= 0:
+            return line
+        return line - self.window_start
+
+    def ensure_line(self, line):
+        # make sure program line (1 based) is in the buffer, refilling around it if not
+        if self.index is None or line <= 0:
+            return
+        if self.window_start < line <= self.window_end:
+            return
+        first = max(0, line - 1 - WINDOW_LINES // 2)
+        last = min(self.index.line_count(), first + WINDOW_LINES)
+        first = max(0, last - WINDOW_LINES)
+        self._fill(first, last)
+
+    def _fill(self, first, last):
+        self.refilling = True
+        try:
+            self.buffer.set_text(decode_text(self.index.read_lines(first, last)))
+            self.window_start = first
+            self.window_end = last
+        finally:
+            self.refilling = False
+
+    def on_scrolled(self, adjustment):
+        # move the window along when the operator scrolls near either end of it
+        if self.refilling or not self.windowed():
+            return
+        rect = self.sourceview.get_visible_rect()
+        top_iter = self.sourceview.get_line_at_y(rect.y)[0]
+        bottom_iter = self.sourceview.get_line_at_y(rect.y + rect.height)[0]
+        top = self.program_line(top_iter.get_line() + 1)
+        bottom = self.program_line(bottom_iter.get_line() + 1)
+        near_start = top - self.window_start < WINDOW_MARGIN and self.window_start > 0
+        near_end = self.window_end - bottom < WINDOW_MARGIN and self.window_end < self.index.line_count()
+        if not (near_start or near_end):
+            return
+        self.window_start = self.window_end = 0
+        self.ensure_line(top)
+        # keep the same program line at the top of the view
+        self.refilling = True
+        try:
+            top_iter = self.buffer.get_iter_at_line(self.buffer_line(top) - 1)
+            self.sourceview.scroll_to_iter(top_iter, 0, True, 0, 0)
+        finally:
+            self.refilling = False
+
+    def _set_gutter(self, windowed):
+        # the built in line numbers count buffer lines, show program lines instead while windowed
+        try:
+            gutter = self.sourceview.get_gutter(gtk.TEXT_WINDOW_LEFT)
+            if windowed and self.gutter_renderer is None:
+                self.gutter_renderer = gtk.CellRendererText()
+                self.gutter_renderer.set_property('xalign', 1.0)
+                gutter.insert(self.gutter_renderer, 0)
+                gutter.set_cell_data_func(self.gutter_renderer, self._gutter_data)
+                self.sourceview.set_show_line_numbers(False)
+            elif not windowed and self.gutter_renderer is not None:
+                gutter.remove(self.gutter_renderer)
+                self.gutter_renderer = None
+                self.sourceview.set_show_line_numbers(True)
+        except AttributeError:
+            # widget without a gutter API, buffer line numbers stay
+            pass
+
+    def _gutter_data(self, gutter, renderer, line_ix, current_line, data=None):
+        renderer.set_property('text', str(self.program_line(line_ix + 1)))
@@ -0,0 +1,241 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Indexed search over the loaded G code program
+#
+# When a program loads, a background thread reads it once and builds two
+# indexes: the lines holding each G, M, T, N and O word (numbers normalised
+# so T05 and T5 are the same word), and the blocks of lines holding each
+# three character sequence of the upper cased text.  A word search is then a
+# bisect into the sorted line list of that word; any other text only reads
+# the blocks the trigram index says can hold it.  Until the index is ready
+# searches fall back to scanning the file through the line index.
+#
+
+import re
+import sys
+import bisect
+import array
+import threading
+import traceback
+
+
+# words with a line list of their own
+INDEXED_WORDS = 'GMTNO'
+
+# lines per block in the trigram index, keeps it a small fraction of the file
+TRIGRAM_BLOCK_LINES = 64
+
+COMMENT_RE = re.compile(r'\([^)]*\)|;.*')
+WORD_RE = re.compile(r'([A-Z])\s*([-+]?(?:\d+\.?\d*|\.\d+))')
+QUERY_WORD_RE = re.compile(r'^([A-Z])\s*([-+]?(?:\d+\.?\d*|\.\d+))$')
+
+TOOL_CHANGE_WORD = 'M6'
+
+
+def normalize_word(letter, number):
+    # 'T05' -> 'T5', 'G01' -> 'G1', 'G54.1' stays
+    try:
+        value = float(number)
+    except ValueError:
+        return letter + number
+    if value == int(value):
+        return '%s%d' % (letter, int(value))
+    return '%s%s' % (letter, repr(value))
+
+
+def query_word(text):
+    # the indexed word a query stands for, or None for a text search
+    match = QUERY_WORD_RE.match(text)
+    if match and match.group(1) in INDEXED_WORDS:
+        return normalize_word(match.group(1), match.group(2))
+    return None
+
+
+def contains(sorted_array, value):
+    ix = bisect.bisect_left(sorted_array, value)
+    return ix < len(sorted_array) and sorted_array[ix] == value
+
+
+class search_index:
+    def __init__(self):
+        # word -> array of 1 based line numbers, ascending
+        self.words = {}
+        # trigram -> array of block numbers, ascending
+        self.trigrams = {}
+
+    def add_line(self, line, text):
+        code = COMMENT_RE.sub('', text)
+        for letter, number in WORD_RE.findall(code):
+            if letter in INDEXED_WORDS:
+                lines = self.words.setdefault(normalize_word(letter, number), array.array('L'))
+                if not lines or lines[-1] != line:
+                    lines.append(line)
+        block = (line - 1) // TRIGRAM_BLOCK_LINES
+        for ix in xrange(len(text) - 2):
+            blocks = self.trigrams.setdefault(text[ix:ix + 3], array.array('L'))
+            if not blocks or blocks[-1] != block:
+                blocks.append(block)
+
+
+class gcode_search:
+    def __init__(self):
+        self.lines = None
+        self.index = None
+        self.builder = None
+        self.cancelled = None
+        # the current query and where it last matched, so find_next() carries on from there
+        self.query = ''
+        self.match_line = 0
+
+    def start(self, lines):
+        # lines is the gcode_listing.line_index of the program just loaded
+        self.cancel()
+        self.lines = lines
+        self.clear()
+        cancelled = threading.Event()
+        self.cancelled = cancelled
+        self.builder = threading.Thread(target=self._build, args=(lines, cancelled), name='gcode_search_index')
+        self.builder.daemon = True
+        self.builder.start()
+
+    def cancel(self):
+        if self.cancelled is not None:
+            self.cancelled.set()
+        self.cancelled = None
+        self.builder = None
+        self.index = None
+        self.lines = None
+
+    def clear(self):
+        self.query = ''
+        self.match_line = 0
+
+    def ready(self):
+        return self.index is not None
+
+    def _build(self, lines, cancelled):
+        try:
+            index = search_index()
+            with open(lines.path, 'rb') as f:
+                for line, text in enumerate(f, 1):
+                    if cancelled.is_set():
+                        return
+                    index.add_line(line, text.rstrip('\r\n').upper())
+            if not cancelled.is_set():
+                # published with one reference swap
+                self.index = index
+        except Exception:
+            print 'gcode_search: exception building the index for %s' % lines.path
+            traceback.print_exc(file=sys.stdout)
+
+    def find(self, text, from_line=1, backwards=False):
+        # line number of the first match at or after from_line (at or before when
+        # searching backwards), or 0 when there is none
+        text = text.strip().upper()
+        if not text or self.lines is None:
+            return 0
+        self.query = text
+        self.match_line = self._find(text, from_line, backwards)
+        return self.match_line
+
+    def find_literal(self, text, from_line=1):
+        # first line at or after from_line holding text as it is, without treating a word
+        # like T5 as T05 too; the current query is left alone
+        text = text.upper()
+        if not text or self.lines is None:
+            return 0
+        if self.index is not None and len(text) >= 3:
+            return self._find_text(self.index, text, from_line, False)
+        return self._scan(text, None, from_line, False)
+
+    def find_next(self):
+        # 0 past the last match, which stays the current one
+        if not self.query or self.match_line == 0:
+            return 0
+        line = self._find(self.query, self.match_line + 1, False)
+        if line:
+            self.match_line = line
+        return line
+
+    def find_previous(self):
+        if not self.query or self.match_line <= 1:
+            return 0
+        line = self._find(self.query, self.match_line - 1, True)
+        if line:
+            self.match_line = line
+        return line
+
+    def next_tool_change(self, from_line):
+        return self.find(TOOL_CHANGE_WORD, from_line)
+
+    def _find(self, text, from_line, backwards):
+        index = self.index
+        word = query_word(text)
+        if index is not None and word is not None:
+            return self._find_word(index.words.get(word), from_line, backwards)
+        if index is not None and len(text) >= 3:
+            return self._find_text(index, text, from_line, backwards)
+        return self._scan(text, word, from_line, backwards)
+
+    def _find_word(self, lines, from_line, backwards):
+        if not lines:
+            return 0
+        if backwards:
+            ix = bisect.bisect_right(lines, from_line) - 1
+            return lines[ix] if ix >= 0 else 0
+        ix = bisect.bisect_left(lines, from_line)
+        return lines[ix] if ix < len(lines) else 0
+
+    def _find_text(self, index, text, from_line, backwards):
+        # blocks holding every trigram of the text, rarest trigram first
+        block_lists = []
+        for ix in xrange(len(text) - 2):
+            blocks = index.trigrams.get(text[ix:ix + 3])
+            if not blocks:
+                return 0
+            block_lists.append(blocks)
+        block_lists.sort(key=len)
+        candidates = block_lists[0]
+        others = block_lists[1:]
+        first_block = (from_line - 1) // TRIGRAM_BLOCK_LINES
+        if backwards:
+            start = bisect.bisect_right(candidates, first_block) - 1
+            order = xrange(start, -1, -1)
+        else:
+            order = xrange(bisect.bisect_left(candidates, first_block), len(candidates))
+        for ix in order:
+            block = candidates[ix]
+            if all(contains(blocks, block) for blocks in others):
+                first = block * TRIGRAM_BLOCK_LINES + 1
+                line = self._scan_range(text, None, first, first + TRIGRAM_BLOCK_LINES - 1, from_line, backwards)
+                if line:
+                    return line
+        return 0
+
+    def _scan(self, text, word, from_line, backwards):
+        # no index yet, or text too short for trigrams
+        if backwards:
+            return self._scan_range(text, word, 1, from_line, from_line, True)
+        return self._scan_range(text, word, from_line, self.lines.line_count(), from_line, False)
+
+    def _scan_range(self, text, word, first, last, from_line, backwards):
+        first = max(first, 1)
+        last = min(last, self.lines.line_count())
+        if first > last:
+            return 0
+        texts = self.lines.read_lines(first - 1, last).upper().splitlines()
+        numbered = range(first, first + len(texts))
+        if backwards:
+            numbered.reverse()
+        for line in numbered:
+            if (line < from_line) if not backwards else (line > from_line):
+                continue
+            line_text = texts[line - first]
+            if word is not None:
+                code = COMMENT_RE.sub('', line_text)
+                if any(normalize_word(l, n) == word for l, n in WORD_RE.findall(code)):
+                    return line
+            elif text in line_text:
+                return line
+        return 0
@@ -0,0 +1,163 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Bounded live plot of the tool tip
+#
+# Stands in for linuxcnc.positionlogger, which keeps every point it logs
+# until the plot is cleared.  Points are sampled from a stat object of its
+# own at the positionlogger's rate, faster than the status poller, so small
+# features do not show as chords.  A point is dropped when it is closer
+# than MIN_DISTANCE to the last one kept, and replaces the last one when
+# the path has not turned by more than MAX_TURN since the point before.  Kept points are compiled into
+# a display list per CHUNK_POINTS, and only the newest MAX_CHUNKS lists are
+# kept, so memory and redraw time stay flat however long the machine runs.
+# Only the newest, not yet compiled points are sent to GL on every redraw.
+#
+
+import math
+import threading
+import linuxcnc
+import minigl
+
+
+# seconds, the positionlogger's rate
+SAMPLE_INTERVAL = 0.01
+
+# inches
+MIN_DISTANCE = 0.0005
+
+# radians, straighter than this the middle point is dropped
+MAX_TURN = math.radians(2.0)
+
+CHUNK_POINTS = 2000
+MAX_CHUNKS = 100
+
+# colors by stat.motion_type; 0 is jogging
+MOTION_COLORS = ('backplotjog', 'backplottraverse', 'backplotfeed', 'backplotarc', 'backplottoolchange', 'backplotprobing')
+
+
+def _turn(a, b, c):
+    # angle between a->b and b->c
+    u = (b[0] - a[0], b[1] - a[1], b[2] - a[2])
+    v = (c[0] - b[0], c[1] - b[1], c[2] - b[2])
+    lu = math.sqrt(u[0] * u[0] + u[1] * u[1] + u[2] * u[2])
+    lv = math.sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2])
+    if lu < 1e-12 or lv < 1e-12:
+        return 0.0
+    cosine = (u[0] * v[0] + u[1] * v[1] + u[2] * v[2]) / (lu * lv)
+    return math.acos(max(-1.0, min(1.0, cosine)))
+
+
+class live_plot:
+    def __init__(self, colors, interval=SAMPLE_INTERVAL):
+        self.stat = linuxcnc.stat()
+        self.interval = interval
+        self.colors = []
+        for name in MOTION_COLORS:
+            color = tuple(colors.get(name, (1.0, 1.0, 1.0)))[:3]
+            self.colors.append(color + (colors.get(name + '_alpha', 1.0),))
+        # (x, y, z, color index) points not compiled yet, shared with the sampler thread
+        self.lock = threading.Lock()
+        self.points = []
+        self.cleared = False
+        # display lists of compiled chunks, oldest first; only touched on the GL thread
+        self.chunks = []
+        self.stop_event = threading.Event()
+        self.thread = None
+        # (x, y, z, a, b, c) of the tool tip at the last sample, replaced whole by the sampler
+        self.tool_tip = None
+
+    def start(self, interval=None):
+        # same call as positionlogger.start, but returns at once
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='live_plot')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread = None
+
+    def clear(self):
+        with self.lock:
+            self.points = []
+            self.cleared = True
+
+    def _run(self):
+        stat = self.stat
+        while not self.stop_event.is_set():
+            try:
+                stat.poll()
+                self.add(stat.actual_position, stat.tool_offset, stat.motion_type)
+            except linuxcnc.error:
+                # task went away, try again on the next sample
+                pass
+            self.stop_event.wait(self.interval)
+
+    def add(self, position, offset, motion_type):
+        motion_type = motion_type or 0
+        color = motion_type if 0 <= motion_type < len(MOTION_COLORS) else 0
+        self.tool_tip = tuple(position[axis] - offset[axis] for axis in range(3)) + tuple(position[3:6])
+        point = (position[0] - offset[0], position[1] - offset[1], position[2] - offset[2], color)
+        with self.lock:
+            points = self.points
+            if points:
+                last = points[-1]
+                if last[3] == color:
+                    dx = point[0] - last[0]
+                    dy = point[1] - last[1]
+                    dz = point[2] - last[2]
+                    if dx * dx + dy * dy + dz * dz < MIN_DISTANCE * MIN_DISTANCE:
+                        return
+                    if len(points) > 1 and points[-2][3] == color and _turn(points[-2], last, point) < MAX_TURN:
+                        points[-1] = point
+                        return
+            points.append(point)
+
+    def last(self, live_plot=True):
+        # current tool tip position (x, y, z, a, b, c) in machine units, for the tool drawing
+        return self.tool_tip
+
+    def call(self):
+        # draw, on the GL thread with the context current
+        with self.lock:
+            if self.cleared:
+                self.cleared = False
+                self._delete_chunks(len(self.chunks))
+            if len(self.points) > CHUNK_POINTS:
+                compile_points = self.points[:CHUNK_POINTS + 1]
+                # the next chunk starts where this one ends so the line stays joined
+                self.points = self.points[CHUNK_POINTS:]
+            else:
+                compile_points = None
+            tail = list(self.points)
+        if compile_points is not None:
+            l = minigl.glGenLists(1)
+            minigl.glNewList(l, minigl.GL_COMPILE)
+            self._draw_points(compile_points)
+            minigl.glEndList()
+            self.chunks.append(l)
+            if len(self.chunks) > MAX_CHUNKS:
+                self._delete_chunks(len(self.chunks) - MAX_CHUNKS)
+        for l in self.chunks:
+            minigl.glCallList(l)
+        self._draw_points(tail)
+
+    def _delete_chunks(self, count):
+        for l in self.chunks[:count]:
+            minigl.glDeleteLists(l, 1)
+        del self.chunks[:count]
+
+    def _draw_points(self, points):
+        if len(points) < 2:
+            return
+        minigl.glBegin(minigl.GL_LINE_STRIP)
+        color = None
+        for x, y, z, c in points:
+            if c != color:
+                color = c
+                minigl.glColor4f(*self.colors[c])
+            minigl.glVertex3f(x, y, z)
+        minigl.glEnd()
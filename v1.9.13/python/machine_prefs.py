@@ -0,0 +1,156 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Cached access to the 'machine_prefs' redis hash
+#
+# The whole hash is read with one HGETALL when the UI starts.  Reads after
+# that come from the in-memory copy through typed getters with defaults.
+# Writes update the copy right away and are flushed to redis by a writer
+# thread in one pipelined HMSET, so toggling a setting never waits on redis.
+#
+
+import sys
+import threading
+import traceback
+import redis
+
+
+PREFS_KEY = 'machine_prefs'
+
+# the writer waits this long after the first change so a burst of sets goes out in one HMSET
+WRITE_BEHIND_DELAY = 0.2
+
+# and this long before trying again after redis failed
+WRITE_RETRY_DELAY = 2.0
+
+
+class machine_prefs:
+    def __init__(self, redis_conn, key=PREFS_KEY):
+        self.redis = redis_conn
+        self.key = key
+        self.values = {}
+        # field -> string value not yet written to redis
+        self.dirty = {}
+        self.lock = threading.Lock()
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.writer = threading.Thread(target=self._writer_loop, name='machine_prefs_writer')
+        self.writer.daemon = True
+        self.writer.start()
+
+    def load(self):
+        # one round trip for every setting; an unreachable redis leaves the defaults in effect
+        try:
+            values = self.redis.hgetall(self.key)
+        except redis.RedisError as e:
+            print 'machine_prefs: HGETALL failed, using defaults: %s' % str(e)
+            return False
+        with self.lock:
+            # anything set before the load and not yet written wins
+            values.update(self.dirty)
+            self.values = values
+        return True
+
+    # ---------------------------------------------------------------------
+    # typed reads - redis stores strings, never bools or numbers
+    # ---------------------------------------------------------------------
+
+    def exists(self, field):
+        return field in self.values
+
+    def get(self, field, default=None):
+        return self.values.get(field, default)
+
+    def get_bool(self, field, default=False):
+        value = self.values.get(field)
+        if value is None:
+            return default
+        return value == 'True'
+
+    def get_int(self, field, default=0):
+        try:
+            return int(self.values[field])
+        except (KeyError, TypeError, ValueError):
+            return default
+
+    def get_float(self, field, default=0.0):
+        try:
+            return float(self.values[field])
+        except (KeyError, TypeError, ValueError):
+            return default
+
+    # ---------------------------------------------------------------------
+    # write-behind
+    # ---------------------------------------------------------------------
+
+    def set(self, field, value):
+        # stored the way redis-py would have stored it, e.g. True -> 'True'
+        value = str(value)
+        with self.lock:
+            if self.values.get(field) == value and field not in self.dirty:
+                return
+            self.values[field] = value
+            self.dirty[field] = value
+        self.wake_event.set()
+
+    def set_default(self, field, value):
+        # write a default back so the next start finds the field in the hash
+        if field not in self.values:
+            self.set(field, value)
+
+    def flush(self):
+        # synchronous write of everything pending, e.g. on quit
+        with self.lock:
+            pending = self.dirty
+            self.dirty = {}
+        if not pending:
+            return True
+        try:
+            self._write(pending)
+        except redis.RedisError as e:
+            print 'machine_prefs: flush failed: %s' % str(e)
+            self._requeue(pending)
+            return False
+        return True
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+        self.flush()
+
+    def _write(self, pending):
+        pipe = self.redis.pipeline()
+        pipe.hmset(self.key, pending)
+        pipe.execute()
+
+    def _requeue(self, pending):
+        with self.lock:
+            # newer values set while the write was in flight take precedence
+            for field, value in pending.iteritems():
+                self.dirty.setdefault(field, value)
+
+    def _writer_loop(self):
+        while not self.stop_event.is_set():
+            self.wake_event.wait()
+            if self.stop_event.is_set():
+                break
+            self.stop_event.wait(WRITE_BEHIND_DELAY)
+            self.wake_event.clear()
+            with self.lock:
+                pending = self.dirty
+                self.dirty = {}
+            if not pending:
+                continue
+            try:
+                self._write(pending)
+            except redis.RedisError as e:
+                print 'machine_prefs: write-behind failed, will retry: %s' % str(e)
+                self._requeue(pending)
+                self.stop_event.wait(WRITE_RETRY_DELAY)
+                self.wake_event.set()
+            except Exception:
+                print 'machine_prefs: write-behind exception'
+                traceback.print_exc(file=sys.stdout)
+                self._requeue(pending)
+                self.stop_event.wait(WRITE_RETRY_DELAY)
+                self.wake_event.set()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Push delivery of the redis 'TormachMessage' queue to the GTK thread
+#
+# NGC prompts and the ATC worker rpush messages onto a redis list.  This
+# thread sits in a blocking pop on that list, drains whatever else arrived
+# in the same burst, and hands the batch to the GTK main loop with
+# glib.idle_add.
+#
+# Each message is delivered with the time it was queued so the UI can
+# record how long it took to be shown.  Producers that queue with
+# post_message() stamp that time into a side hash keyed by the message
+# text; for messages queued any other way the time they were popped is
+# used instead.
+#
+
+import sys
+import time
+import threading
+import traceback
+import glib
+import redis
+
+
+MESSAGE_KEY = 'TormachMessage'
+
+# message text -> time it was first queued, see post_message()
+TIMES_KEY_SUFFIX = 'Times'
+
+# BLPOP timeout, bounds how long stop() waits for the thread to notice
+BLOCK_TIMEOUT_SECS = 1
+
+# pause before reconnecting after redis went away
+ERROR_RETRY_SECS = 1.0
+
+
+def post_message(redis_conn, message, key=MESSAGE_KEY):
+    # queue a message with the time it was queued; the earliest stamp wins when the
+    # same text is queued again before it is shown
+    pipe = redis_conn.pipeline()
+    pipe.hsetnx(key + TIMES_KEY_SUFFIX, message, repr(time.time()))
+    pipe.rpush(key, message)
+    pipe.execute()
+
+
+def clear_messages(redis_conn, key=MESSAGE_KEY):
+    redis_conn.delete(key, key + TIMES_KEY_SUFFIX)
+
+
+class message_listener(threading.Thread):
+    def __init__(self, redis_conn, deliver, key=MESSAGE_KEY):
+        # deliver(batch) is called on the GTK thread with a list of (message, queued time)
+        threading.Thread.__init__(self, name='message_listener')
+        self.daemon = True
+        self.redis = redis_conn
+        self.deliver = deliver
+        self.key = key
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                item = self.redis.blpop(self.key, BLOCK_TIMEOUT_SECS)
+                if item is None:
+                    continue
+                now = time.time()
+                messages = [item[1]]
+                # drain the rest of a burst so it is shown in one go
+                while True:
+                    message = self.redis.lpop(self.key)
+                    if message is None:
+                        break
+                    messages.append(message)
+                glib.idle_add(self._deliver, zip(messages, self._queued_times(messages, now)))
+            except redis.RedisError as e:
+                print 'TormachMessage listener: %s' % str(e)
+                self.stop_event.wait(ERROR_RETRY_SECS)
+            except Exception:
+                print 'TormachMessage listener exception'
+                traceback.print_exc(file=sys.stdout)
+                self.stop_event.wait(ERROR_RETRY_SECS)
+
+    def _queued_times(self, messages, popped):
+        times_key = self.key + TIMES_KEY_SUFFIX
+        unique = list(set(messages))
+        pipe = self.redis.pipeline()
+        for message in unique:
+            pipe.hget(times_key, message)
+        pipe.hdel(times_key, *unique)
+        stamps = dict(zip(unique, pipe.execute()[:-1]))
+        times = []
+        for message in messages:
+            try:
+                times.append(float(stamps[message]))
+            except (TypeError, ValueError):
+                # not queued with post_message()
+                times.append(popped)
+        return times
+
+    def _deliver(self, batch):
+        self.deliver(batch)
+        return False
@@ -0,0 +1,127 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Timing instrumentation for the UI periodic functions
+#
+# Keeps a log2 wall-time histogram per periodic task and per instrumented
+# section inside a task, the real interval between successive runs of each
+# task, and counts of overruns (ran longer than its period) and late runs
+# (started more than half a period behind schedule).
+#
+
+import time
+import contextlib
+
+
+# bucket n holds times below 2**n microseconds, the last one catches the rest (~16 sec)
+NUM_BUCKETS = 25
+
+# a run is late when the interval since the previous run exceeds period * LATE_FACTOR
+LATE_FACTOR = 1.5
+
+
+class timing_histogram:
+    def __init__(self):
+        self.buckets = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        usec = int(seconds * 1000000)
+        self.buckets[min(max(usec, 0).bit_length(), NUM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, pct):
+        # upper bound of the bucket holding the pct'th sample, in seconds
+        if self.count == 0:
+            return 0.0
+        target = self.count * pct / 100.0
+        seen = 0
+        for ix, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min((1 << ix) / 1000000.0, self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class task_timing:
+    def __init__(self, name):
+        self.name = name
+        self.runtime = timing_histogram()
+        self.interval = timing_histogram()
+        self.overruns = 0
+        self.late = 0
+        self.last_start = None
+
+
+class periodic_profiler:
+    def __init__(self):
+        self.timings = {}
+        self.started = time.time()
+
+    def _timing(self, name):
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = task_timing(name)
+        return timing
+
+    def run_task(self, task, period):
+        # scheduler run hook: time one run of a periodic task against its current period
+        timing = self._timing(task.name)
+        start = time.time()
+        if timing.last_start is not None:
+            interval = start - timing.last_start
+            timing.interval.add(interval)
+            if interval > period * LATE_FACTOR:
+                timing.late += 1
+        timing.last_start = start
+        try:
+            task.callback()
+        finally:
+            elapsed = time.time() - start
+            timing.runtime.add(elapsed)
+            if elapsed > period:
+                timing.overruns += 1
+
+    def record(self, name, elapsed):
+        self._timing(name).runtime.add(elapsed)
+
+    @contextlib.contextmanager
+    def section(self, name):
+        # time a sub-handler inside a task, e.g. the gremlin offset refresh
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(name, time.time() - start)
+
+    def summary_lines(self, max_lines=12):
+        # worst p99 first
+        lines = []
+        timings = sorted(self.timings.values(), key=lambda t: t.runtime.percentile(99), reverse=True)
+        for t in timings[:max_lines]:
+            lines.append('%-16s %6.1f %6.1f %4d' % (t.name[:16], t.runtime.percentile(50) * 1000, t.runtime.percentile(99) * 1000, t.overruns + t.late))
+        return lines
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            f.write('periodic task timing, %.0f sec since start, times in ms\n' % (time.time() - self.started))
+            f.write('%-24s %8s %8s %8s %8s %8s %8s %8s %8s %6s %6s\n' %
+                    ('name', 'runs', 'mean', 'p50', 'p99', 'max', 'int p50', 'int p99', 'int max', 'over', 'late'))
+            for name in sorted(self.timings):
+                t = self.timings[name]
+                f.write('%-24s %8d %8.2f %8.2f %8.2f %8.2f %8.2f %8.2f %8.2f %6d %6d\n' %
+                        (name, t.runtime.count, t.runtime.mean() * 1000,
+                         t.runtime.percentile(50) * 1000, t.runtime.percentile(99) * 1000, t.runtime.max * 1000,
+                         t.interval.percentile(50) * 1000, t.interval.percentile(99) * 1000, t.interval.max * 1000,
+                         t.overruns, t.late))
+            f.write('\nruntime histograms (bucket n counts runs shorter than 2**n usec)\n')
+            for name in sorted(self.timings):
+                f.write('%-24s %s\n' % (name, ' '.join(str(n) for n in self.timings[name].runtime.buckets)))
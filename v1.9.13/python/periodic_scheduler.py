@@ -0,0 +1,125 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Adaptive scheduler for the UI periodic functions
+#
+# Each periodic task is registered with its own rate while the machine is
+# active (running a program, moving, probing, jogging) and while it is idle,
+# plus an optional condition that must hold for the task to run.  One GTK
+# timer is re-armed for the earliest deadline.  Fast tasks run straight from
+# the timer; slow tasks are queued and run one at a time from an idle
+# handler, which GTK dispatches after timers and redraws, so a long slow
+# task never pushes back the fast ones.
+#
+
+import sys
+import time
+import traceback
+import glib
+
+
+# never re-arm the timer closer than this
+MIN_TIMER_INTERVAL_MS = 10
+
+
+class periodic_task:
+    def __init__(self, name, callback, active_ms, idle_ms, condition, slow):
+        self.name = name
+        self.callback = callback
+        self.active_ms = active_ms
+        self.idle_ms = idle_ms
+        self.condition = condition
+        self.slow = slow
+        self.next_due = 0.0
+
+    def period(self, active):
+        return (self.active_ms if active else self.idle_ms) / 1000.0
+
+    def reschedule(self, now, active):
+        # keep the phase so the rate does not drift, but never try to catch up
+        self.next_due += self.period(active)
+        if self.next_due <= now:
+            self.next_due = now + self.period(active)
+
+
+class periodic_scheduler:
+    def __init__(self, is_active):
+        # is_active() is asked once per timer firing
+        self.is_active = is_active
+        self.fast_tasks = []
+        self.slow_tasks = []
+        self.slow_queue = []
+        self.active = True
+        self.timer_id = None
+        self.idle_id = None
+        # optional hook, called as run_hook(task, period) instead of task.callback()
+        self.run_hook = None
+
+    def add_task(self, name, callback, active_ms, idle_ms=None, condition=None, slow=False):
+        if idle_ms is None:
+            idle_ms = active_ms
+        task = periodic_task(name, callback, active_ms, idle_ms, condition, slow)
+        if slow:
+            self.slow_tasks.append(task)
+        else:
+            self.fast_tasks.append(task)
+        return task
+
+    def start(self):
+        if self.timer_id is None:
+            self._arm(0.0)
+
+    def _arm(self, delay):
+        interval_ms = max(int(delay * 1000), MIN_TIMER_INTERVAL_MS)
+        self.timer_id = glib.timeout_add(interval_ms, self._on_timer)
+
+    def _run(self, task):
+        try:
+            if task.condition is None or task.condition():
+                if self.run_hook:
+                    self.run_hook(task, task.period(self.active))
+                else:
+                    task.callback()
+        except Exception:
+            # one broken task must not stop every other periodic update
+            print 'periodic task %s raised an exception' % task.name
+            traceback.print_exc(file=sys.stdout)
+
+    def _on_timer(self):
+        # the timer is one shot, it is armed again whatever happens in here
+        try:
+            now = time.time()
+            active = bool(self.is_active())
+            if active and not self.active:
+                # machine just went busy, pull in the relaxed idle deadlines
+                for task in self.fast_tasks + self.slow_tasks:
+                    task.next_due = min(task.next_due, now + task.period(True))
+            self.active = active
+
+            # fast tasks run in registration order, so the status poll registered
+            # first is fresh for everything after it
+            for task in self.fast_tasks:
+                if now >= task.next_due:
+                    self._run(task)
+                    task.reschedule(now, active)
+
+            for task in self.slow_tasks:
+                if now >= task.next_due:
+                    if task not in self.slow_queue:
+                        self.slow_queue.append(task)
+                    task.reschedule(now, active)
+            if self.slow_queue and self.idle_id is None:
+                self.idle_id = glib.idle_add(self._run_slow)
+        finally:
+            next_due = min(task.next_due for task in self.fast_tasks + self.slow_tasks)
+            self._arm(next_due - time.time())
+        return False
+
+    def _run_slow(self):
+        # one slow task per idle dispatch so the timer gets in between
+        if self.slow_queue:
+            self._run(self.slow_queue.pop(0))
+        if self.slow_queue:
+            return True
+        self.idle_id = None
+        return False
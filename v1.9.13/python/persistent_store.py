@@ -0,0 +1,82 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Dirty-only persistence of UI state in redis
+#
+# hash_store and list_store remember what redis holds for one key and only
+# queue writes for what changed since the last load or save.  save_stores()
+# sends the writes for any number of stores in one MULTI/EXEC pipeline, so
+# saving costs one round trip, or none when nothing changed.
+#
+
+
+class hash_store:
+    def __init__(self, redis_conn, key):
+        self.redis = redis_conn
+        self.key = key
+        # field -> value as last read from or written to redis
+        self.saved = {}
+
+    def load(self):
+        values = self.redis.hgetall(self.key)
+        self.saved = dict(values)
+        return values
+
+    def changed(self, values):
+        return dict((field, value) for field, value in values.iteritems() if self.saved.get(field) != value)
+
+    def queue(self, pipe, values):
+        # returns what was queued, to be passed to mark_saved() once the pipeline
+        # executed, or None if redis already holds these values
+        changed = self.changed(values)
+        if not changed:
+            return None
+        pipe.hmset(self.key, changed)
+        return changed
+
+    def mark_saved(self, changed):
+        self.saved.update(changed)
+
+
+class list_store:
+    def __init__(self, redis_conn, key):
+        self.redis = redis_conn
+        self.key = key
+        self.saved = []
+
+    def load(self):
+        # read without consuming - the list stays in redis until it is replaced
+        items = self.redis.lrange(self.key, 0, -1)
+        self.saved = list(items)
+        return items
+
+    def queue(self, pipe, items):
+        items = list(items)
+        if items == self.saved:
+            return None
+        if items[:len(self.saved)] == self.saved:
+            # only appended to, push just the new tail
+            pipe.rpush(self.key, *items[len(self.saved):])
+        else:
+            pipe.delete(self.key)
+            if items:
+                pipe.rpush(self.key, *items)
+        return items
+
+    def mark_saved(self, items):
+        self.saved = items
+
+
+def save_stores(redis_conn, updates):
+    # updates is a list of (store, values); returns the number of stores written
+    pipe = redis_conn.pipeline(transaction=True)
+    queued = []
+    for store, values in updates:
+        written = store.queue(pipe, values)
+        if written is not None:
+            queued.append((store, written))
+    if queued:
+        pipe.execute()
+        for store, written in queued:
+            store.mark_saved(written)
+    return len(queued)
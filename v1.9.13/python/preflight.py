@@ -0,0 +1,199 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Pre-flight checks of a loaded program
+#
+# The preview worker runs analyze() over the canon segments right after a
+# parse, so the result lands in the preview cache with the geometry and is
+# only worked out again when the program or parse settings change.  It
+# holds the program's extents (machine coordinates including tool offsets,
+# under the offsets the parse saw), the tools the program calls and an
+# estimate of the run time from the feeds and the axis velocity and
+# acceleration limits.  The checks against the machine limits and the tool
+# table are cheap and are redone on the GTK side whenever the work offsets
+# or the tool table change.
+#
+# Everything is in inches, the machine units of the mill.
+#
+
+import re
+import math
+
+
+# moves turning by more than this come to a stop at the corner, smaller turns blend
+CORNER_ANGLE = math.radians(30.0)
+
+COMMENT_RE = re.compile(r'\([^)]*\)|;.*')
+TOOL_WORD_RE = re.compile(r'T\s*(\d+)', re.IGNORECASE)
+
+
+class motion_limits:
+    # from the ini: traj max velocity and per axis (max velocity, max acceleration), units/second
+    def __init__(self, max_velocity, axes):
+        self.max_velocity = max_velocity
+        self.axes = axes
+
+    def settings(self):
+        return (self.max_velocity, tuple(self.axes))
+
+
+class preflight_result:
+    def __init__(self):
+        # ((x, y, z) min, (x, y, z) max) or None for a program without motion
+        self.extents = None
+        self.tools = []
+        self.seconds = 0.0
+
+
+def program_tools(filename):
+    # tool numbers of the T words outside comments, T words with expressions are missed
+    tools = set()
+    with open(filename, 'rb') as f:
+        for text in f:
+            code = COMMENT_RE.sub('', text)
+            if 't' in code or 'T' in code:
+                tools.update(int(number) for number in TOOL_WORD_RE.findall(code))
+    tools.discard(0)
+    return sorted(tools)
+
+
+def _direction_limit(limits, delta, length, index):
+    # the tightest axis limit along a move's direction, index 0 velocity 1 acceleration
+    limit = limits.max_velocity if index == 0 else float('inf')
+    for axis in range(3):
+        component = abs(delta[axis]) / length
+        if component > 1e-9:
+            limit = min(limit, limits.axes[axis][index] / component)
+    return limit
+
+
+def _move_time(length, velocity, accel, starts_stopped, ends_stopped):
+    # trapezoidal profile, accelerating only at the ends that come to a stop
+    stops = int(starts_stopped) + int(ends_stopped)
+    if stops == 0 or accel <= 0:
+        return length / velocity
+    ramp = stops * velocity * velocity / (2.0 * accel)
+    if length >= ramp:
+        return length / velocity + stops * velocity / (2.0 * accel)
+    # never reaches the feed
+    return stops * math.sqrt(2.0 * (length / stops) / accel)
+
+
+def analyze(segments, dwell_seconds, tools, limits):
+    # segments is the preview's dict of canon lists; traverse entries are
+    # (line, start, end, tool offset), feed and arcfeed (line, start, end, feed, tool offset)
+    result = preflight_result()
+    result.tools = tools
+    moves = []
+    for name in ('traverse', 'feed', 'arcfeed'):
+        for segment in segments.get(name, []):
+            feed = None if name == 'traverse' else segment[3]
+            moves.append((segment[0], segment[1], segment[2], feed, segment[-1]))
+    if not moves:
+        result.seconds = dwell_seconds
+        return result
+    # the lists are per kind, put them back in program order
+    moves.sort(key=lambda move: move[0])
+
+    low = [float('inf')] * 3
+    high = [float('-inf')] * 3
+    seconds = dwell_seconds
+    previous = None
+    for ix, (line, start, end, feed, offset) in enumerate(moves):
+        for axis in range(3):
+            for point in (start, end):
+                value = point[axis] + offset[axis]
+                if value < low[axis]:
+                    low[axis] = value
+                if value > high[axis]:
+                    high[axis] = value
+        delta = [end[axis] - start[axis] for axis in range(3)]
+        length = math.sqrt(sum(d * d for d in delta))
+        if length < 1e-9:
+            continue
+        velocity = _direction_limit(limits, delta, length, 0)
+        if feed is not None:
+            velocity = min(velocity, feed)
+        if velocity <= 0:
+            continue
+        accel = _direction_limit(limits, delta, length, 1)
+        starts_stopped = previous is None or previous[1] != (feed is None) or _turn(previous[0], delta, length) > CORNER_ANGLE
+        if ix + 1 < len(moves):
+            following = moves[ix + 1]
+            next_delta = [following[2][axis] - following[1][axis] for axis in range(3)]
+            ends_stopped = (following[3] is None) != (feed is None) or _turn(delta, next_delta, None) > CORNER_ANGLE
+        else:
+            ends_stopped = True
+        seconds += _move_time(length, velocity, accel, starts_stopped, ends_stopped)
+        previous = (delta, feed is None)
+    result.extents = (tuple(low), tuple(high))
+    result.seconds = seconds
+    return result
+
+
+def _turn(a, b, b_length):
+    a_length = math.sqrt(sum(v * v for v in a))
+    if b_length is None:
+        b_length = math.sqrt(sum(v * v for v in b))
+    if a_length < 1e-9 or b_length < 1e-9:
+        return 0.0
+    cosine = sum(a[i] * b[i] for i in range(3)) / (a_length * b_length)
+    return math.acos(max(-1.0, min(1.0, cosine)))
+
+
+def move_extents(extents, parsed_offsets, offsets):
+    # extents of the program run under offsets instead of the parsed_offsets it was
+    # analyzed under, both (g5x xyz, g92 xyz, xy rotation); same mapping as the preview,
+    # and only good for a program that sets no offsets of its own
+    (g5x_0, g92_0, rot_0) = parsed_offsets
+    (g5x_1, g92_1, rot_1) = offsets
+    if parsed_offsets == offsets:
+        return extents
+    theta = math.radians(rot_1)
+    turn = math.radians(rot_1 - rot_0)
+    dx, dy, dz = [g92_1[i] - g92_0[i] for i in range(3)]
+    shift = (g5x_1[0] + dx * math.cos(theta) - dy * math.sin(theta),
+             g5x_1[1] + dx * math.sin(theta) + dy * math.cos(theta),
+             g5x_1[2] + dz)
+    low, high = extents
+    xs = []
+    ys = []
+    # a rotated box is bounded by its rotated corners
+    for x in (low[0], high[0]):
+        for y in (low[1], high[1]):
+            px = x - g5x_0[0]
+            py = y - g5x_0[1]
+            xs.append(px * math.cos(turn) - py * math.sin(turn) + shift[0])
+            ys.append(px * math.sin(turn) + py * math.cos(turn) + shift[1])
+    return ((min(xs), min(ys), low[2] - g5x_0[2] + shift[2]),
+            (max(xs), max(ys), high[2] - g5x_0[2] + shift[2]))
+
+
+def limit_problems(extents, min_bounds, max_bounds):
+    problems = []
+    if extents is None:
+        return problems
+    low, high = extents
+    for axis, letter in enumerate('XYZ'):
+        if low[axis] < min_bounds[axis]:
+            problems.append('%s travels to %.4f, below the machine limit of %.4f' % (letter, low[axis], min_bounds[axis]))
+        if high[axis] > max_bounds[axis]:
+            problems.append('%s travels to %.4f, beyond the machine limit of %.4f' % (letter, high[axis], max_bounds[axis]))
+    return problems
+
+
+def tool_problems(tools, tool_table):
+    table = dict((tool.id, tool) for tool in tool_table if tool.id > 0)
+    problems = []
+    for number in tools:
+        tool = table.get(number)
+        if tool is None:
+            problems.append('T%d is not in the tool table' % number)
+        elif tool.zoffset == 0.0:
+            problems.append('T%d has no tool length offset' % number)
+    return problems
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    return '%d:%02d:%02d' % (seconds // 3600, seconds // 60 % 60, seconds % 60)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# On-disk cache of parsed G code previews
+#
+# An entry is the stream of pickled messages the preview worker sends for a
+# parse (segment chunks and the final result), stored with a length prefix
+# per message.  On a hit the worker forwards the stored messages over its
+# pipe without unpickling them.  Entries are keyed by a hash of the program
+# text plus everything else that changes the parse: units, startup code,
+# geometry, the tool table, the var file apart from the active offsets and
+# the text of the subroutine files the program calls.
+# The oldest entries by last use are evicted once the cache is over its
+# size limit.
+#
+# Other derived files (e.g. arc fitted programs) use the same keying and
+# eviction with their own directory and suffix.
+#
+
+import os
+import time
+import struct
+import hashlib
+import tempfile
+
+
+ENTRY_SUFFIX = '.preview'
+TEMP_SUFFIX = '.tmp'
+
+# temp files this old were left by a worker that got killed
+STALE_TEMP_SECS = 3600
+
+LENGTH_FORMAT = '!I'
+LENGTH_SIZE = struct.calcsize(LENGTH_FORMAT)
+
+
+def hash_file(sha, filename):
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), ''):
+            sha.update(block)
+
+
+class preview_cache:
+    def __init__(self, directory, max_bytes, suffix=ENTRY_SUFFIX):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+
+    def key(self, filename, settings, extra_files=()):
+        # settings is any repr-able description of the parse environment, extra_files
+        # other files the parse reads
+        sha = hashlib.sha1()
+        hash_file(sha, filename)
+        sha.update(repr(settings))
+        for path in extra_files:
+            sha.update(path)
+            hash_file(sha, path)
+        return sha.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def read(self, key):
+        # generator of the stored pickled messages, or None on a miss
+        path = self.path(key)
+        try:
+            f = open(path, 'rb')
+        except IOError:
+            return None
+        # mark as recently used for eviction
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return self._records(f)
+
+    def _records(self, f):
+        with f:
+            while True:
+                header = f.read(LENGTH_SIZE)
+                if len(header) < LENGTH_SIZE:
+                    return
+                length = struct.unpack(LENGTH_FORMAT, header)[0]
+                yield f.read(length)
+
+    def writer(self, key):
+        return entry_writer(self, key)
+
+    def evict(self):
+        # drop least recently used entries until the cache fits
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        entries = []
+        total = 0
+        now = time.time()
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+                if name.endswith(TEMP_SUFFIX) and now - st.st_mtime > STALE_TEMP_SECS:
+                    os.unlink(path)
+                    continue
+            except OSError:
+                continue
+            if not name.endswith(self.suffix):
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class entry_writer:
+    # writes to a temp file, the entry only appears on commit() so a
+    # cancelled parse never leaves half an entry behind
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        if not os.path.isdir(cache.directory):
+            os.makedirs(cache.directory)
+        fd, self.temp_path = tempfile.mkstemp(suffix=TEMP_SUFFIX, dir=cache.directory)
+        self.f = os.fdopen(fd, 'wb')
+
+    def write(self, data):
+        self.f.write(struct.pack(LENGTH_FORMAT, len(data)))
+        self.f.write(data)
+
+    def commit(self):
+        self.f.close()
+        os.rename(self.temp_path, self.cache.path(self.key))
+        self.cache.evict()
+
+    def discard(self):
+        self.f.close()
+        try:
+            os.unlink(self.temp_path)
+        except OSError:
+            pass
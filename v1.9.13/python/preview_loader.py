@@ -0,0 +1,365 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Background G code preview parsing
+#
+# gremlin.load() runs gcode.parse() over the whole program on the GTK
+# thread.  preview_loader does the same parse in a forked worker process
+# and streams the canon's segment lists back over a pipe in chunks, with
+# progress messages while the parse runs.  The GTK side picks the messages
+# up one at a time from an io watch and only the finished geometry is
+# handed to gremlin on the main thread.  Starting another load, or calling
+# cancel(), kills a worker that is still running.
+#
+# With a preview_cache attached to the job the worker first looks the
+# program up by content hash and replays a stored parse instead.  The
+# active work offset and G92 are left out of the cache key; the result
+# carries the offsets the geometry was produced under and gremlin moves
+# the drawing to the current offsets with a transform.  That only holds
+# for a program that runs entirely in the active coordinate system without
+# changing any offsets itself; the canon records the offsets the parse
+# went through, and any other program is marked so gremlin parses it again
+# on an offset change, and is not cached.  Subroutine files the program
+# calls are found the way the interpreter finds them and their text goes
+# into the key as well.
+#
+# After the geometry the worker sends reduced detail copies of the tool
+# path for drawing zoomed out and, given the machine's motion limits, the
+# pre-flight analysis, so the preview shows without waiting for either.
+#
+
+import os
+import re
+import sys
+import shutil
+import tempfile
+import traceback
+import cPickle
+import multiprocessing
+import glib
+import gcode
+import gremlin
+import work_offsets
+import preflight
+import toolpath_lod
+
+
+# segments per pipe message, keeps each unpickle on the GTK thread short
+CHUNK_SIZE = 20000
+
+# lines parsed between progress messages
+PROGRESS_LINES = 2000
+
+# the canon lists that make up the preview geometry
+SEGMENT_LISTS = ('traverse', 'feed', 'arcfeed', 'dwells')
+
+# part of every cache key, bump when the message stream changes
+CACHE_FORMAT = 5
+
+# o<name> call; the interpreter lower cases the name and reads name.ngc
+CALL_RE = re.compile(r'o\s*<\s*([^>]+?)\s*>\s*call', re.IGNORECASE)
+
+
+class preview_job:
+    # everything the worker needs, filled in by the gremlin widget the same way gremlin.load() sets up its parse
+    def __init__(self, filename):
+        self.filename = filename
+        self.colors = None
+        self.geometry = None
+        self.lathe_option = False
+        self.stat = None
+        self.random = 0
+        self.parameter_file = None
+        self.unitcode = 'G20'
+        self.initcode = ''
+        # preview_cache.preview_cache or None
+        self.cache = None
+        # preflight.motion_limits, or None to skip the pre-flight analysis
+        self.limits = None
+        # where the interpreter looks for called subroutines, in order
+        self.subroutine_dirs = []
+
+    def cache_settings(self, var_params):
+        # everything besides the program text that changes what the parse produces,
+        # except the active offsets which are applied to the drawing afterwards
+        tools = [tuple(tool) for tool in self.stat.tool_table if tool.id > 0]
+        excluded = work_offsets.active_offset_params(var_params)
+        params = sorted((number, value) for number, value in var_params.iteritems() if number not in excluded)
+        limits = self.limits.settings() if self.limits else None
+        return (CACHE_FORMAT, self.unitcode, self.initcode, self.geometry, self.lathe_option, self.random, tools, params, limits)
+
+
+class preview_result:
+    def __init__(self, filename):
+        self.filename = filename
+        self.result = 0
+        self.seq = 0
+        self.warnings = []
+        # (g5x xyz, g92 xyz, xy rotation) in machine units the geometry was produced under
+        self.offsets = ((0.0, 0.0, 0.0), (0.0, 0.0, 0.0), 0.0)
+        # True when the whole program ran under those offsets, so it can be moved to others
+        self.offsets_fixed = True
+        self.segments = dict((name, []) for name in SEGMENT_LISTS)
+        # [(tolerance, {list name: segments})] finest first, see toolpath_lod
+        self.lods = []
+
+
+class progress_canon(gremlin.StatCanon):
+    # StatCanon that reports how far the parse has got through the pipe
+    def __init__(self, conn, total_lines, *args):
+        gremlin.StatCanon.__init__(self, *args)
+        self.conn = conn
+        self.total_lines = max(total_lines, 1)
+        self.next_report = PROGRESS_LINES
+        self.dwell_seconds = 0.0
+        # every distinct offset the interpreter set, from its start-up and the program;
+        # values rounded so the same offset sent again in other units compares equal
+        self.g5x_states = set()
+        self.g92_states = set()
+        self.rotation_states = set()
+
+    def next_line(self, st):
+        gremlin.StatCanon.next_line(self, st)
+        if st.sequence_number >= self.next_report:
+            self.next_report = st.sequence_number + PROGRESS_LINES
+            self.conn.send(('progress', min(st.sequence_number / float(self.total_lines), 1.0)))
+
+    def set_g5x_offset(self, index, *offsets):
+        gremlin.StatCanon.set_g5x_offset(self, index, *offsets)
+        self.g5x_states.add((int(index),) + tuple(round(v, 6) for v in offsets[:3]))
+
+    def set_g92_offset(self, *offsets):
+        gremlin.StatCanon.set_g92_offset(self, *offsets)
+        self.g92_states.add(tuple(round(v, 6) for v in offsets[:3]))
+
+    def set_xy_rotation(self, theta):
+        gremlin.StatCanon.set_xy_rotation(self, theta)
+        self.rotation_states.add(round(theta, 6))
+
+    def offsets_fixed(self, active_index):
+        # the program ran in the active coordinate system and changed no offsets
+        return len(self.g5x_states) <= 1 and len(self.g92_states) <= 1 and len(self.rotation_states) <= 1 and \
+               all(state[0] == active_index for state in self.g5x_states)
+
+    def dwell(self, arg):
+        # the dwell list has no durations, keep the total for the run time estimate
+        self.dwell_seconds += arg
+        gremlin.StatCanon.dwell(self, arg)
+
+
+def count_lines(filename):
+    lines = 0
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), ''):
+            lines += block.count('\n')
+    return lines
+
+
+def called_names(filename):
+    # names of the subroutines filename calls
+    names = set()
+    tail = ''
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), ''):
+            # a call split across two reads is matched with the next one
+            block = tail + block
+            cut = block.rfind('\n') + 1
+            tail = block[cut:]
+            names.update(name.lower() for name in CALL_RE.findall(block, 0, cut))
+    names.update(name.lower() for name in CALL_RE.findall(tail))
+    return names
+
+
+def subroutine_files(filename, directories):
+    # the files of the subroutines filename calls, directly or through other subroutines
+    files = []
+    seen = called_names(filename)
+    pending = list(seen)
+    while pending:
+        name = pending.pop()
+        for directory in directories:
+            path = os.path.join(directory, name + '.ngc')
+            if os.path.isfile(path):
+                files.append(path)
+                for called in called_names(path) - seen:
+                    seen.add(called)
+                    pending.append(called)
+                break
+    return sorted(files)
+
+
+def _send(conn, message, cache_writer):
+    data = cPickle.dumps(message, cPickle.HIGHEST_PROTOCOL)
+    conn.send_bytes(data)
+    if cache_writer is not None:
+        cache_writer.write(data)
+
+
+def _send_segments(conn, message, segments, cache_writer):
+    # segments in chunks, as message + (chunk,)
+    for start in range(0, len(segments), CHUNK_SIZE):
+        _send(conn, message + (segments[start:start + CHUNK_SIZE],), cache_writer)
+
+
+def _parse_worker(conn, job):
+    # runs in the child process
+    td = tempfile.mkdtemp()
+    cache_writer = None
+    try:
+        var_params = {}
+        if job.parameter_file:
+            var_params = work_offsets.parse_var_file(job.parameter_file) or {}
+        if job.cache is not None:
+            subroutines = subroutine_files(job.filename, job.subroutine_dirs)
+            key = job.cache.key(job.filename, job.cache_settings(var_params), subroutines)
+            records = job.cache.read(key)
+            if records is not None:
+                # hit - the stored messages go out as they are
+                for data in records:
+                    conn.send_bytes(data)
+                return
+            cache_writer = job.cache.writer(key)
+
+        # counted here rather than on the GTK thread, it reads the whole program
+        total_lines = count_lines(job.filename)
+        canon = progress_canon(conn, total_lines, job.colors, job.geometry, job.lathe_option, job.stat, job.random)
+        # parse against a copy of the var file, like gremlin.load()
+        temp_parameter = os.path.join(td, os.path.basename(job.parameter_file or 'linuxcnc.var'))
+        if job.parameter_file:
+            shutil.copy(job.parameter_file, temp_parameter)
+        canon.parameter_file = temp_parameter
+        result, seq = gcode.parse(job.filename, canon, job.unitcode, job.initcode)
+        for name in SEGMENT_LISTS:
+            _send_segments(conn, ('segments', name), getattr(canon, name), cache_writer)
+        offsets = work_offsets.active_offsets(var_params)
+        fixed = canon.offsets_fixed(int(var_params.get(work_offsets.G5X_ACTIVE_PARAM, 1)))
+        if not fixed and cache_writer is not None:
+            # the geometry depends on offsets the cache key leaves out
+            cache_writer.discard()
+            cache_writer = None
+        _send(conn, ('done', result, seq, list(getattr(canon, 'warnings', [])), offsets, fixed), cache_writer)
+        if result <= gcode.MIN_ERROR:
+            segments = dict((name, getattr(canon, name)) for name in SEGMENT_LISTS)
+            lods = toolpath_lod.reduce_segments(segments, toolpath_lod.path_diagonal(segments))
+            for level, (tolerance, reduced) in enumerate(lods):
+                _send(conn, ('lod', tolerance), cache_writer)
+                for name in toolpath_lod.REDUCED_LISTS:
+                    _send_segments(conn, ('lod_segments', level, name), reduced[name], cache_writer)
+            _send(conn, ('lod_done',), cache_writer)
+        if job.limits is not None and result <= gcode.MIN_ERROR:
+            segments = dict((name, getattr(canon, name)) for name in SEGMENT_LISTS)
+            analysis = preflight.analyze(segments, canon.dwell_seconds, preflight.program_tools(job.filename), job.limits)
+            _send(conn, ('preflight', analysis), cache_writer)
+        if cache_writer is not None:
+            cache_writer.commit()
+            cache_writer = None
+    except Exception:
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        if cache_writer is not None:
+            cache_writer.discard()
+        shutil.rmtree(td, ignore_errors=True)
+        conn.close()
+
+
+class preview_loader:
+    def __init__(self):
+        self.process = None
+        self.conn = None
+        self.watch_id = None
+        self.parsed = None
+        self.on_progress = None
+        self.on_done = None
+        self.on_preflight = None
+        self.on_lod = None
+
+    def busy(self):
+        return self.process is not None
+
+    def start(self, job, on_progress, on_done, on_preflight=None, on_lod=None):
+        # on_progress(fraction), on_done(preview_result or None), on_preflight(preflight_result)
+        # and on_lod(preview_result with its lods filled in) are called on the GTK thread
+        self.cancel()
+        self.parsed = preview_result(job.filename)
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_preflight = on_preflight
+        self.on_lod = on_lod
+        recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(target=_parse_worker, args=(send_conn, job))
+        self.process.daemon = True
+        self.process.start()
+        # only the child writes
+        send_conn.close()
+        self.conn = recv_conn
+        self.watch_id = glib.io_add_watch(recv_conn.fileno(), glib.IO_IN | glib.IO_HUP, self._on_readable)
+
+    def cancel(self):
+        if self.watch_id is not None:
+            glib.source_remove(self.watch_id)
+            self.watch_id = None
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process.join()
+            self.process = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        self.parsed = None
+
+    def _finish(self, parsed):
+        on_done = self.on_done
+        # the watch is being removed by returning False from _on_readable
+        self.watch_id = None
+        self.cancel()
+        if on_done is not None:
+            on_done(parsed)
+
+    def _on_readable(self, fd, condition):
+        # one message per dispatch so a big chunk never holds up a redraw for long
+        try:
+            message = self.conn.recv()
+        except (EOFError, IOError):
+            if self.on_done is not None:
+                print 'preview worker exited without a result'
+            self._finish(None)
+            return False
+        except Exception:
+            # e.g. a damaged cache entry that does not unpickle
+            print 'preview worker sent an unreadable message'
+            traceback.print_exc(file=sys.stdout)
+            self._finish(None)
+            return False
+
+        kind = message[0]
+        if kind == 'progress':
+            self.on_progress(message[1])
+        elif kind == 'segments':
+            self.parsed.segments[message[1]].extend(message[2])
+        elif kind == 'done':
+            parsed = self.parsed
+            parsed.result, parsed.seq, parsed.warnings, parsed.offsets, parsed.offsets_fixed = message[1:]
+            on_done = self.on_done
+            # reduced copies and a pre-flight analysis may still follow, the geometry is handed over now
+            self.on_done = None
+            on_done(parsed)
+        elif kind == 'lod':
+            self.parsed.lods.append((message[1], dict((name, []) for name in toolpath_lod.REDUCED_LISTS)))
+        elif kind == 'lod_segments':
+            self.parsed.lods[message[1]][1][message[2]].extend(message[3])
+        elif kind == 'lod_done':
+            if self.on_lod is not None:
+                self.on_lod(self.parsed)
+        elif kind == 'preflight':
+            on_preflight = self.on_preflight
+            self._finish(None)
+            if on_preflight is not None:
+                on_preflight(message[1])
+            return False
+        elif kind == 'error':
+            print 'preview worker raised an exception'
+            sys.stdout.write(message[1])
+            self._finish(None)
+            return False
+        return True
@@ -0,0 +1,201 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Probe tuning sequences
+#
+# Tuning a probe takes many short probing moves, each depending on where
+# the one before touched.  A sequence is a generator that yields MDI
+# commands one at a time and is sent the status snapshot once the
+# interpreter has finished each of them, so it can read probed_position.
+# probe_sequence runs one on a glib timer on the GTK thread.
+#
+# fine_feed_tuning() probes one edge repeatedly at fine feeds falling from
+# half the rough feed and keeps the fastest whose spread stays within the
+# target repeatability.
+#
+# latency_calibration() touches one edge at several feeds.  The probe
+# triggers a fixed time after it reaches the edge, so it reads further past
+# the edge the faster it moves; a straight line fitted through touch
+# position against speed gives that latency, and the correction for any
+# feed after it.
+#
+# Distances are in inches and feeds in inches per minute, scaled to the
+# active units only in the commands.
+#
+
+import glib
+import linuxcnc
+
+
+SEQUENCE_INTERVAL_MS = 100
+
+# fine feeds tried, as fractions of the rough feed, fastest first
+FINE_FEED_FRACTIONS = (1.0 / 2, 1.0 / 4, 1.0 / 8, 1.0 / 12, 1.0 / 20)
+
+TUNING_REPEATS = 5
+
+# inches, the spread of repeated touches a fine feed must stay within
+DEFAULT_REPEATABILITY = 0.0002
+
+# feeds latency is calibrated at, as fractions of the rough feed
+CALIBRATION_FEED_FRACTIONS = (1.0, 3.0 / 4, 1.0 / 2, 1.0 / 4, 1.0 / 8)
+
+CALIBRATION_REPEATS = 3
+
+
+class probe_error(Exception):
+    pass
+
+
+class probe_sequence:
+    def __init__(self, status, issue_mdi):
+        # status is an unlatched status_view
+        self.status = status
+        self.issue_mdi = issue_mdi
+        self.timer_id = None
+        self.steps = None
+
+    def busy(self):
+        return self.timer_id is not None
+
+    def start(self, steps, on_done, on_error, recover=None):
+        # on_done() and on_error(message) are called on the GTK thread; recover is an MDI
+        # command issued when a probing move misses, to put back modes the sequence changed
+        self.cancel()
+        self.steps = steps
+        self.recover = recover
+        self.on_done = on_done
+        self.on_error = on_error
+        if self._next(None):
+            self.timer_id = glib.timeout_add(SEQUENCE_INTERVAL_MS, self._on_timer)
+
+    def cancel(self):
+        if self.timer_id is not None:
+            glib.source_remove(self.timer_id)
+            self.timer_id = None
+        if self.steps is not None:
+            self.steps.close()
+            self.steps = None
+
+    def _next(self, status):
+        # issue the next command, False once the sequence has ended
+        try:
+            command = self.steps.send(status)
+        except StopIteration:
+            self.steps = None
+            self.on_done()
+            return False
+        except probe_error as e:
+            self.steps = None
+            if self.recover:
+                self.issue_mdi(self.recover)
+            self.on_error(str(e))
+            return False
+        self.issue_mdi(command)
+        # give status a poll to pick up the command just issued
+        self.settle = True
+        return True
+
+    def _on_timer(self):
+        status = self.status.snapshot()
+        if status.task_state != linuxcnc.STATE_ON:
+            self.timer_id = None
+            self.steps.close()
+            self.steps = None
+            self.on_error('the machine was turned off')
+            return False
+        if self.settle:
+            self.settle = False
+            return True
+        if status.interp_state != linuxcnc.INTERP_IDLE:
+            return True
+        if self._next(status):
+            return True
+        self.timer_id = None
+        return False
+
+
+def touched(status, axis):
+    # machine position on axis where the probing command just finished touched
+    if not status.probe_tripped:
+        raise probe_error('the probe did not touch')
+    return status.probed_position[axis]
+
+
+def probe_move(letter, distance, feed, scalar):
+    return 'G91 G38.2 %s%.4f F%.3f' % (letter, distance * scalar, feed * scalar)
+
+
+def rapid_move(letter, distance, scalar):
+    return 'G91 G0 %s%.4f' % (letter, distance * scalar)
+
+
+class tuning_result:
+    def __init__(self):
+        # (fine feed, spread) per feed tried
+        self.spreads = []
+        # fastest fine feed meeting the target, None if none did
+        self.fine_feed = None
+
+
+def fine_feed_tuning(result, axis, direction, profile, search, repeats, target, scalar):
+    # direction is 1 or -1, the way the probe moves onto the edge along axis
+    letter = 'XYZ'[axis]
+    status = yield 'G91'
+    status = yield probe_move(letter, direction * search, profile.rough, scalar)
+    touched(status, axis)
+    for fraction in FINE_FEED_FRACTIONS:
+        feed = profile.rough * fraction
+        readings = []
+        for ix in range(repeats):
+            yield rapid_move(letter, -direction * profile.retract, scalar)
+            status = yield probe_move(letter, direction * 2 * profile.retract, feed, scalar)
+            readings.append(touched(status, axis))
+        spread = max(readings) - min(readings)
+        result.spreads.append((feed, spread))
+        if spread <= target:
+            result.fine_feed = feed
+            break
+    yield rapid_move(letter, -direction * profile.retract, scalar)
+    yield 'G90'
+
+
+class latency_result:
+    def __init__(self):
+        # (speed in inches per second, touch position) per touch
+        self.readings = []
+        # seconds, None if the readings could not be fitted
+        self.latency = None
+        # machine position of the edge itself
+        self.edge = None
+
+
+def fit_latency(readings, direction):
+    # least squares fit of touch = edge + direction * latency * speed, (latency, edge)
+    count = len(readings)
+    mean_speed = sum(speed for speed, position in readings) / count
+    mean_position = sum(position for speed, position in readings) / count
+    sxx = sum((speed - mean_speed) ** 2 for speed, position in readings)
+    if sxx < 1e-12:
+        return None
+    slope = sum((speed - mean_speed) * (position - mean_position) for speed, position in readings) / sxx
+    return direction * slope, mean_position - slope * mean_speed
+
+
+def latency_calibration(result, axis, direction, profile, search, scalar):
+    # direction is 1 or -1, the way the probe moves onto the edge along axis
+    letter = 'XYZ'[axis]
+    status = yield 'G91'
+    status = yield probe_move(letter, direction * search, profile.rough, scalar)
+    touched(status, axis)
+    for fraction in CALIBRATION_FEED_FRACTIONS:
+        feed = profile.rough * fraction
+        for ix in range(CALIBRATION_REPEATS):
+            yield rapid_move(letter, -direction * profile.retract, scalar)
+            status = yield probe_move(letter, direction * 2 * profile.retract, feed, scalar)
+            result.readings.append((feed / 60.0, touched(status, axis)))
+    yield rapid_move(letter, -direction * profile.retract, scalar)
+    yield 'G90'
+    fit = fit_latency(result.readings, direction)
+    if fit is not None:
+        result.latency, result.edge = fit
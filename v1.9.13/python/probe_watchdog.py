@@ -0,0 +1,103 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Probe cycle watchdog
+#
+# A probing routine is an O-word subroutine started by one MDI command,
+# after which the UI has no view of how it is getting on.  The watchdog
+# follows the routine from the MDI command to the interpreter going idle
+# again, times how long it took to start, how long it spent in probing
+# moves and in other moves, and calls on_overrun when it runs past its
+# timeout so the UI can stop the machine.  Time held in feedhold is left
+# out of the timeout, the operator meant it.
+#
+
+import time
+import glib
+import linuxcnc
+
+
+WATCH_INTERVAL_MS = 100
+
+# seconds; a command the interpreter has not picked up by then was refused
+START_TIMEOUT = 2.0
+
+# stat.motion_type of G38.x moves
+MOTION_TYPE_PROBING = 5
+
+
+class probe_timing:
+    def __init__(self, name):
+        self.name = name
+        # seconds from the MDI command to the interpreter starting on it
+        self.start_seconds = 0.0
+        self.probing_seconds = 0.0
+        self.moving_seconds = 0.0
+        self.paused_seconds = 0.0
+        self.total_seconds = 0.0
+
+    def __str__(self):
+        return '%s: %.1f s to start, %.1f s probing, %.1f s in other moves, %.1f s paused, %.1f s in all' % \
+               (self.name, self.start_seconds, self.probing_seconds, self.moving_seconds, self.paused_seconds,
+                self.total_seconds)
+
+
+class probe_watchdog:
+    def __init__(self, status, on_done, on_overrun):
+        # status is an unlatched status_view; on_done(timing) and on_overrun(timing, timeout)
+        # are called on the GTK thread
+        self.status = status
+        self.on_done = on_done
+        self.on_overrun = on_overrun
+        self.timer_id = None
+        self.timing = None
+
+    def busy(self):
+        return self.timer_id is not None
+
+    def start(self, name, timeout):
+        self.cancel()
+        self.timing = probe_timing(name)
+        self.timeout = timeout
+        self.issued = time.time()
+        self.started = None
+        self.last = self.issued
+        self.timer_id = glib.timeout_add(WATCH_INTERVAL_MS, self._on_timer)
+
+    def cancel(self):
+        if self.timer_id is not None:
+            glib.source_remove(self.timer_id)
+            self.timer_id = None
+
+    def _on_timer(self):
+        now = time.time()
+        status = self.status.snapshot()
+        idle = status.interp_state == linuxcnc.INTERP_IDLE
+        timing = self.timing
+        if self.started is None:
+            if idle:
+                if now - self.issued > START_TIMEOUT:
+                    self.timer_id = None
+                    return False
+                return True
+            self.started = now
+            self.last = now
+            timing.start_seconds = now - self.issued
+        elapsed = now - self.last
+        self.last = now
+        if status.paused:
+            timing.paused_seconds += elapsed
+        elif status.motion_type == MOTION_TYPE_PROBING:
+            timing.probing_seconds += elapsed
+        elif status.current_vel != 0:
+            timing.moving_seconds += elapsed
+        timing.total_seconds = now - self.issued
+        if idle:
+            self.timer_id = None
+            self.on_done(timing)
+            return False
+        if now - self.started - timing.paused_seconds > self.timeout:
+            self.timer_id = None
+            self.on_overrun(timing, self.timeout)
+            return False
+        return True
@@ -10,20 +10,36 @@
 # for debugging within Wing IDE
 #import wingdbstub
 
+import re
 import time
 import sys
 import gtk
 import math
 from constants import *
 import linuxcnc
+import probe_tuning
 
 
+# seconds the probe watchdog lets a routine run, G_ZERO_TIMEOUT for the tool setter routines
 PROBING_TIMEOUT = 200
 G_ZERO_TIMEOUT = 200
 CLEAR_DIST_OFFSET = 0.25
 PROBE_SEARCH_INCREMENT = 0.50
 X_Y_PROBE_OFFSET = 0.30
 
+# furthest a corner probe searches for each edge, inches; the probe_search_distance preference
+DEFAULT_PROBE_SEARCH_DISTANCE = 2.0
+
+# the probe's feeds, inches per minute, and the retract before the fine pass, inches, are the
+# probe_rough_feed, probe_fine_feed and probe_retract preferences; a feed of 0 leaves the rough
+# pass at the DRO feed and the fine pass FINE_FEED_DIVISOR times slower
+DEFAULT_PROBE_RETRACT = 0.050
+FINE_FEED_DIVISOR = 20.0
+
+# trigger latency in seconds per axis and direction, probe_latency_X+ and so on, is measured by
+# PROBECAL; with probe_single_pass set the corner probe skips the fine pass and corrects its
+# rough touches for the latency instead
+
 
 def execute_probe_oword(self, oword, needs_tip_dia=False):
     if self.status.probe_val:
@@ -38,7 +54,7 @@ def execute_probe_oword(self, oword, needs_tip_dia=False):
             return
 
     feedrate = check_max_feedrate(self)
-    self.issue_mdi(oword + 'call [%f]' % (feedrate))
+    issue_probe_mdi(self, oword + 'call [%f]' % (feedrate))
     
 def execute_ets_oword(self, oword):
     if self.status.probe_val:
@@ -49,7 +65,7 @@ def execute_ets_oword(self, oword):
     if self.status.gcodes[5] == 210: g21_scalar = 25.4    
     ets_height = self.ets_height * g21_scalar
     limit = self.status.axis[2]['min_position_limit']
-    self.issue_mdi(oword + 'call [%f] [%f] [%f]' % (feedrate, ets_height, limit))
+    issue_probe_mdi(self, oword + 'call [%f] [%f] [%f]' % (feedrate, ets_height, limit), G_ZERO_TIMEOUT)
     
 def execute_probe_setup_oword(self, oword):
     if self.status.probe_val:
@@ -61,7 +77,15 @@ def execute_probe_setup_oword(self, oword):
     
     ref_surface = g21_scalar * self.probe_setup_reference_surface
     limit = self.status.axis[2]['min_position_limit']
-    self.issue_mdi(oword + 'call [%f] [%f] [%f]' % (feedrate, ref_surface, limit))
+    issue_probe_mdi(self, oword + 'call [%f] [%f] [%f]' % (feedrate, ref_surface, limit), G_ZERO_TIMEOUT)
+
+OWORD_NAME_RE = re.compile(r'o<([^>]+)>', re.IGNORECASE)
+
+def issue_probe_mdi(self, command, timeout=PROBING_TIMEOUT):
+    # start a probing routine with the watchdog following it
+    self.issue_mdi(command)
+    match = OWORD_NAME_RE.match(command)
+    self.probe_watchdog.start(match.group(1) if match else command, timeout)
 
 def check_probe_ready(self):
     okay = False
@@ -82,65 +106,226 @@ def check_probe_dia(self):
     okay = True
     return okay
 
-def find_corner(self):
+# corner probing from outside the part, by corner: (x, y) direction the probe moves onto the sides
+CORNER_DIRECTIONS = {
+    'northwest': (1, -1),
+    'northeast': (-1, -1),
+    'southeast': (-1, 1),
+    'southwest': (1, 1),
+}
+
+def limits_snapshot(self):
+    # ((min, max) for X, Y, Z) read from one status snapshot
+    axis = self.status.axis
+    return tuple((axis[ix]['min_position_limit'], axis[ix]['max_position_limit']) for ix in range(3))
+
+def find_corner_xy(self, corner):
     ready = check_probe_ready(self)
     if not ready:
         return
     tip_okay = check_probe_dia(self)
     if not tip_okay:
         return
-    feedrate = check_max_feedrate(self)
-    xlimit = self.status.axis[0]['max_position_limit']
-    ylimit = self.status.axis[1]['max_position_limit']
-    self.issue_mdi('o<probe_corner> call [%f] [%f] [%f]' % (feedrate, xlimit, ylimit))
+    g21_scalar = 1
+    if self.status.gcodes[5] == 210: g21_scalar = 25.4
+    profile = probe_feed_profile(self)
+    x_dir, y_dir = CORNER_DIRECTIONS[corner]
+    x_latency = probe_latency(self, 0, x_dir)
+    y_latency = probe_latency(self, 1, y_dir)
+    single_pass = self.prefs.get_bool('probe_single_pass')
+    if single_pass and (x_latency is None or y_latency is None):
+        self.error_handler.write("Probe latency is not calibrated for this corner, probing with a fine pass.  Use PROBECAL to calibrate.", ALARM_LEVEL_LOW)
+        single_pass = False
+    limits = limits_snapshot(self)
+    # search toward the limit the probe moves to, in PROBE_SEARCH_INCREMENT steps out to the search distance
+    xlimit = limits[0][1] if x_dir > 0 else limits[0][0]
+    ylimit = limits[1][1] if y_dir > 0 else limits[1][0]
+    issue_probe_mdi(self, 'o<probe_corner_xy> call [%f] [%f] [%f] [%d] [%d] [%f] [%f] [%f] [%f] [%f] [%f] [%d]' %
+                          (profile.rough * g21_scalar, xlimit, ylimit, x_dir, y_dir, probe_search_distance(self), PROBE_SEARCH_INCREMENT,
+                           profile.fine * g21_scalar, profile.retract, x_latency or 0.0, y_latency or 0.0, single_pass))
+
+def probe_latency(self, axis, direction):
+    # seconds, None if not calibrated
+    return self.prefs.get_float('probe_latency_%s%s' % ('XYZ'[axis], '+' if direction > 0 else '-'), None)
+
+def probe_search_distance(self):
+    return self.prefs.get_float('probe_search_distance', DEFAULT_PROBE_SEARCH_DISTANCE)
+
+class feed_profile:
+    def __init__(self, rough, fine, retract):
+        self.rough = rough
+        self.fine = fine
+        self.retract = retract
+
+def probe_feed_profile(self):
+    # inches per minute and inches, whatever the active units
+    rough = self.prefs.get_float('probe_rough_feed', 0.0)
+    if rough <= 0:
+        g21_scalar = 1
+        if self.status.gcodes[5] == 210: g21_scalar = 25.4
+        rough = check_max_feedrate(self) / g21_scalar
+    rough = min(rough, MAX_PROBING_FEEDRATE)
+    fine = self.prefs.get_float('probe_fine_feed', 0.0)
+    if fine <= 0 or fine > rough:
+        fine = rough / FINE_FEED_DIVISOR
+    retract = self.prefs.get_float('probe_retract', DEFAULT_PROBE_RETRACT)
+    return feed_profile(rough, fine, retract)
+
+def probe_admin_command(self, command_text):
+    # probe settings and tuning from the MDI line
+    return probe_search_command(self, command_text) or probe_feeds_command(self, command_text) or \
+           probe_tune_command(self, command_text) or probe_calibrate_command(self, command_text) or \
+           probe_single_pass_command(self, command_text)
+
+def probe_search_command(self, command_text):
+    # PROBESEARCH <distance> from the MDI line
+    words = command_text.upper().split()
+    if len(words) != 2 or words[0] != 'PROBESEARCH':
+        return False
+    try:
+        distance = float(words[1])
+    except ValueError:
+        distance = 0.0
+    if distance < PROBE_SEARCH_INCREMENT:
+        self.error_handler.write("PROBESEARCH needs a distance in inches of at least %.2f" % PROBE_SEARCH_INCREMENT, ALARM_LEVEL_LOW)
+        return True
+    self.prefs.set('probe_search_distance', str(distance))
+    self.error_handler.write("Corner probes search up to %.4f for each edge" % distance, ALARM_LEVEL_LOW)
+    self.mdi_line.set_text("")
+    return True
+
+def probe_feeds_command(self, command_text):
+    # PROBEFEEDS <rough> <fine> <retract> in inches, a feed of 0 for the default
+    words = command_text.upper().split()
+    if not words or words[0] != 'PROBEFEEDS':
+        return False
+    try:
+        rough, fine, retract = [float(word) for word in words[1:]]
+    except ValueError:
+        rough = fine = retract = -1.0
+    if rough < 0 or fine < 0 or retract <= 0 or rough > MAX_PROBING_FEEDRATE:
+        self.error_handler.write("PROBEFEEDS needs a rough feed up to %i, a fine feed and a retract, in inches; 0 for a default feed" % MAX_PROBING_FEEDRATE, ALARM_LEVEL_LOW)
+        return True
+    self.prefs.set('probe_rough_feed', str(rough))
+    self.prefs.set('probe_fine_feed', str(fine))
+    self.prefs.set('probe_retract', str(retract))
+    profile = probe_feed_profile(self)
+    self.error_handler.write("Probing rough at %.2f, fine at %.2f, retracting %.4f" % (profile.rough, profile.fine, profile.retract), ALARM_LEVEL_LOW)
+    self.mdi_line.set_text("")
+    return True
+
+def parse_probe_direction(word):
+    # 'X+' -> (0, 1), None if word is not an axis and direction
+    if len(word) != 2 or word[0] not in 'XYZ' or word[1] not in '+-':
+        return None
+    return 'XYZ'.index(word[0]), 1 if word[1] == '+' else -1
+
+def check_probe_sequence_ready(self):
+    if not (self.x_referenced and self.y_referenced and self.z_referenced):
+        self.error_handler.write("Must reference X, Y, and Z axes before tuning the probe.", ALARM_LEVEL_MEDIUM)
+        return False
+    if self.probe_sequence.busy() or self.moving():
+        self.error_handler.write("Cannot tune the probe while the machine is busy.", ALARM_LEVEL_LOW)
+        return False
+    return check_probe_ready(self)
+
+def probe_tune_command(self, command_text):
+    # PROBETUNE X+|X-|Y+|Y-|Z- [repeatability], with the probe within the search distance of an edge
+    words = command_text.upper().split()
+    if not words or words[0] != 'PROBETUNE':
+        return False
+    direction = parse_probe_direction(words[1]) if len(words) in (2, 3) else None
+    try:
+        target = float(words[2]) if len(words) == 3 else probe_tuning.DEFAULT_REPEATABILITY
+    except ValueError:
+        target = 0.0
+    if direction is None or direction == (2, 1) or target <= 0:
+        self.error_handler.write("PROBETUNE needs the direction to probe in, X+, X-, Y+, Y- or Z-, and optionally the repeatability in inches", ALARM_LEVEL_LOW)
+        return True
+    self.mdi_line.set_text("")
+    if not check_probe_sequence_ready(self):
+        return True
+    g21_scalar = 1
+    if self.status.gcodes[5] == 210: g21_scalar = 25.4
+    profile = probe_feed_profile(self)
+    axis, sign = direction
+    result = probe_tuning.tuning_result()
+    steps = probe_tuning.fine_feed_tuning(result, axis, sign, profile, probe_search_distance(self),
+                                          probe_tuning.TUNING_REPEATS, target, g21_scalar)
+    self.probe_sequence.start(steps, lambda: probe_tune_done(self, result, target),
+                              lambda message: self.error_handler.write("Probe tuning stopped: %s" % message, ALARM_LEVEL_MEDIUM),
+                              recover='G90')
+    return True
+
+def probe_tune_done(self, result, target):
+    for feed, spread in result.spreads:
+        print 'probe tuning: fine feed %.2f, spread %.5f' % (feed, spread)
+    if result.fine_feed is None:
+        self.error_handler.write("No fine feed repeated to within %.5f, the fine feed is left as it was" % target, ALARM_LEVEL_LOW)
+        return
+    self.prefs.set('probe_fine_feed', '%.3f' % result.fine_feed)
+    self.error_handler.write("Fine probing feed set to %.2f, repeating to within %.5f" % (result.fine_feed, result.spreads[-1][1]), ALARM_LEVEL_LOW)
+
+def probe_calibrate_command(self, command_text):
+    # PROBECAL X+|X-|Y+|Y-|Z-, with the probe within the search distance of an edge
+    words = command_text.upper().split()
+    if not words or words[0] != 'PROBECAL':
+        return False
+    direction = parse_probe_direction(words[1]) if len(words) == 2 else None
+    if direction is None or direction == (2, 1):
+        self.error_handler.write("PROBECAL needs the direction to probe in, X+, X-, Y+, Y- or Z-", ALARM_LEVEL_LOW)
+        return True
+    self.mdi_line.set_text("")
+    if not check_probe_sequence_ready(self):
+        return True
+    g21_scalar = 1
+    if self.status.gcodes[5] == 210: g21_scalar = 25.4
+    axis, sign = direction
+    result = probe_tuning.latency_result()
+    steps = probe_tuning.latency_calibration(result, axis, sign, probe_feed_profile(self), probe_search_distance(self), g21_scalar)
+    self.probe_sequence.start(steps, lambda: probe_calibrate_done(self, words[1], result),
+                              lambda message: self.error_handler.write("Probe calibration stopped: %s" % message, ALARM_LEVEL_MEDIUM),
+                              recover='G90')
+    return True
+
+def probe_calibrate_done(self, direction, result):
+    for speed, position in result.readings:
+        print 'probe calibration %s: %.2f ipm touched at %.5f' % (direction, speed * 60.0, position)
+    if result.latency is None:
+        self.error_handler.write("Probe calibration %s could not fit the touches, nothing was changed" % direction, ALARM_LEVEL_LOW)
+        return
+    # a negative fit is noise around no latency at all
+    latency = max(result.latency, 0.0)
+    self.prefs.set('probe_latency_%s' % direction, '%.6f' % latency)
+    self.error_handler.write("Probe trigger latency %s is %.2f ms" % (direction, latency * 1000.0), ALARM_LEVEL_LOW)
+
+def probe_single_pass_command(self, command_text):
+    # PROBESINGLE ON|OFF
+    words = command_text.upper().split()
+    if not words or words[0] != 'PROBESINGLE':
+        return False
+    if len(words) != 2 or words[1] not in ('ON', 'OFF'):
+        self.error_handler.write("PROBESINGLE needs ON or OFF", ALARM_LEVEL_LOW)
+        return True
+    self.prefs.set('probe_single_pass', words[1] == 'ON')
+    self.error_handler.write("Corner probes %s" % ('touch once, corrected for latency' if words[1] == 'ON' else 'touch twice, rough then fine'), ALARM_LEVEL_LOW)
+    self.mdi_line.set_text("")
+    return True
+
+def find_corner(self):
+    find_corner_xy(self, 'southwest')
 
 def find_corner_northwest(self):
-    ready = check_probe_ready(self)
-    if not ready:
-        return
-    tip_okay = check_probe_dia(self)
-    if not tip_okay:
-        return
-    feedrate = check_max_feedrate(self)
-    xlimit = self.status.axis[0]['max_position_limit']
-    ylimit = self.status.axis[1]['min_position_limit']
-    self.issue_mdi('o<probe_corner_northwest> call [%f] [%f] [%f]' % (feedrate, xlimit, ylimit))
-    
+    find_corner_xy(self, 'northwest')
+
 def find_corner_southwest(self):
-    ready = check_probe_ready(self)
-    if not ready:
-        return
-    tip_okay = check_probe_dia(self)
-    if not tip_okay:
-        return
-    feedrate = check_max_feedrate(self)
-    xlimit = self.status.axis[0]['max_position_limit']
-    ylimit = self.status.axis[1]['max_position_limit']
-    self.issue_mdi('o<probe_corner_southwest> call [%f] [%f] [%f]' % (feedrate, xlimit, ylimit))
+    find_corner_xy(self, 'southwest')
 
 def find_corner_southeast(self):
-    ready = check_probe_ready(self)
-    if not ready:
-        return
-    tip_okay = check_probe_dia(self)
-    if not tip_okay:
-        return
-    feedrate = check_max_feedrate(self)
-    xlimit = self.status.axis[0]['min_position_limit']
-    ylimit = self.status.axis[1]['max_position_limit']
-    self.issue_mdi('o<probe_corner_southeast> call [%f] [%f] [%f]' % (feedrate, xlimit, ylimit))
-    
+    find_corner_xy(self, 'southeast')
+
 def find_corner_northeast(self):
-    ready = check_probe_ready(self)
-    if not ready:
-        return
-    tip_okay = check_probe_dia(self)
-    if not tip_okay:
-        return
-    feedrate = check_max_feedrate(self)
-    xlimit = self.status.axis[0]['min_position_limit']
-    ylimit = self.status.axis[1]['min_position_limit']
-    self.issue_mdi('o<probe_corner_northeast> call [%f] [%f] [%f]' % (feedrate, xlimit, ylimit))    
+    find_corner_xy(self, 'northeast')
 
 def find_x_plus_origin(self):
     ready = check_probe_ready(self)
@@ -151,7 +336,7 @@ def find_x_plus_origin(self):
         return
     feedrate = check_max_feedrate(self)
     limit = self.status.axis[0]['max_position_limit']
-    self.issue_mdi('o<probe_x_plus_origin> call [%f] [%f]' % (feedrate, limit))
+    issue_probe_mdi(self, 'o<probe_x_plus_origin> call [%f] [%f]' % (feedrate, limit))
 
 def find_x_minus_origin(self):
     ready = check_probe_ready(self)
@@ -162,7 +347,7 @@ def find_x_minus_origin(self):
         return
     feedrate = check_max_feedrate(self)
     limit = self.status.axis[0]['min_position_limit']
-    self.issue_mdi('o<probe_x_minus_origin> call [%f] [%f]' % (feedrate, limit))
+    issue_probe_mdi(self, 'o<probe_x_minus_origin> call [%f] [%f]' % (feedrate, limit))
 
 def find_y_plus_origin(self):
     ready = check_probe_ready(self)
@@ -173,7 +358,7 @@ def find_y_plus_origin(self):
         return
     feedrate = check_max_feedrate(self)
     limit = self.status.axis[1]['max_position_limit']
-    self.issue_mdi('o<probe_y_plus_origin> call [%f] [%f]' % (feedrate, limit))
+    issue_probe_mdi(self, 'o<probe_y_plus_origin> call [%f] [%f]' % (feedrate, limit))
 
 def find_y_minus_origin(self):
     ready = check_probe_ready(self)
@@ -184,7 +369,7 @@ def find_y_minus_origin(self):
         return
     feedrate = check_max_feedrate(self)
     limit = self.status.axis[1]['min_position_limit']
-    self.issue_mdi('o<probe_y_minus_origin> call [%f] [%f]' % (feedrate, limit))
+    issue_probe_mdi(self, 'o<probe_y_minus_origin> call [%f] [%f]' % (feedrate, limit))
 
 def find_z_minus_origin(self):
     ready = check_probe_ready(self)
@@ -193,8 +378,8 @@ def find_z_minus_origin(self):
     # tip dia not required for Z
     feedrate = check_max_feedrate(self)
     limit = self.status.axis[2]['min_position_limit']
-    self.issue_mdi('o<probe_z_minus_origin> call [%f] [%f]' %
-                   (feedrate, limit))
+    issue_probe_mdi(self, 'o<probe_z_minus_origin> call [%f] [%f]' %
+                          (feedrate, limit))
 
 def find_pocket_center(self):
     ready = check_probe_ready(self)
@@ -206,7 +391,7 @@ def find_pocket_center(self):
     xminlimit = self.status.axis[0]['min_position_limit']
     ymaxlimit = self.status.axis[1]['max_position_limit']
     yminlimit = self.status.axis[1]['min_position_limit']
-    self.issue_mdi('o<probe_pocket> call [%f] [%f] [%f] [%f] [%f]' % (feedrate, xmaxlimit, xminlimit, ymaxlimit , yminlimit))
+    issue_probe_mdi(self, 'o<probe_pocket> call [%f] [%f] [%f] [%f] [%f]' % (feedrate, xmaxlimit, xminlimit, ymaxlimit , yminlimit))
 
 def find_pocket_x_center(self):
     ready = check_probe_ready(self)
@@ -216,7 +401,7 @@ def find_pocket_x_center(self):
     feedrate = check_max_feedrate(self)
     xmaxlimit = self.status.axis[0]['max_position_limit']
     xminlimit = self.status.axis[0]['min_position_limit']
-    self.issue_mdi('o<probe_pocket_x> call [%f] [%f] [%f]' % (feedrate, xmaxlimit, xminlimit))
+    issue_probe_mdi(self, 'o<probe_pocket_x> call [%f] [%f] [%f]' % (feedrate, xmaxlimit, xminlimit))
 
 def find_pocket_y_center(self):
     ready = check_probe_ready(self)
@@ -226,7 +411,7 @@ def find_pocket_y_center(self):
     feedrate = check_max_feedrate(self)
     ymaxlimit = self.status.axis[1]['max_position_limit']
     yminlimit = self.status.axis[1]['min_position_limit']
-    self.issue_mdi('o<probe_pocket_y> call [%f] [%f] [%f]' % (feedrate, ymaxlimit, yminlimit))
+    issue_probe_mdi(self, 'o<probe_pocket_y> call [%f] [%f] [%f]' % (feedrate, ymaxlimit, yminlimit))
 
 def find_work_z(self):
     find_z_minus(self)
@@ -241,8 +426,8 @@ def find_rect_boss_center(self):
     xminlimit = self.status.axis[0]['min_position_limit']
     ymaxlimit = self.status.axis[1]['max_position_limit']
     yminlimit = self.status.axis[1]['min_position_limit']
-    self.issue_mdi('o<probe_boss> call [%f] [%f] [%f] [%f] [%f]' %
-                   (feedrate, xmaxlimit, xminlimit, ymaxlimit , yminlimit))
+    issue_probe_mdi(self, 'o<probe_boss> call [%f] [%f] [%f] [%f] [%f]' %
+                          (feedrate, xmaxlimit, xminlimit, ymaxlimit , yminlimit))
 
 def find_circ_boss_center(self):
     ready = check_probe_ready(self)
@@ -256,8 +441,8 @@ def find_circ_boss_center(self):
     xminlimit = self.status.axis[0]['min_position_limit']
     ymaxlimit = self.status.axis[1]['max_position_limit']
     yminlimit = self.status.axis[1]['min_position_limit']
-    self.issue_mdi('o<probe_boss_circ> call [%f] [%f] [%f] [%f] [%f]' %
-                   (feedrate, xmaxlimit, xminlimit, ymaxlimit , yminlimit))
+    issue_probe_mdi(self, 'o<probe_boss_circ> call [%f] [%f] [%f] [%f] [%f]' %
+                          (feedrate, xmaxlimit, xminlimit, ymaxlimit , yminlimit))
 
 def find_x_plus(self):
     ready = check_probe_ready(self)
@@ -268,7 +453,7 @@ def find_x_plus(self):
         return
     feedrate = check_max_feedrate(self)
     limit = self.status.axis[0]['max_position_limit']
-    self.issue_mdi('o<probe_x_plus> call [%f] [%f]' % (feedrate, limit))
+    issue_probe_mdi(self, 'o<probe_x_plus> call [%f] [%f]' % (feedrate, limit))
 
 def find_x_minus(self):
     ready = check_probe_ready(self)
@@ -279,7 +464,7 @@ def find_x_minus(self):
         return
     feedrate = check_max_feedrate(self)
     limit = self.status.axis[0]['min_position_limit']
-    self.issue_mdi('o<probe_x_minus> call [%f] [%f]' % (feedrate, limit))
+    issue_probe_mdi(self, 'o<probe_x_minus> call [%f] [%f]' % (feedrate, limit))
 
 def find_y_plus(self):
     ready = check_probe_ready(self)
@@ -290,7 +475,7 @@ def find_y_plus(self):
         return
     feedrate = check_max_feedrate(self)
     limit = self.status.axis[1]['max_position_limit']
-    self.issue_mdi('o<probe_y_plus> call [%f] [%f]' % (feedrate, limit))
+    issue_probe_mdi(self, 'o<probe_y_plus> call [%f] [%f]' % (feedrate, limit))
 
 def find_y_minus(self):
     ready = check_probe_ready(self)
@@ -301,7 +486,7 @@ def find_y_minus(self):
         return
     feedrate = check_max_feedrate(self)
     limit = self.status.axis[1]['min_position_limit']
-    self.issue_mdi('o<probe_y_minus> call [%f] [%f]' % (feedrate, limit))
+    issue_probe_mdi(self, 'o<probe_y_minus> call [%f] [%f]' % (feedrate, limit))
 
 def find_y_plus_a(self):
     ready = check_probe_ready(self)
@@ -312,7 +497,7 @@ def find_y_plus_a(self):
         return
     feedrate = check_max_feedrate(self)
     limit = self.status.axis[1]['max_position_limit']
-    self.issue_mdi('o<probe_y_plus_a> call [%f] [%f]' % (feedrate, limit))
+    issue_probe_mdi(self, 'o<probe_y_plus_a> call [%f] [%f]' % (feedrate, limit))
 
 def find_y_plus_b(self):
     ready = check_probe_ready(self)
@@ -323,7 +508,7 @@ def find_y_plus_b(self):
         return
     feedrate = check_max_feedrate(self)
     limit = self.status.axis[1]['max_position_limit']
-    self.issue_mdi('o<probe_y_plus_b> call [%f] [%f]' % (feedrate, limit))
+    issue_probe_mdi(self, 'o<probe_y_plus_b> call [%f] [%f]' % (feedrate, limit))
 
 def find_y_plus_c(self):
     ready = check_probe_ready(self)
@@ -334,7 +519,7 @@ def find_y_plus_c(self):
         return
     feedrate = check_max_feedrate(self)
     limit = self.status.axis[1]['max_position_limit']
-    self.issue_mdi('o<probe_y_plus_c> call [%f] [%f]' % (feedrate, limit))
+    issue_probe_mdi(self, 'o<probe_y_plus_c> call [%f] [%f]' % (feedrate, limit))
 
 def find_z_minus(self):
     ready = check_probe_ready(self)
@@ -342,7 +527,7 @@ def find_z_minus(self):
         return
     feedrate = check_max_feedrate(self)
     limit = self.status.axis[2]['min_position_limit']
-    self.issue_mdi('o<probe_z_minus> call [%f] [%f]' % (feedrate, limit))
+    issue_probe_mdi(self, 'o<probe_z_minus> call [%f] [%f]' % (feedrate, limit))
 
 def find_a_axis_center(self):
     ready = check_probe_ready(self)
@@ -356,8 +541,8 @@ def find_a_axis_center(self):
     yminlimit = self.status.axis[1]['min_position_limit']
     zmaxlimit = self.status.axis[2]['max_position_limit']
     zminlimit = self.status.axis[2]['min_position_limit']
-    self.issue_mdi('o<probe_find_a_axis_center> call [%f] [%f] [%f] [%f] [%f]' %
-                   (feedrate, ymaxlimit, yminlimit, zmaxlimit , zminlimit))
+    issue_probe_mdi(self, 'o<probe_find_a_axis_center> call [%f] [%f] [%f] [%f] [%f]' %
+                          (feedrate, ymaxlimit, yminlimit, zmaxlimit , zminlimit))
   
     
 def move_and_set_probe_length(self):
@@ -0,0 +1,266 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Modal state reconstruction for starting a program part way through
+#
+# When a program is run from a line, LinuxCNC reads the lines before it
+# through the interpreter but throws away what they would have done to the
+# machine, and then takes the spindle, coolant and tool from the machine
+# as it is.  scan() reads the program up to the start line through the
+# listing's line index and tracks the modal state the earlier lines set up:
+# tool, tool length offset, spindle, coolant, feed, units, plane, distance
+# and feed modes, work offset, motion mode and the last programmed position.
+# preamble() turns that into the few MDI commands that put the machine back
+# in that state before the run resumes.
+#
+# Reading up to a line deep into a long program takes seconds, so the UI
+# runs scan() on a scan_job thread and gets the state back on the GTK
+# thread.
+#
+
+import sys
+import threading
+import traceback
+import glib
+import gcode_search
+
+
+# lines read from the file at a time while scanning
+SCAN_CHUNK_LINES = 20000
+
+WCS_CODES = ('G54', 'G55', 'G56', 'G57', 'G58', 'G59', 'G59.1', 'G59.2', 'G59.3')
+
+# O-word keywords opening and closing blocks that are not executed line by line; WHILE closes
+# the block instead when it ends an open DO with the same O number
+O_OPEN = ('SUB', 'WHILE', 'DO', 'IF', 'REPEAT')
+O_CLOSE = ('ENDSUB', 'ENDWHILE', 'ENDIF', 'ENDREPEAT')
+
+
+class modal_state:
+    def __init__(self):
+        self.units = None
+        self.plane = None
+        self.distance = 'G90'
+        self.feed_mode = None
+        self.wcs = None
+        self.motion = None
+        # tool called with M6 or M61, None if the program never changes tools before the start line
+        self.tool = None
+        self.pending_tool = None
+        # 'G43' with the H number, 'G49', or None
+        self.length_offset = None
+        self.length_offset_h = None
+        self.spindle = None
+        self.speed = None
+        self.feed = None
+        self.mist = False
+        self.flood = False
+        self.cutter_comp = False
+        # last programmed position in program coordinates, an axis is None once unknown
+        self.position = [None, None, None]
+        self.ended = False
+        # why a restart from here cannot be trusted, empty if it can
+        self.problems = []
+
+
+def _o_keyword(code):
+    # 'O100 SUB' -> ('O100', 'SUB'), (None, None) for a line that is not an O-word
+    words = code.split()
+    if len(words) > 1 and words[0].startswith('O'):
+        return words[0], words[1]
+    return None, None
+
+
+def scan(lines, start_line, cancelled=None):
+    # lines is the program's gcode_listing.line_index, start_line 1 based; None once
+    # the cancelled event is set
+    state = modal_state()
+    # (O number, keyword) of the blocks open at the current line
+    blocks = []
+    last = min(start_line - 1, lines.line_count())
+    first = 0
+    while first < last:
+        if cancelled is not None and cancelled.is_set():
+            return None
+        chunk_end = min(first + SCAN_CHUNK_LINES, last)
+        for text in lines.read_lines(first, chunk_end).splitlines():
+            code = gcode_search.COMMENT_RE.sub('', text).upper().strip()
+            if not code or code.startswith('/') or code == '%':
+                continue
+            number, keyword = _o_keyword(code)
+            if keyword == 'WHILE' and blocks and blocks[-1] == (number, 'DO'):
+                blocks.pop()
+            elif keyword in O_OPEN:
+                blocks.append((number, keyword))
+            elif keyword in O_CLOSE and blocks:
+                blocks.pop()
+            if blocks or keyword is not None:
+                # bodies of subroutines and loops are not followed, where a call leaves the tool is unknown
+                if keyword == 'CALL':
+                    state.position = [None, None, None]
+                continue
+            _scan_line(state, code)
+        first = chunk_end
+    if blocks:
+        state.problems.append('line %d is inside a subroutine, loop or if block' % start_line)
+    if state.ended:
+        state.problems.append('the program ends before line %d' % start_line)
+    if state.cutter_comp:
+        state.problems.append('cutter compensation is active at line %d' % start_line)
+    return state
+
+
+class scan_job:
+    def __init__(self):
+        self.cancelled = None
+
+    def busy(self):
+        return self.cancelled is not None
+
+    def start(self, lines, start_line, on_done):
+        # on_done(modal_state or None) is called on the GTK thread, None if the scan failed
+        self.cancel()
+        cancelled = threading.Event()
+        self.cancelled = cancelled
+        thread = threading.Thread(target=self._run, args=(lines, start_line, cancelled, on_done), name='program_restart_scan')
+        thread.daemon = True
+        thread.start()
+
+    def cancel(self):
+        if self.cancelled is not None:
+            self.cancelled.set()
+        self.cancelled = None
+
+    def _run(self, lines, start_line, cancelled, on_done):
+        try:
+            state = scan(lines, start_line, cancelled)
+        except Exception:
+            print 'program_restart: exception scanning %s' % lines.path
+            traceback.print_exc(file=sys.stdout)
+            state = None
+        if not cancelled.is_set():
+            glib.idle_add(self._finish, cancelled, state, on_done)
+
+    def _finish(self, cancelled, state, on_done):
+        # a scan cancelled after it finished is dropped here
+        if cancelled is self.cancelled:
+            self.cancelled = None
+            on_done(state)
+        return False
+
+
+def _scan_line(state, code):
+    if '#' in code or '[' in code:
+        # parameters and expressions are not evaluated, positions after them are unknown
+        state.position = [None, None, None]
+    words = [gcode_search.normalize_word(letter, number) for letter, number in gcode_search.WORD_RE.findall(code)]
+    values = {}
+    codes = []
+    for word in words:
+        if word[0] in 'GM':
+            codes.append(word)
+        else:
+            values[word[0]] = word[1:]
+
+    # the T word is read before M6 on the same line takes the tool
+    if 'T' in values:
+        state.pending_tool = int(float(values['T']))
+
+    machine_coords = 'G53' in codes
+    for word in codes:
+        if word in ('G20', 'G21'):
+            state.units = word
+        elif word in ('G17', 'G18', 'G19'):
+            state.plane = word
+        elif word in ('G90', 'G91'):
+            state.distance = word
+        elif word in ('G93', 'G94', 'G95'):
+            state.feed_mode = word
+        elif word in WCS_CODES:
+            state.wcs = word
+        elif word in ('G0', 'G1', 'G2', 'G3', 'G80'):
+            state.motion = word
+        elif word == 'G43':
+            state.length_offset = 'G43'
+            state.length_offset_h = values.get('H')
+        elif word == 'G49':
+            state.length_offset = 'G49'
+        elif word == 'G40':
+            state.cutter_comp = False
+        elif word in ('G41', 'G42', 'G41.1', 'G42.1'):
+            state.cutter_comp = True
+        elif word in ('G28', 'G30', 'G92', 'G92.1', 'G92.2', 'G92.3', 'G10'):
+            # moves to stored positions or offset changes, the position is only known again once programmed
+            state.position = [None, None, None]
+        elif word in ('M3', 'M4', 'M5'):
+            state.spindle = word
+        elif word == 'M6':
+            state.tool = state.pending_tool
+        elif word == 'M61':
+            if 'Q' in values:
+                state.tool = int(float(values['Q']))
+        elif word == 'M7':
+            state.mist = True
+        elif word == 'M8':
+            state.flood = True
+        elif word == 'M9':
+            state.mist = state.flood = False
+        elif word in ('M2', 'M30'):
+            state.ended = True
+    if 'S' in values:
+        state.speed = values['S']
+    if 'F' in values:
+        state.feed = values['F']
+    if not machine_coords:
+        for axis, letter in enumerate('XYZ'):
+            if letter in values:
+                value = float(values[letter])
+                if state.distance == 'G91':
+                    if state.position[axis] is not None:
+                        state.position[axis] += value
+                else:
+                    state.position[axis] = value
+    elif any(letter in values for letter in 'XYZ'):
+        state.position = [None, None, None]
+
+
+def preamble(state, tool_in_spindle):
+    # MDI commands that restore state, in the order they should run
+    commands = []
+    for mode in (state.units, state.plane, state.wcs):
+        if mode:
+            commands.append(mode)
+    if state.tool is not None and state.tool != tool_in_spindle:
+        commands.append('T%d M6' % state.tool)
+    if state.length_offset == 'G43':
+        h = state.length_offset_h or (str(state.tool) if state.tool is not None else None)
+        commands.append('G43 H%s' % h if h is not None else 'G43')
+    elif state.length_offset == 'G49':
+        commands.append('G49')
+    if state.spindle in ('M3', 'M4') and state.speed is not None:
+        commands.append('S%s %s' % (state.speed, state.spindle))
+    elif state.spindle == 'M5':
+        commands.append('M5')
+    if state.flood:
+        commands.append('M8')
+    if state.mist:
+        commands.append('M7')
+    # before any move, so the F words below are read in the program's feed mode
+    if state.feed_mode:
+        commands.append(state.feed_mode)
+    x, y, z = state.position
+    if x is not None and y is not None:
+        # back above the last position with the tool up, then down to it at the feed
+        clearance = 2.5 if state.units == 'G21' else 0.1
+        commands.append('G53 G0 Z0')
+        commands.append('G90 G0 X%.4f Y%.4f' % (x, y))
+        if z is not None:
+            commands.append('G0 Z%.4f' % (z + clearance))
+            if state.feed is not None:
+                commands.append('G1 Z%.4f F%s' % (z, state.feed))
+    if state.feed is not None:
+        commands.append('F%s' % state.feed)
+    commands.append(state.distance)
+    if state.motion in ('G0', 'G1'):
+        commands.append(state.motion)
+    return commands
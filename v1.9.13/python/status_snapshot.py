@@ -0,0 +1,171 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Background linuxcnc.stat polling
+#
+# One poller thread owns the linuxcnc.stat object and polls it at a fixed
+# rate.  Every poll copies the fields listed in STAT_FIELDS into an immutable
+# status_snapshot and publishes it by swapping a single reference, so readers
+# on any thread (GTK callbacks, probing, the ATC worker, the scanner) always
+# see one consistent poll without taking a lock.
+#
+# status_view is the object handed out in place of linuxcnc.stat.  It reads
+# like a stat object; poll() still forces a fresh snapshot for the few places
+# that must see the result of a command they just waited on.
+#
+# Every field, the tool table and axis dicts included, is copied at poll
+# time, so a snapshot never mixes two polls.
+#
+
+import sys
+import time
+import threading
+import traceback
+import linuxcnc
+
+
+# seconds, the fastest periodic task in the UI runs every 50 ms
+POLL_INTERVAL = 0.05
+
+# the stat fields the UI, probing, conversational, ATC and scanner read
+STAT_FIELDS = (
+    'actual_position',
+    'aout',
+    'axis',
+    'axis_mask',
+    'block_delete',
+    'current_line',
+    'current_vel',
+    'din',
+    'dout',
+    'dtg',
+    'estop',
+    'exec_state',
+    'feedrate',
+    'file',
+    'flood',
+    'g5x_index',
+    'g5x_offset',
+    'g92_offset',
+    'gcodes',
+    'homed',
+    'inpos',
+    'interp_state',
+    'limit',
+    'mcodes',
+    'mist',
+    'motion_line',
+    'motion_mode',
+    'motion_type',
+    'optional_stop',
+    'paused',
+    'position',
+    'probe_tripped',
+    'probe_val',
+    'probed_position',
+    'probing',
+    'program_units',
+    'queue',
+    'queue_full',
+    'read_line',
+    'rotation_xy',
+    'settings',
+    'spindle_direction',
+    'spindle_enabled',
+    'spindle_speed',
+    'spindlerate',
+    'state',
+    'task_mode',
+    'task_paused',
+    'task_state',
+    'tool_in_spindle',
+    'tool_offset',
+    'tool_table',
+)
+SNAPSHOT_FIELDS = frozenset(STAT_FIELDS + ('timestamp', 'serial'))
+
+
+class status_snapshot(object):
+    __slots__ = STAT_FIELDS + ('timestamp', 'serial')
+
+    def __init__(self, stat, serial):
+        setter = object.__setattr__
+        for name in STAT_FIELDS:
+            setter(self, name, getattr(stat, name, None))
+        setter(self, 'timestamp', time.time())
+        setter(self, 'serial', serial)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('status snapshots are read only')
+
+
+class status_poller(threading.Thread):
+    def __init__(self, interval=POLL_INTERVAL):
+        threading.Thread.__init__(self, name='status_poller')
+        self.daemon = True
+        self.interval = interval
+        self.stat = linuxcnc.stat()
+        # serializes stat.poll() between the poller and synchronous refreshes
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.serial = 0
+        self.snapshot = None
+        self.refresh()
+
+    def refresh(self):
+        with self.lock:
+            self.stat.poll()
+            self.serial += 1
+            snapshot = status_snapshot(self.stat, self.serial)
+            # single reference assignment is the publish
+            self.snapshot = snapshot
+        return snapshot
+
+    def read_uncached(self, name):
+        # fields outside STAT_FIELDS come from the last poll of the real stat object
+        with self.lock:
+            return getattr(self.stat, name)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.refresh()
+            except linuxcnc.error:
+                # task went away, keep the last snapshot and try again
+                pass
+            except Exception:
+                print 'status poller exception'
+                traceback.print_exc(file=sys.stdout)
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class status_view(object):
+    def __init__(self, poller, latched=False):
+        # a latched view keeps returning the snapshot taken at the last latch()
+        # or poll() so that a whole periodic pass sees one poll; an unlatched
+        # view (for the worker threads) always reads the newest snapshot
+        self._poller = poller
+        self._latched = latched
+        self._snapshot = poller.snapshot
+
+    def snapshot(self):
+        if self._latched:
+            return self._snapshot
+        return self._poller.snapshot
+
+    def latch(self):
+        self._snapshot = self._poller.snapshot
+        return self._snapshot
+
+    def poll(self):
+        # synchronous refresh, for callers that just did wait_complete()
+        self._snapshot = self._poller.refresh()
+        return self._snapshot
+
+    def __getattr__(self, name):
+        if name in SNAPSHOT_FIELDS:
+            return getattr(self.snapshot(), name)
+        return self._poller.read_uncached(name)
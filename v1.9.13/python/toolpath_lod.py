@@ -0,0 +1,100 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Reduced detail copies of the preview tool path
+#
+# Zoomed out, a dense tool path puts many segments in every pixel.
+# reduce_segments() merges chains of connected segments of one kind, feed
+# and tool offset into single segments as long as no joint between them
+# strays further than the tolerance from the merged segment.  The preview
+# worker makes a copy per level in LEVELS, with the tolerance a fraction of
+# the program's size, and gremlin draws the coarsest copy whose tolerance
+# is still below a pixel.
+#
+
+import math
+
+
+# tolerances as fractions of the tool path's bounding box diagonal, finest first
+LEVELS = (1.0 / 8000, 1.0 / 2000, 1.0 / 500)
+
+# joints merged into one segment at most, bounds the deviation check
+MAX_CHAIN = 16
+
+# a level is only kept if it has no more than this fraction of the segments
+MIN_REDUCTION = 0.7
+
+REDUCED_LISTS = ('traverse', 'feed', 'arcfeed')
+
+
+def path_diagonal(segments):
+    low = [float('inf')] * 3
+    high = [float('-inf')] * 3
+    for name in REDUCED_LISTS:
+        for segment in segments.get(name, []):
+            for point in (segment[1], segment[2]):
+                for axis in range(3):
+                    value = point[axis]
+                    if value < low[axis]:
+                        low[axis] = value
+                    if value > high[axis]:
+                        high[axis] = value
+    if low[0] == float('inf'):
+        return 0.0
+    return math.sqrt(sum((high[axis] - low[axis]) ** 2 for axis in range(3)))
+
+
+def _deviation(point, start, end):
+    # distance of point from the segment start-end
+    d = [end[axis] - start[axis] for axis in range(3)]
+    p = [point[axis] - start[axis] for axis in range(3)]
+    length2 = d[0] * d[0] + d[1] * d[1] + d[2] * d[2]
+    if length2 < 1e-18:
+        return math.sqrt(p[0] * p[0] + p[1] * p[1] + p[2] * p[2])
+    t = max(0.0, min(1.0, (p[0] * d[0] + p[1] * d[1] + p[2] * d[2]) / length2))
+    q = [p[axis] - t * d[axis] for axis in range(3)]
+    return math.sqrt(q[0] * q[0] + q[1] * q[1] + q[2] * q[2])
+
+
+def reduce_list(segments, tolerance):
+    # segments are canon tuples (line, start, end, ...); the merged segment keeps the first one's
+    # line number and trailing fields
+    reduced = []
+    chain_start = None
+    joints = []
+    for segment in segments:
+        start = segment[1]
+        if chain_start is not None:
+            merged_end = segment[2]
+            if start == current[2] and segment[3:] == current[3:] and start[3:] == merged_end[3:] \
+               and len(joints) < MAX_CHAIN \
+               and all(_deviation(joint, chain_start[1], merged_end) <= tolerance for joint in joints + [start]):
+                joints.append(start)
+                current = (chain_start[0], chain_start[1], merged_end) + chain_start[3:]
+                continue
+            reduced.append(current)
+        chain_start = segment
+        current = segment
+        joints = []
+    if chain_start is not None:
+        reduced.append(current)
+    return reduced
+
+
+def reduce_segments(segments, diagonal):
+    # [(tolerance, {list name: reduced list})] for the levels that reduce the path enough
+    levels = []
+    total = sum(len(segments.get(name, [])) for name in REDUCED_LISTS)
+    if diagonal <= 0 or total == 0:
+        return levels
+    source = dict((name, segments.get(name, [])) for name in REDUCED_LISTS)
+    for fraction in LEVELS:
+        tolerance = diagonal * fraction
+        # each level starts from the one before, it is no finer
+        reduced = dict((name, reduce_list(source[name], tolerance)) for name in REDUCED_LISTS)
+        count = sum(len(reduced[name]) for name in REDUCED_LISTS)
+        if count > total * MIN_REDUCTION:
+            continue
+        levels.append((tolerance, reduced))
+        source = reduced
+    return levels
@@ -17,6 +17,7 @@ import redis
 import linuxcnc
 import hal
 import gremlin
+import minigl
 import os
 import pango
 import subprocess
@@ -27,6 +28,7 @@ import csv
 import re
 import threading
 import logging
+import collections
 from ui_common import *
 
 
@@ -44,6 +46,26 @@ import probing
 import numpad
 import tormach_file_util
 import zbot_atc
+import work_offsets
+import widget_binding
+import periodic_scheduler
+import periodic_profiler
+import status_snapshot
+import machine_prefs
+import message_listener
+import persistent_store
+import preview_loader
+import preview_cache
+import file_watcher
+import gcode_listing
+import gcode_search
+import preflight
+import program_restart
+import arc_fitter
+import live_plot
+import toolpath_lod
+import probe_watchdog
+import probe_tuning
 from ui_common import *
 
 try:
@@ -71,6 +93,19 @@ MILL_STATUS_PAGE = 9
 DRILL_TABLE_BASIC_SIZE = 100
 
 TOOL_TABLE_ROWS = 255
+
+# timing of the periodic functions is written here every PERIODIC_PROFILE_DUMP_INTERVAL seconds and on exit
+PERIODIC_PROFILE_FILE = os.path.join(os.getenv('HOME') or '/tmp', 'periodic_profile.txt')
+PERIODIC_PROFILE_DUMP_INTERVAL = 60
+
+# parsed tool path previews, by program content hash
+PREVIEW_CACHE_DIR = os.path.join(os.getenv('HOME') or '/tmp', '.preview_cache')
+PREVIEW_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# arc fitted copies of loaded programs, by program content hash and tolerance
+ARC_FIT_CACHE_DIR = os.path.join(os.getenv('HOME') or '/tmp', '.arc_fit_cache')
+ARC_FIT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
 JOB_TABLE_ROWS = 30
 
 class AxisState:
@@ -89,12 +124,18 @@ class AxisState:
         self.jog_active_leds=['jog_%s_active_led' % l for l in self.letters]
 
 
-
 class mill(TormachUIBase):
 
     def __init__(self):
         # redis db for persistent storage.  File location set in redis.conf, currently in config dir (rdb.dump)
         self.redis = redis.Redis()
+        # the machine_prefs hash is read once here, settings are written back by a background thread
+        self.prefs = machine_prefs.machine_prefs(self.redis)
+        self.prefs.load()
+        # conversational DRO values and history lists, written back only when they changed
+        self.conv_store = persistent_store.hash_store(self.redis, 'conversational')
+        self.mdi_history_store = persistent_store.list_store(self.redis, 'mdi_history')
+        self.file_history_store = persistent_store.list_store(self.redis, 'recent_file_history')
 
         # glade setup
         gladefile = os.path.join(GLADE_DIR, 'tormach_mill_ui.glade')
@@ -149,7 +190,11 @@ class mill(TormachUIBase):
         # linuxcnc command and status objects
         # --------------------------------------------------------
         self.command = linuxcnc.command()
-        self.status = linuxcnc.stat()
+        # stat is polled on its own thread; self.status reads the latest snapshot,
+        # latched once per periodic pass so every update in it sees the same poll
+        self.status_poller = status_snapshot.status_poller()
+        self.status_poller.start()
+        self.status = status_snapshot.status_view(self.status_poller, latched=True)
         self.error = linuxcnc.error_channel()
 
         # --------------------------------------------------------
@@ -166,6 +211,9 @@ class mill(TormachUIBase):
 
         self.notify_at_cycle_start = False  # when message text superimposed in Gremlin
         self.notify_answer_key = ''
+        # TormachMessage requests handed over by the listener thread, not yet shown
+        self.tormach_message_queue = collections.deque()
+        self.tormach_message_busy = False
         self.only_one_cable_warning = False  # warn when false
 
         # elapsed time label on top of gremlin
@@ -174,6 +222,46 @@ class mill(TormachUIBase):
         # widget to the container.  sweet.
         self.notebook_main_fixed.put(self.elapsed_time_label, 935, 388)
 
+        # preview parsing runs in a worker process, its progress shows along the bottom of the tool path display
+        self.preview_loader = preview_loader.preview_loader()
+        self.preview_cache = preview_cache.preview_cache(PREVIEW_CACHE_DIR, PREVIEW_CACHE_MAX_BYTES)
+        # G1 runs in loaded programs are fitted to arcs when arc_fit_tolerance is above 0
+        self.prefs.set_default('arc_fit_tolerance', '0')
+        self.arc_fit_cache = preview_cache.preview_cache(ARC_FIT_CACHE_DIR, ARC_FIT_CACHE_MAX_BYTES, suffix='.ngc')
+        self.arc_fit_job = arc_fitter.fit_job(self.arc_fit_cache)
+        # corner probes give up on an edge after this distance rather than running on to the soft limit
+        self.prefs.set_default('probe_search_distance', str(probing.DEFAULT_PROBE_SEARCH_DISTANCE))
+        # follows each probing routine and stops the machine if one runs past its timeout
+        self.probe_watchdog = probe_watchdog.probe_watchdog(status_snapshot.status_view(self.status_poller),
+                                                            self.on_probe_cycle_done, self.on_probe_cycle_overrun)
+        # multi-move probe tuning runs, see probing.probe_tune_command
+        self.probe_sequence = probe_tuning.probe_sequence(status_snapshot.status_view(self.status_poller), self.issue_mdi)
+        self.preview_progress = gtk.ProgressBar()
+        self.preview_progress.set_size_request(300, 16)
+        self.preview_progress.set_no_show_all(True)
+        self.notebook_main_fixed.put(self.preview_progress, 330, 392)
+
+        # pre-flight analysis of the loaded program, worked out by the preview worker
+        self.motion_limits = preflight.motion_limits(self.ini_float('TRAJ', 'MAX_VELOCITY', 3),
+                                                     [(self.ini_float('AXIS_%d' % axis, 'MAX_VELOCITY', 3),
+                                                       self.ini_float('AXIS_%d' % axis, 'MAX_ACCELERATION', 15)) for axis in range(3)])
+        self.preflight = None
+        self.preflight_problems_reported = []
+        self.preflight_acknowledged = False
+
+        # MDI commands still to issue before a program run from a line starts
+        self.restart_preamble = collections.deque()
+        self.restart_preamble_timer = None
+        self.restart_preamble_settle = False
+        # reads the program up to the start line in the background
+        self.restart_scan = program_restart.scan_job()
+
+        # the listing holds a window of the program around the line of interest,
+        # long programs are never read into the source view buffer whole
+        self.gcode_listing = gcode_listing.gcode_listing(self.sourceview, self.gcodelisting_buffer)
+        # word and trigram index of the loaded program, built in the background on load
+        self.gcode_search = gcode_search.gcode_search()
+
         # max feedrate for user entry validation (in machine setup units - ipm)
         self.max_feedrate = 60 * self.ini_float('AXIS_0', 'MAX_VELOCITY', 135)
 
@@ -315,9 +403,8 @@ class mill(TormachUIBase):
         self.loaded_gcode_filename_combobox.pack_start(cell, True)
         self.loaded_gcode_filename_combobox.add_attribute(cell, 'text', 0)
         try:
-            for i in range(0, self.redis.llen('recent_file_history')):
+            for path in self.file_history_store.load():
                 # file history liststore is in form of ['filename', 'path'], but redis only stores the path
-                path = self.redis.lpop('recent_file_history')
                 self.file_history_liststore.append([os.path.basename(path), path])
         except:
             self.error_handler.write("Retrieval of recent file history failed.", ALARM_LEVEL_DEBUG)
@@ -440,6 +527,10 @@ class mill(TormachUIBase):
 
         # Set initial toggle button states
         self.axes = AxisState()
+        self.dtg_label_list = [self.get_obj(name) for name in self.axes.dtg_labels]
+
+        # remembers what the periodic functions last pushed to DROs, labels and LEDs
+        self.widget_binding = widget_binding.widget_binding()
 
         self.status.poll()
         self.g21 = self.prev_g21 = False
@@ -476,10 +567,16 @@ class mill(TormachUIBase):
         self.tlo_mismatch_count = 0    # track sucessive TLO misalignment
         self.cpu_usage = 0
         self.engrave_just = 'left'
+        # wall time histograms of the periodic functions
+        self.periodic_profiler = periodic_profiler.periodic_profiler()
+        self.periodic_profile_dump_time = time.time()
         self.thread_mill_rhlh = 'right'
         self.tool_liststore_stale = 0
+        # tool number string -> description, read from redis with one HGETALL
+        self.tool_descriptions = None
         self.current_g5x_offset = self.status.g5x_offset
         self.current_g92_offset= self.status.g92_offset
+        self.current_rotation_xy = self.status.rotation_xy
 
 
         #timers for various ATC cabling or connection faults...
@@ -1009,34 +1106,23 @@ class mill(TormachUIBase):
         # -----------------------------------------------------
 
         # spindle type and min/max for high speed spindle type
-        spindle_type_str = self.redis.hget('machine_prefs', 'spindle_type');
-
-        if spindle_type_str == None:
+        if not self.prefs.exists('spindle_type'):
             print 'no spindle type found in redis defaulting to standard'
-            spindle_type_str = '0'
 
-        self.spindle_type = int(spindle_type_str)
+        self.spindle_type = self.prefs.get_int('spindle_type', 0)
         if self.spindle_type < SPINDLE_TYPE_STANDARD or self.spindle_type > SPINDLE_TYPE_HISPEED:
             self.spindle_type = SPINDLE_TYPE_STANDARD
         print 'spindle type: %d' % self.spindle_type
         self.hal['spindle-type'] = self.spindle_type
 
-        speed_str = self.redis.hget('machine_prefs', 'spindle_hispeed_min');
-        if speed_str == None:
-            #print 'no spindle_hispeed_min found in redis defaulting to 8000'
-            speed_str = '1000'
-        self.spindle_hispeed_min = int(speed_str)
+        self.spindle_hispeed_min = self.prefs.get_int('spindle_hispeed_min', 1000)
         #print 'spindle hispeed min: %d' % self.spindle_hispeed_min
         self.hal['spindle-hispeed-min'] = self.spindle_hispeed_min
 
         self.spindle_hispeed_min_entry = self.builder.get_object('spindle_hispeed_min_entry')
         self.spindle_hispeed_min_entry.set_text('%d' % self.spindle_hispeed_min)
 
-        speed_str = self.redis.hget('machine_prefs', 'spindle_hispeed_max');
-        if speed_str == None:
-            #print 'no spindle_hispeed_max found in redis defaulting to 24000'
-            speed_str = '24000'
-        self.spindle_hispeed_max = int(speed_str)
+        self.spindle_hispeed_max = self.prefs.get_int('spindle_hispeed_max', 24000)
         #print 'spindle hispeed max: %d' % self.spindle_hispeed_max
         self.hal['spindle-hispeed-max'] = self.spindle_hispeed_max
 
@@ -1059,10 +1145,10 @@ class mill(TormachUIBase):
 
         # touchscreen
         # remember! Redis stores strings, not bools
-        self.touchscreen_enabled = self.redis.hget('machine_prefs', 'touchscreen') == "True"
+        self.touchscreen_enabled = self.prefs.get_bool('touchscreen')
         self.checkbutton_list['enable_soft_keyboard_checkbutton'].set_active(self.touchscreen_enabled)
 
-        self.probe_active_high = self.redis.hget('machine_prefs', 'probe_active_high') == "True"
+        self.probe_active_high = self.prefs.get_bool('probe_active_high')
         self.hal['probe-active-high'] = self.probe_active_high
         if self.probe_active_high:
             self.checkbutton_list['active_probe_radiobutton'].set_active(True)
@@ -1070,17 +1156,14 @@ class mill(TormachUIBase):
             self.checkbutton_list['passive_probe_radiobutton'].set_active(True)
 
         # 4th axis homing
-        self.fourth_axis_homing_enabled = self.redis.hget('machine_prefs', 'fourth_axis_homing_enabled') == "True"
+        self.fourth_axis_homing_enabled = self.prefs.get_bool('fourth_axis_homing_enabled')
         # set 4th axis homing parameters
         self.set_4th_axis_homing_parameters(self.fourth_axis_homing_enabled)
         # set the checkbutton status
         self.checkbutton_list['fourth_axis_homing_checkbutton'].set_active(self.fourth_axis_homing_enabled)
 
-        try:
-            self.ets_height = float(self.redis.hget('machine_prefs', 'setter_height'))
-        except:
-            self.ets_height = (80/25.4)
-            self.redis.hset('machine_prefs', 'setter_height', self.ets_height)
+        self.ets_height = self.prefs.get_float('setter_height', 80/25.4)
+        self.prefs.set_default('setter_height', self.ets_height)
 
         self.gcodes_display = tormach_file_util.active_codes_display()
         self.notebook_settings_fixed = self.builder.get_object('notebook_settings_fixed')
@@ -1135,10 +1218,8 @@ class mill(TormachUIBase):
         self.mdi_history = []
         self.mdi_history_index = -1
         try:
-            hist_length = self.redis.llen('mdi_history')
-            for i in range(0, hist_length):
-                self.mdi_history.append(self.redis.lpop('mdi_history'))
-            self.mdi_history_index = int(self.redis.hget('machine_prefs', 'mdi_history_index'))
+            self.mdi_history = self.mdi_history_store.load()
+            self.mdi_history_index = self.prefs.get_int('mdi_history_index', -1)
         except:
             self.error_handler.write("Retrieval of MDI history failed.", ALARM_LEVEL_DEBUG)
             pass
@@ -1153,13 +1234,14 @@ class mill(TormachUIBase):
         # tool change type and zbot atc init
         # ---------------------------------------------------
 
-        self.atc = zbot_atc.zbot_atc(self.config,self.status, self.command, self.issue_mdi, self.hal, self.redis, self.atc_pocket_list, self.dro_list, self.program_running,self.notebook, self.error_handler)
+        self.atc = zbot_atc.zbot_atc(self.config,status_snapshot.status_view(self.status_poller), self.command, self.issue_mdi, self.hal, self.redis, self.atc_pocket_list, self.dro_list, self.program_running,self.notebook, self.error_handler)
 
-        # connect timer to status poll periodic function
-        gobject.timeout_add(50, self.periodic_status)
+        # register the periodic functions with the adaptive scheduler and start it
+        self.setup_periodic_tasks()
 
-        # this counter is used to call the slower periodic function
-        self.periodic_loopcount = 0
+        # NGC prompts and ATC messages are pushed to the UI as they arrive
+        self.message_listener = message_listener.message_listener(self.redis, self.on_tormach_messages)
+        self.message_listener.start()
 
         # get user's home directory
         self.home_dir = os.getenv('HOME')
@@ -1170,7 +1252,7 @@ class mill(TormachUIBase):
 
 
         try:
-            tc_type = self.redis.hget('machine_prefs', 'toolchange_type')
+            tc_type = self.prefs.get('toolchange_type')
             if tc_type == MILL_TOOLCHANGE_TYPE_REDIS_ZBOT:
                 self.atc.enable()
                 self.show_atc_diagnostics()
@@ -1205,6 +1287,13 @@ class mill(TormachUIBase):
         if self.tool_table_filename.startswith('~/'):
             self.tool_table_filename = os.path.join(os.getenv('HOME'), self.tool_table_filename[2:])
         self.tool_table_file_mtime = os.stat(self.tool_table_filename).st_mtime
+
+        # real edits to the loaded program and the tool table are picked up by the
+        # file watcher; they are acted on once the machine is idle
+        self.gcode_file_changed = False
+        self.tool_table_file_changed = False
+        self.file_watcher = file_watcher.file_watcher()
+        self.file_watcher.watch('tool_table', self.tool_table_filename, self.on_tool_table_file_changed)
         self.refresh_tool_liststore(True)
 
         # create columns
@@ -1486,6 +1575,9 @@ class mill(TormachUIBase):
         # Keep track of work offset probes
         self.work_probe_in_progress = False
 
+        # work offsets are read from the interpreter var file, not by cycling G54..G59.3
+        self.work_offset_reader = work_offsets.work_offset_reader(work_offsets.find_var_file(inifile, ini_file_name))
+
 
         """
         # restore last used values on conversational screens
@@ -1500,7 +1592,7 @@ class mill(TormachUIBase):
         # -----------------------------------------
 
 
-        self.hal['spindle-range'] = self.redis.hget('machine_prefs', 'spindle_range') == "hi"
+        self.hal['spindle-range'] = self.prefs.get('spindle_range') == "hi"
 
         if self.hal['spindle-range']:
             # high
@@ -1510,77 +1602,30 @@ class mill(TormachUIBase):
             self.set_image('spindle_range_image', 'Spindle_Range_LO_Highlight.png')
 
         # limit switch enable
-        self.home_switches_enabled = True
-        try:
-            redis_response = self.redis.hget('machine_prefs', 'home_switches_enabled')
-            if redis_response == 'True' or redis_response == None:
-                self.home_switches_enabled = True
-            else:
-                self.home_switches_enabled = False
-        except:
-            self.error_handler.write("exception looking for 'machine_prefs', 'home_switches_enabled' in redis, defaulting to True", ALARM_LEVEL_LOW)
-            # write to redis to avoid future messages
-            self.redis.hset('machine_prefs', 'home_switches_enabled', 'True')
+        self.home_switches_enabled = self.prefs.get_bool('home_switches_enabled', True)
         self.checkbutton_list['disable_home_switches_checkbutton'].set_active(not self.home_switches_enabled)
         self.hal['home-switch-enable'] = self.home_switches_enabled
 
         # g30/m998 move in Z only
-        self.g30m998_move_z_only = True
-        try:
-            redis_response = self.redis.hget('machine_prefs', 'g30m998_move_z_only')
-            if redis_response == 'True' or redis_response == None:
-                self.g30m998_move_z_only = True
-            else:
-                self.g30m998_move_z_only = False
-        except:
-            self.error_handler.write("exception looking for 'machine_prefs', 'g30m998_move_z_only' in redis, defaulting to True", ALARM_LEVEL_LOW)
-            # write to redis to avoid future messages
-            self.redis.hset('machine_prefs', 'g30m998_move_z_only', 'True')
+        self.g30m998_move_z_only = self.prefs.get_bool('g30m998_move_z_only', True)
         self.checkbutton_list['g30m998_move_z_only_checkbutton'].set_active(self.g30m998_move_z_only)
 
-        try:
-            self.usbio_enabled = self.redis.hget('machine_prefs', 'usbio_enabled') == 'True'
-        except:
-            self.error_handler.write("exception looking for 'machine_prefs', 'usbio enabled' in redis, defaulting to False", ALARM_LEVEL_LOW)
-            # write to redis to avoid future messages
-            self.redis.hset('machine_prefs', 'usbio_enabled', 'False')
+        self.usbio_enabled = self.prefs.get_bool('usbio_enabled')
         self.checkbutton_list['enable_usbio_checkbutton'].set_active(self.usbio_enabled)
 
-        self.injector_enabled = False
-        try:
-            self.injector_enabled = self.redis.hget('machine_prefs', 'injector_enabled') == 'True'
-        except:
-            self.error_handler.write("exception looking for 'machine_prefs', 'injector_enabled' in redis, defaulting to False", ALARM_LEVEL_LOW)
-            # write to redis to avoid future messages
-            self.redis.hset('machine_prefs', 'injector_enabled', 'False')
+        self.injector_enabled = self.prefs.get_bool('injector_enabled')
         self.checkbutton_list['enable_injector_checkbutton'].set_active(self.injector_enabled)
 
-        try:
-            self.injector_dwell = float(self.redis.hget('machine_prefs', 'injector_dwell'))
-        except:
-            #self.error_handler.write("exception looking for 'machine_prefs', 'injector_dwell' in redis, defaulting to 20 sec.", ALARM_LEVEL_LOW)
-            # write to redis to avoid future messages
-            self.redis.hset('machine_prefs', 'injector_dwell', '20')
-            self.injector_dwell = 20.
+        self.injector_dwell = self.prefs.get_float('injector_dwell', 20.)
+        self.prefs.set_default('injector_dwell', '20')
 
         self.dro_list['inject_dwell_dro'].set_text(self.dro_medium_format % self.injector_dwell)
 
-        self.door_sw_enabled = False
         self.hal['enc-door-switch-configured'] = 0
-        try:
-            self.door_sw_enabled = self.redis.hget('machine_prefs', 'door_sw_enabled') == 'True'
-        except:
-            self.error_handler.write("exception looking for 'machine_prefs', 'door_sw_enabled' in redis, defaulting to False", ALARM_LEVEL_LOW)
-            # write to redis to avoid future messages
-            self.redis.hset('machine_prefs', 'door_sw_enabled', 'False')
+        self.door_sw_enabled = self.prefs.get_bool('door_sw_enabled')
         self.checkbutton_list['enable_door_sw_checkbutton'].set_active(self.door_sw_enabled)
 
-        try:
-            disable_door_sw_checkbutton = self.redis.hget('machine_prefs', 'door_sw_hard_enabled') == 'True'
-        except:
-            self.error_handler.write("exception looking for 'machine_prefs', 'door_sw_hard_enabled' in redis, defaulting to False", ALARM_LEVEL_LOW)
-            # write to redis to avoid future messages
-            self.redis.hset('machine_prefs', 'door_sw_hard_enabled', 'False')
+        disable_door_sw_checkbutton = self.prefs.get_bool('door_sw_hard_enabled')
 
         if disable_door_sw_checkbutton:
             self.door_sw_enabled = True
@@ -1589,29 +1634,24 @@ class mill(TormachUIBase):
         if self.door_sw_enabled:
             self.hal['enc-door-switch-configured'] = 1
 
-        speed_str = self.redis.hget('machine_prefs', 'enc_door_open_max_rpm');
-        if speed_str == None:
+        if not self.prefs.exists('enc_door_open_max_rpm'):
             print 'no enc_door_open_max_rpm found in redis defaulting to 1000'
-            speed_str = '1000'
-        self.enc_open_door_max_rpm = int(speed_str)
+        self.enc_open_door_max_rpm = self.prefs.get_int('enc_door_open_max_rpm', 1000)
         print 'enclosure door open max rpm: %d' % self.enc_open_door_max_rpm
         self.hal['enc-door-open-max-rpm'] = self.enc_open_door_max_rpm
 
         # numlock status
-        self.numlock_on = True
-        try:
-            redis_response = self.redis.hget('machine_prefs', 'numlock_on')
-            if redis_response == 'True' or redis_response == None:
-                self.numlock_on = True
-            else:
-                self.numlock_on = False
-        except:
-            #self.error_handler.write("exception looking for 'machine_prefs', 'numlock_on' in redis, defaulting to True", ALARM_LEVEL_LOW)
-            # write to redis to avoid future messages
-            self.redis.hset('machine_prefs', 'numlock_on', 'True')
+        self.numlock_on = self.prefs.get_bool('numlock_on', True)
         #self.checkbutton_list['numlock_on'].set_active(self.numlock_on)
         #self.set_numlock(self.numlock_on)
 
+        # periodic task timing summary on the Status page
+        self.periodic_profile_label = gtk.Label()
+        self.periodic_profile_label.modify_font(pango.FontDescription('monospace 7'))
+        self.periodic_profile_label.set_size_request(170, 190)
+        self.periodic_profile_label.set_alignment(0.0, 0.0)
+        self.builder.get_object('alarms_fixed').put(self.periodic_profile_label, 598, 10)
+
         # NetBIOS name
         self.netbios_name = get_netbios_name(netbios_name_conf_file)
         self.netbios_name_widget = self.builder.get_object('netbios_name')
@@ -1670,7 +1710,7 @@ class mill(TormachUIBase):
         self.builder.get_object('enable_door_sw_text').hide()
 
         # make sure no warning on ref
-        self.redis.hset('machine_prefs', 'display_door_sw_x_ref_warning', 'False')
+        self.prefs.set('display_door_sw_x_ref_warning', 'False')
 
         # no HSS spindle option
         self.builder.get_object('spindle_type_label').hide()
@@ -1684,7 +1724,7 @@ class mill(TormachUIBase):
 
         # hard coded to passive probe only due to leadshine mx board input
         self.probe_active_high = False
-        self.redis.hset('machine_prefs', 'probe_active_high', self.probe_active_high)
+        self.prefs.set('probe_active_high', self.probe_active_high)
         self.hal['probe-active-high'] = self.probe_active_high
         self.builder.get_object('passive_probe_radiobutton').hide()
         self.builder.get_object('passive_probe_text').hide()
@@ -1751,9 +1791,9 @@ class mill(TormachUIBase):
         self.scanner_common_camera_image = self.builder.get_object("scanner_common_camera_image")
 
         self.scanner = None
-        self.scanner_enabled = self.redis.hget('machine_prefs', 'scanner_enabled') == "True" and _scanner_available
+        self.scanner_enabled = self.prefs.get_bool('scanner_enabled') and _scanner_available
         if self.scanner_enabled:
-            self.scanner = scanner2.Scanner(self.status, render_target=self.scanner_common_camera_image)
+            self.scanner = scanner2.Scanner(status_snapshot.status_view(self.status_poller), render_target=self.scanner_common_camera_image)
 
         # Scanner Scan DROs
         self.scanner_scan_dro_list = (
@@ -1810,9 +1850,8 @@ class mill(TormachUIBase):
 
         self.scanner_calibration_scale_text = self.builder.get_object('scanner_calibration_scale_text')
 
-        # Define update function to poll camera and capture frames at slightly
-        # faster than 30Hz to prevent frames from buffering up
-        gobject.timeout_add(65, self.scanner_periodic)
+        # scanner_periodic polls the camera and captures frames at slightly
+        # faster than 30Hz to prevent frames from buffering up - see setup_periodic_tasks
 
     def scope_gui_init(self):
         """ Initialize objects in scanner scope tab of camera notebook"""
@@ -2007,7 +2046,7 @@ class mill(TormachUIBase):
             widget.set_text('%d' % self.spindle_hispeed_min)
 
         self.hal['spindle-hispeed-min'] = self.spindle_hispeed_min
-        self.redis.hset('machine_prefs', 'spindle_hispeed_min', '%d' % self.spindle_hispeed_min);
+        self.prefs.set('spindle_hispeed_min', '%d' % self.spindle_hispeed_min);
         self.window.set_focus(None)
 
     def on_spindle_hispeed_max_entry_activate(self, widget, data=None):
@@ -2020,7 +2059,7 @@ class mill(TormachUIBase):
             widget.set_text('%d' % self.spindle_hispeed_max)
 
         self.hal['spindle-hispeed-max'] = self.spindle_hispeed_max
-        self.redis.hset('machine_prefs', 'spindle_hispeed_max', '%d' % self.spindle_hispeed_max);
+        self.prefs.set('spindle_hispeed_max', '%d' % self.spindle_hispeed_max);
         self.window.set_focus(None)
 
     def on_spindle_type_combobox_changed(self, widget, data=None):
@@ -2030,7 +2069,7 @@ class mill(TormachUIBase):
         self.spindle_type = spindle_type
         self.hal['spindle-type'] = self.spindle_type
         # make persistent
-        self.redis.hset('machine_prefs', 'spindle_type', '%d' % self.spindle_type);
+        self.prefs.set('spindle_type', '%d' % self.spindle_type);
         self.make_hispeed_min_max_visible(self.spindle_type)
 
         if (spindle_type == SPINDLE_TYPE_HISPEED and self.checkbutton_list['use_atc_checkbutton'].get_active()):
@@ -2075,16 +2114,96 @@ class mill(TormachUIBase):
     def on_gcode_sourceview_populate_popup(self, textview, menu):
         set_start_line_item = gtk.MenuItem("Set start line")
         set_start_line_item.connect("activate", self.set_start_line_callback)
+        find_next_item = gtk.MenuItem("Find next")
+        find_next_item.connect("activate", self.find_next_callback)
+        find_next_item.set_sensitive(bool(self.gcode_search.query))
+        find_previous_item = gtk.MenuItem("Find previous")
+        find_previous_item.connect("activate", self.find_previous_callback)
+        find_previous_item.set_sensitive(bool(self.gcode_search.query))
+        next_tool_change_item = gtk.MenuItem("Next tool change")
+        next_tool_change_item.connect("activate", self.next_tool_change_callback)
         # get rid of all default gtk.sourceview menu options
         for child in menu.get_children():
             menu.remove(child)
-        menu.append(set_start_line_item)
-        set_start_line_item.show()
+        for item in (set_start_line_item, find_next_item, find_previous_item, next_tool_change_item):
+            menu.append(item)
+            item.show()
 
 
     def set_start_line_callback(self, widget):
         self.set_start_line()
 
+    def find_next_callback(self, widget):
+        self.show_search_match(self.gcode_search.find_next(), self.gcode_search.query)
+
+    def find_previous_callback(self, widget):
+        self.show_search_match(self.gcode_search.find_previous(), self.gcode_search.query)
+
+    def next_tool_change_callback(self, widget):
+        cursor = self.gcodelisting_buffer.get_iter_at_mark(self.gcodelisting_buffer.get_insert())
+        line = self.gcode_search.next_tool_change(self.gcode_listing.program_line(cursor.get_line() + 1) + 1)
+        self.show_search_match(line, 'tool change')
+
+    def move_listing_to_next_match(self, command_text):
+        # the pattern search only sees the buffer, which holds a window of a long program;
+        # for a FIND the window is moved to the next match, found with the line index, first
+        words = command_text.split(None, 1)
+        if len(words) != 2 or words[0].upper() != 'FIND' or not self.gcode_listing.windowed():
+            return
+        buf = self.gcodelisting_buffer
+        bounds = buf.get_selection_bounds()
+        if bounds:
+            # carry on after the match showing
+            from_line = self.gcode_listing.program_line(bounds[1].get_line() + 1) + 1
+        else:
+            from_line = self.gcode_listing.program_line(buf.get_iter_at_mark(buf.get_insert()).get_line() + 1)
+        line = self.gcode_search.find_literal(words[1].strip(), from_line)
+        if not line:
+            return
+        window_start = self.gcode_listing.window_start
+        self.gcode_listing.ensure_line(line)
+        if self.gcode_listing.window_start != window_start:
+            # the refill lost the cursor, put it back where the search carries on from
+            buffer_line = max(self.gcode_listing.buffer_line(from_line) - 1, 0)
+            buf.place_cursor(buf.get_iter_at_line(buffer_line))
+
+    def show_search_match(self, line, what):
+        if not line:
+            self.error_handler.write("No more matches for %s in the program" % what, ALARM_LEVEL_LOW)
+            return
+        # select the matching line, set start line from the popup then starts there
+        self.gcode_listing.ensure_line(line)
+        buffer_line = self.gcode_listing.buffer_line(line) - 1
+        start = self.gcodelisting_buffer.get_iter_at_line(buffer_line)
+        end = start.copy()
+        end.forward_to_line_end()
+        self.gcodelisting_buffer.select_range(start, end)
+        self.sourceview.scroll_to_iter(start, 0, True, 0, 0.5)
+
+    # the marks and the start line are kept in program line numbers, the listing
+    # translates them to the window of the program currently in the buffer
+
+    def set_start_line(self, line=None):
+        if line is None:
+            # the line under the cursor
+            cursor = self.gcodelisting_buffer.get_iter_at_mark(self.gcodelisting_buffer.get_insert())
+            line = self.gcode_listing.program_line(cursor.get_line() + 1)
+        self.gcode_listing.ensure_line(line)
+        TormachUIBase.set_start_line(self, self.gcode_listing.buffer_line(line))
+        self.gcode_start_line = line
+
+    def gcodelisting_mark_start_line(self, line=None):
+        if line is None:
+            line = self.gcode_start_line
+        self.gcode_listing.ensure_line(line)
+        TormachUIBase.gcodelisting_mark_start_line(self, self.gcode_listing.buffer_line(line))
+
+    def gcodelisting_mark_motion_line(self, line):
+        if not getattr(self.sourceview, 'masked', False):
+            # leave the window alone while the operator is scrolling around in it
+            self.gcode_listing.ensure_line(line)
+        TormachUIBase.gcodelisting_mark_motion_line(self, self.gcode_listing.buffer_line(line))
+
     def on_filechooserwidget_file_activated(self, widget, data=None):
         self.gcode_filename = os.path.join(self.directory, widget.get_filename())
         self.load_gcode_file()
@@ -2095,7 +2214,7 @@ class mill(TormachUIBase):
         self.load_gcode_file()
 
     def load_gcode_file(self, path):
-        self.elapsed_time_label.set_text('')
+        self.widget_binding.set_text(self.elapsed_time_label, '')
         if self.moving():
             if self.feedhold_active.is_set():
                 self.error_handler.write("Machine is in feedhold - press stop or reset to clear feedhold before loading a g code program")
@@ -2105,10 +2224,19 @@ class mill(TormachUIBase):
         self.is_gcode_program_loaded = True
         # remember what was last loaded to watch for changes on disk and reload
         self.set_current_gcode_path(path)
+        self.gcode_file_changed = False
         if not path:
-            self.gcodelisting_buffer.set_text('')
+            self.file_watcher.unwatch('gcode')
+            self.preview_loader.cancel()
+            self.preview_progress.hide()
+            self.gcode_listing.clear()
+            self.gcode_search.cancel()
+            self.arc_fit_job.cancel()
             return
 
+        # what runs may be the arc fitted copy, history, reloads and the file watcher stay on path
+        run_path = self.arc_fitted_path(path)
+
         # prevent changes to the combo box from causing file loads
         self.combobox_masked = True
         # remove filename from previous model position if it was previously in the model
@@ -2124,20 +2252,30 @@ class mill(TormachUIBase):
         # unmask
         self.combobox_masked = False
 
-        # read file directly into buffer
-        tormach_file_util.open_text_file(self, path, self.gcodelisting_buffer)
+        # index the file and show the start of it, the rest is read as it is scrolled to
+        try:
+            self.gcode_listing.load(run_path)
+        except (IOError, OSError) as e:
+            self.error_handler.write("Cannot read g code program %s: %s" % (path, str(e)))
+            self.gcode_listing.clear()
+            return
+        self.gcode_search.start(self.gcode_listing.index)
 
         # can change this with right-click menu in source view
         # this is one based, the textbuffer is zero based
         self.gcode_start_line = 1;
+        self.preflight = None
+        self.preflight_problems_reported = []
+        self.preflight_acknowledged = False
         # must switch to mdi, then back to force clear of _setup.file_pointer, otherwise
         # we can't open a program if one is already open
         self.ensure_mode(linuxcnc.MODE_MDI)
         # load file into LinuxCNC
         self.ensure_mode(linuxcnc.MODE_AUTO)
-        self.command.program_open(path)
+        self.command.program_open(run_path)
         # note the time stamp
         self.gcode_file_mtime = os.stat(path).st_mtime
+        self.file_watcher.watch('gcode', path, self.on_gcode_file_changed)
 
         # gremlin is unpredictable at the moment
         # wrap it for exceptions
@@ -2150,18 +2288,8 @@ class mill(TormachUIBase):
             #traceback_txt = "".join(traceback.format_exception(*sys.exc_info()))
             #print traceback_txt
 
-        try:
-            # with no filename given, gremlin will ask LinuxCNC for the filename
-            result, seq, warnings = self.gremlin.load()
-            #Quick way to dump warnings to status window
-            self.gremlin.report_gcode_warnings(warnings,os.path.basename(path))
-
-        except Exception as e:
-            print 'gremlin.load() raised an exception'
-            msg = "An exception of type {0} occured, these were the arguments:\n{1!r}"
-            print msg.format(type(e).__name__, e.args)
-            #traceback_txt = "".join(traceback.format_exception(*sys.exc_info()))
-            #print traceback_txt
+        # parse the preview in the background, a load still in progress is cancelled
+        self.start_preview_load(run_path)
 
         try:
             self.gremlin.set_highlight_line(None)
@@ -2189,6 +2317,156 @@ class mill(TormachUIBase):
         self.gcode_pattern_search.on_load_gcode()
 
 
+    def arc_fitted_path(self, path):
+        # the arc fitted copy of path once it has been made; until then path, with the copy
+        # being made in the background
+        self.arc_fit_job.cancel()
+        tolerance = self.prefs.get_float('arc_fit_tolerance', 0.0)
+        if tolerance <= 0:
+            return path
+        try:
+            key, fitted = arc_fitter.cached_path(self.arc_fit_cache, path, tolerance)
+            if fitted is not None:
+                return fitted
+            self.arc_fit_job.start(path, tolerance, key, self.on_arc_fit_done)
+        except (IOError, OSError) as e:
+            self.error_handler.write("Arc fitting %s failed: %s" % (path, str(e)), ALARM_LEVEL_LOW)
+        return path
+
+    def on_arc_fit_done(self, source, fitted):
+        if fitted is None:
+            self.error_handler.write("Arc fitting %s failed, the program runs as it is" % os.path.basename(source), ALARM_LEVEL_LOW)
+            return
+        # reloading now would reset the start line and the pre-flight acknowledgement,
+        # the copy is used from the next time the program is loaded
+        if source == self.current_gcode_file_path:
+            self.error_handler.write("Arc fitted copy of %s is ready, load the program again to run it" % os.path.basename(source), ALARM_LEVEL_LOW)
+
+    def arc_fit_command(self, command_text):
+        # ARCFIT <tolerance> or ARCFIT OFF from the MDI line
+        words = command_text.upper().split()
+        if len(words) != 2 or words[0] != 'ARCFIT':
+            return False
+        if words[1] == 'OFF':
+            tolerance = 0.0
+        else:
+            try:
+                tolerance = float(words[1])
+            except ValueError:
+                self.error_handler.write("ARCFIT needs a tolerance in machine units or OFF", ALARM_LEVEL_LOW)
+                return True
+        self.prefs.set('arc_fit_tolerance', str(tolerance))
+        self.error_handler.write("Arc fitting %s" % ('off' if tolerance <= 0 else 'to within %.4f' % tolerance), ALARM_LEVEL_LOW)
+        self.mdi_line.set_text("")
+        return True
+
+    # file watcher callbacks, only called when the content really changed
+    def on_gcode_file_changed(self, path):
+        if path == os.path.abspath(self.current_gcode_file_path):
+            self.gcode_file_changed = True
+
+    def on_tool_table_file_changed(self, path):
+        self.tool_table_file_mtime = os.stat(path).st_mtime
+        self.tool_table_file_changed = True
+
+    def tool_table_file_matches_status(self):
+        # True if the file holds the tools LinuxCNC has, as it does after saving a change the UI made
+        loaded = dict((tool.id, (tool.zoffset, tool.diameter)) for tool in self.status.tool_table if tool.id > 0)
+        try:
+            with open(self.tool_table_filename, 'r') as f:
+                for text in f:
+                    words = dict((word[0].upper(), word[1:]) for word in text.split(';')[0].split() if len(word) > 1)
+                    if 'T' not in words:
+                        continue
+                    number = int(words['T'])
+                    zoffset, diameter = loaded.pop(number, (None, None))
+                    if zoffset is None or abs(float(words.get('Z', 0.0)) - zoffset) > 1e-5 or \
+                       abs(float(words.get('D', 0.0)) - diameter) > 1e-5:
+                        return False
+        except (IOError, ValueError):
+            return False
+        return not loaded
+
+    def start_preview_load(self, path, report_warnings=True):
+        try:
+            job = self.gremlin.make_preview_job(path)
+            job.cache = self.preview_cache
+            job.limits = self.motion_limits
+        except Exception as e:
+            print 'gremlin.make_preview_job() raised an exception'
+            msg = "An exception of type {0} occured, these were the arguments:\n{1!r}"
+            print msg.format(type(e).__name__, e.args)
+            return
+        self.preview_progress.set_fraction(0.0)
+        self.preview_progress.show()
+        self.preview_loader.start(job, self.on_preview_progress,
+                                  lambda parsed: self.on_preview_loaded(parsed, report_warnings),
+                                  lambda result: self.on_preflight(result, report_warnings),
+                                  self.on_preview_lod)
+
+    def on_preview_progress(self, fraction):
+        self.preview_progress.set_fraction(fraction)
+
+    def on_preview_loaded(self, parsed, report_warnings):
+        self.preview_progress.hide()
+        if parsed is None:
+            return
+        try:
+            self.gremlin.set_preview_offsets(self.status.g5x_offset, self.status.g92_offset, self.status.rotation_xy)
+            self.gremlin.load_parsed(parsed)
+            if report_warnings:
+                #Quick way to dump warnings to status window
+                self.gremlin.report_gcode_warnings(parsed.warnings, os.path.basename(parsed.filename))
+        except Exception as e:
+            print 'gremlin.load_parsed() raised an exception'
+            msg = "An exception of type {0} occured, these were the arguments:\n{1!r}"
+            print msg.format(type(e).__name__, e.args)
+
+    def on_preview_lod(self, parsed):
+        try:
+            self.gremlin.set_lod_levels(parsed)
+        except Exception as e:
+            print 'gremlin.set_lod_levels() raised an exception'
+            msg = "An exception of type {0} occured, these were the arguments:\n{1!r}"
+            print msg.format(type(e).__name__, e.args)
+
+    def on_preflight(self, result, report):
+        self.preflight = result
+        problems = self.preflight_problems()
+        if report:
+            tools = ', '.join('T%d' % tool for tool in result.tools) or 'none'
+            self.error_handler.write("Pre-flight: estimated run time %s, tools %s" % (preflight.format_duration(result.seconds), tools), ALARM_LEVEL_LOW)
+            for problem in problems:
+                self.error_handler.write("Pre-flight: " + problem, ALARM_LEVEL_MEDIUM)
+        self.preflight_problems_reported = problems
+
+    def preflight_problems(self):
+        # checked against the current offsets and tool table, the analysis itself stays as loaded
+        if self.preflight is None:
+            return []
+        extents = self.preflight.extents
+        if extents is not None and self.gremlin.parsed_offsets is not None:
+            offsets = (tuple(self.status.g5x_offset[:3]), tuple(self.status.g92_offset[:3]), self.status.rotation_xy)
+            if self.gremlin.parsed_offsets_fixed:
+                extents = preflight.move_extents(extents, self.gremlin.parsed_offsets, offsets)
+            elif not work_offsets.same_offsets(offsets, self.gremlin.parsed_offsets):
+                # the program sets its own offsets, the analysis of the parse under the new ones is on its way
+                extents = None
+        min_bounds, max_bounds = self.get_machine_bounding_box()
+        return preflight.limit_problems(extents, min_bounds, max_bounds) + \
+               preflight.tool_problems(self.preflight.tools, self.status.tool_table)
+
+    def recheck_preflight(self):
+        # report only what the last change brought up
+        if self.preflight is None:
+            return
+        problems = self.preflight_problems()
+        for problem in problems:
+            if problem not in self.preflight_problems_reported:
+                self.error_handler.write("Pre-flight: " + problem, ALARM_LEVEL_MEDIUM)
+                self.preflight_acknowledged = False
+        self.preflight_problems_reported = problems
+
     def on_gcode_scrollbar_button_press(self, vscrollbar, event, data=None):
         # mask the motion line update so user can scroll through code without periodic update stepping on his scrolling
         self.sourceview.masked = True
@@ -2242,6 +2520,7 @@ class mill(TormachUIBase):
             return True
 
         if event.keyval == gtk.keysyms.Return:
+            self.move_listing_to_next_match(self.mdi_line.get_text())
             if self.gcode_pattern_search.find_last(event):
                 return True
 
@@ -2310,6 +2589,13 @@ class mill(TormachUIBase):
             # not a problem
             pass
 
+        if self.arc_fit_command(command_text):
+            return
+
+        if probing.probe_admin_command(self, command_text):
+            return
+
+        self.move_listing_to_next_match(command_text)
         if (mdi_find_command(self, command_text)):
             return
 
@@ -2412,6 +2698,18 @@ class mill(TormachUIBase):
             self.error_handler.write("Must reference X, Y, and Z axes before executing a gcode program", ALARM_LEVEL_MEDIUM)
             return
 
+        # stop a program that would run past the machine limits or call a missing tool before
+        # the spindle starts; pressing cycle start again runs it anyway
+        if self.is_gcode_program_loaded and not self.preflight_acknowledged and not self.status.paused and \
+           self.status.interp_state == linuxcnc.INTERP_IDLE:
+            problems = self.preflight_problems()
+            if problems:
+                self.preflight_acknowledged = True
+                for problem in problems:
+                    self.error_handler.write("Pre-flight: " + problem, ALARM_LEVEL_MEDIUM)
+                self.error_handler.write("Pre-flight check failed - press cycle start again to run the program anyway", ALARM_LEVEL_MEDIUM)
+                return
+
         if self.program_paused_for_door_sw_open:
             self.error_handler.write("Resuming program because door sw was closed", ALARM_LEVEL_DEBUG)
             self.program_paused_for_door_sw_open = False
@@ -2451,7 +2749,18 @@ class mill(TormachUIBase):
                 self.command.auto(linuxcnc.AUTO_RESUME)
                 return
         self.gcode_pattern_search.clear()
+        self.gcode_search.clear()
         # Otherwise, switch to MODE_AUTO and run the code
+        if self.status.interp_state == linuxcnc.INTERP_IDLE:
+            if self.restart_preamble_timer is not None or self.restart_scan.busy():
+                # still restoring the state for a run from a line
+                return
+            if self.gcode_start_line != 1:
+                self.start_restart_preamble(self.gcode_start_line)
+                return
+            self.run_program_from_start_line()
+
+    def run_program_from_start_line(self):
         if self.status.interp_state == linuxcnc.INTERP_IDLE:
             self.ensure_mode(linuxcnc.MODE_AUTO)
             if self.single_block_active:
@@ -2469,6 +2778,66 @@ class mill(TormachUIBase):
                 self.set_start_line(1)
 
 
+    def start_restart_preamble(self, line):
+        # rebuild the modal state the lines before the start line set up and restore it with
+        # MDI before running from there; the program is read up to the line in the background
+        lines = self.gcode_listing.index
+        self.restart_scan.start(lines, line, lambda state: self.on_restart_scan_done(lines, line, state))
+
+    def on_restart_scan_done(self, lines, line, state):
+        if lines is not self.gcode_listing.index or line != self.gcode_start_line:
+            # another program or start line since cycle start
+            return
+        if self.status.task_state != linuxcnc.STATE_ON or self.status.interp_state != linuxcnc.INTERP_IDLE:
+            return
+        if state is None:
+            self.error_handler.write("Cannot restart the program: reading it up to line %d failed" % line, ALARM_LEVEL_MEDIUM)
+            return
+        if state.problems:
+            for problem in state.problems:
+                self.error_handler.write("Cannot restart the program: " + problem, ALARM_LEVEL_MEDIUM)
+            return
+        commands = program_restart.preamble(state, self.status.tool_in_spindle)
+        if not commands:
+            self.run_program_from_start_line()
+            return
+        self.error_handler.write("Restoring state for line %d: %s" % (line, ' ; '.join(commands)), ALARM_LEVEL_LOW)
+        self.restart_preamble = collections.deque(commands)
+        self.restart_preamble_timer = glib.timeout_add(100, self.on_restart_preamble_timer)
+
+    def on_restart_preamble_timer(self):
+        # one command at a time, each once the interpreter has finished the one before
+        if self.status.task_state != linuxcnc.STATE_ON:
+            self.cancel_restart_preamble()
+            return False
+        if self.restart_preamble_settle:
+            # give status a poll to pick up the command just issued
+            self.restart_preamble_settle = False
+            return True
+        if self.status.interp_state != linuxcnc.INTERP_IDLE or self.moving():
+            return True
+        if self.restart_preamble:
+            self.issue_mdi(self.restart_preamble.popleft())
+            self.restart_preamble_settle = True
+            return True
+        self.restart_preamble_timer = None
+        self.run_program_from_start_line()
+        return False
+
+    def on_probe_cycle_done(self, timing):
+        self.error_handler.write('Probe cycle %s' % timing, ALARM_LEVEL_DEBUG)
+
+    def on_probe_cycle_overrun(self, timing, timeout):
+        self.stop_motion_safely()
+        self.error_handler.write("Probe cycle %s ran longer than %d seconds and was stopped." % (timing.name, timeout), ALARM_LEVEL_MEDIUM)
+
+    def cancel_restart_preamble(self):
+        self.restart_scan.cancel()
+        if self.restart_preamble_timer is not None:
+            glib.source_remove(self.restart_preamble_timer)
+            self.restart_preamble_timer = None
+        self.restart_preamble.clear()
+
     def on_single_block_button_release_event(self, widget, data=None):
         if not self.check_button_permissions(widget): return
         # unconditionally set sb_active flag and button image
@@ -2531,6 +2900,9 @@ class mill(TormachUIBase):
 
         #Send abort message to motion to stop any movement
         self.command.abort()
+        self.cancel_restart_preamble()
+        self.probe_watchdog.cancel()
+        self.probe_sequence.cancel()
 
         #self.command.wait_complete()
 
@@ -2638,10 +3010,11 @@ class mill(TormachUIBase):
         self.first_run = False
         #purge any left over message and answersfrom prior aborts in redis queue
         try:
-            self.redis.delete('TormachMessage')
+            message_listener.clear_messages(self.redis)
             self.redis.delete('TormachAnswers')
         except:
             pass
+        self.tormach_message_queue.clear()
 
         # custom X/Y soft limits
 
@@ -2654,7 +3027,7 @@ class mill(TormachUIBase):
 
 
         try:
-            self.x_soft_limit = float(self.redis.hget('machine_prefs', 'x_soft_limit'))
+            self.x_soft_limit = float(self.prefs.get('x_soft_limit'))
             print 'setting X soft limit to: %f' % self.x_soft_limit
             self.command.set_max_limit(0, self.x_soft_limit)
         except Exception as e:
@@ -2663,7 +3036,7 @@ class mill(TormachUIBase):
             #print msg.format(type(e).__name__, e.args)
 
         try:
-            self.y_soft_limit = float(self.redis.hget('machine_prefs', 'y_soft_limit'))
+            self.y_soft_limit = float(self.prefs.get('y_soft_limit'))
             print 'setting Y soft limit to: %f' % self.y_soft_limit
             self.command.set_min_limit(1, self.y_soft_limit)
         except Exception as e:
@@ -2674,7 +3047,7 @@ class mill(TormachUIBase):
 
 
         try:
-            self.z_soft_limit = float(self.redis.hget('machine_prefs', 'z_soft_limit'))
+            self.z_soft_limit = float(self.prefs.get('z_soft_limit'))
             print 'setting Z soft limit to: %f' % self.z_soft_limit
             self.command.set_min_limit(2, self.z_soft_limit)
         except Exception as e:
@@ -2686,25 +3059,25 @@ class mill(TormachUIBase):
         self.status.poll()
         self.ensure_mode(linuxcnc.MODE_MDI)
         try:
-            if self.redis.hget('machine_prefs', 'g21') == "True":
+            if self.prefs.get('g21') == "True":
                 self.issue_mdi("G21")
                 # need wait_complete or else subsequent tool change will fail
                 self.command.wait_complete()
 
             # RESET TOOL IN SPINDLE WITH M61 TO BYPASS TOOL CHANGING
-            tool_num = self.redis.hget('machine_prefs', 'active_tool')
+            tool_num = self.prefs.get('active_tool')
             if int(tool_num) < 0 : tool_num = '0'
             self.issue_mdi("M61 Q" + tool_num)
             self.command.wait_complete()
             self.issue_mdi('G43')
 
-            feedrate = self.redis.hget('machine_prefs', 'feedrate')
+            feedrate = self.prefs.get('feedrate')
             print "feedrate: ", feedrate
             if feedrate != '0' and feedrate != None:
                 g94_command = "G94 F%.4f" % float(feedrate)
                 self.issue_mdi(g94_command)
 
-            spind_speed = self.redis.hget('machine_prefs', 'spindle_speed')
+            spind_speed = self.prefs.get('spindle_speed')
             if spind_speed != '0' and spind_speed != None:
                 s_command = "S%.4f" % float(spind_speed)
                 self.issue_mdi(s_command)
@@ -3122,11 +3495,11 @@ class mill(TormachUIBase):
         if self.door_sw_enabled:
             # have we already warned the user about door sw wiring?
             try:
-                show_warning = self.redis.hget('machine_prefs', 'display_door_sw_x_ref_warning') == 'True'
+                show_warning = self.prefs.get('display_door_sw_x_ref_warning') == 'True'
             except:
                 # redis key doesn't exist, assume we want to display this
                 show_warning = True
-                self.redis.hset('machine_prefs', 'display_door_sw_x_ref_warning', 'True')
+                self.prefs.set('display_door_sw_x_ref_warning', 'True')
             if show_warning:
                 dialog = tormach_file_util.ok_cancel_popup('enclosure    door   switch    is    enabled    on    settings    screen.   has    switch    been    installed    and    wiring    changes    been    made?');
                 dialog.run()
@@ -3134,7 +3507,7 @@ class mill(TormachUIBase):
                 dialog.destroy()
                 if response != gtk.RESPONSE_OK :
                     return
-                self.redis.hset('machine_prefs', 'display_door_sw_x_ref_warning', 'False')
+                self.prefs.set('display_door_sw_x_ref_warning', 'False')
 
         self.ref_axis(0)
 
@@ -3692,11 +4065,11 @@ class mill(TormachUIBase):
             # we're in high gear, so make it lo
             self.hal['spindle-range'] = 0
             self.set_image('spindle_range_image', 'Spindle_Range_LO_Highlight.png')
-            self.redis.hset('machine_prefs', 'spindle_range', 'lo')
+            self.prefs.set('spindle_range', 'lo')
         else:
             self.hal['spindle-range'] = 1
             self.set_image('spindle_range_image', 'Spindle_Range_HI_Highlight.png')
-            self.redis.hset('machine_prefs', 'spindle_range', 'hi')
+            self.prefs.set('spindle_range', 'hi')
 
 
     def on_tool_dro_gets_focus(self, widget, data=None):
@@ -3768,7 +4141,7 @@ class mill(TormachUIBase):
         # ask if they want to fetch the tool from the tray or just M61 to make it active
         old_tool_in_tray = new_tool_in_tray = invoke_atc = False  #default until we know better
         if self.atc.operational:
-            self.status.poll()
+            self.status.latch()
             if self.atc.lookup_slot(self.status.tool_in_spindle) >= 0: old_tool_in_tray= True
             if self.atc.lookup_slot(tool_num) >= 0: new_tool_in_tray = True
 
@@ -3911,27 +4284,18 @@ class mill(TormachUIBase):
 
     def save_persistent_data(self):
         tool_num = self.status.tool_in_spindle
-        self.redis.hset('machine_prefs', 'active_tool', tool_num)
+        self.prefs.set('active_tool', tool_num)
+        self.prefs.set('mdi_history_index', self.mdi_history_index)
         try:
-            for item in self.mdi_history:
-                self.redis.rpush('mdi_history', item)
-                self.redis.hset('machine_prefs', 'mdi_history_index', self.mdi_history_index)
+            # both lists go out in one transaction, and only if they changed
+            file_history = [row[1] for row in self.file_history_liststore if row[1] != CLEAR_CURRENT_PROGRAM]
+            persistent_store.save_stores(self.redis, [(self.mdi_history_store, self.mdi_history),
+                                                      (self.file_history_store, file_history)])
         except:
-            self.error_handler.write("Failed to save MDI history.", ALARM_LEVEL_DEBUG)
+            self.error_handler.write("Failed to save MDI and recent file history.", ALARM_LEVEL_DEBUG)
             pass
-
-        try:
-            # delete old redis values to prevent this list from growing ad infinitum
-            self.redis.delete('recent_file_history')
-            for row in self.file_history_liststore:
-                path = row[1]
-                if path != CLEAR_CURRENT_PROGRAM:
-                    self.redis.rpush('recent_file_history', path)
-        except:
-            self.error_handler.write("Failed to save recent file history.", ALARM_LEVEL_DEBUG)
-            pass
-        if self.f_word != 0: self.redis.hset('machine_prefs', 'feedrate', str(self.f_word))
-        if self.s_word != 0: self.redis.hset('machine_prefs', 'spindle_speed', str(self.s_word))
+        if self.f_word != 0: self.prefs.set('feedrate', str(self.f_word))
+        if self.s_word != 0: self.prefs.set('spindle_speed', str(self.s_word))
 
 
 
@@ -3954,6 +4318,12 @@ class mill(TormachUIBase):
 
     def quit(self):
         self.save_persistent_data()
+        # push out any settings the write-behind thread has not written yet
+        self.prefs.stop()
+        self.dump_periodic_profile()
+        self.status_poller.stop()
+        self.preview_loader.cancel()
+        self.message_listener.stop()
         self.atc.process_queue.put(('terminate',None))  #shut down worker bee
         if self.notify_at_cycle_start:  # is anyone waiting on us
             self.notify_at_cycle_start = False
@@ -4131,7 +4501,7 @@ class mill(TormachUIBase):
             self.error_handler.write(error_msg, ALARM_LEVEL_LOW)
             return
         self.injector_dwell = value
-        self.redis.hset('machine_prefs', 'injector_dwell', str(self.injector_dwell))
+        self.prefs.set('injector_dwell', str(self.injector_dwell))
         widget.set_text(self.dro_medium_format % value)
         self.window.set_focus(None)
 
@@ -4153,25 +4523,25 @@ class mill(TormachUIBase):
         if not self.first_run:
             self.hd_file_chooser.touchscreen_enabled = self.touchscreen_enabled
             self.usb_file_chooser.touchscreen_enabled = self.touchscreen_enabled
-        self.redis.hset('machine_prefs', 'touchscreen', self.touchscreen_enabled)
+        self.prefs.set('touchscreen', self.touchscreen_enabled)
         self.window.set_focus(None)
 
     def on_enable_scanner_checkbutton_toggled(self, widget, data=None):
         #Note: if scanner2 fails to load, then scanner won't enable here
         self.scanner_enabled = widget.get_active()
-        self.redis.hset('machine_prefs', 'scanner_enabled', self.scanner_enabled)
+        self.prefs.set('scanner_enabled', self.scanner_enabled)
         page = self.notebook.get_nth_page(CNC_SCANNER_PAGE)
         if self.scanner_enabled:
             page.show()
             if self.scanner == None:
-                self.scanner = scanner2.Scanner(self.status, render_target=self.scanner_common_camera_image)
+                self.scanner = scanner2.Scanner(status_snapshot.status_view(self.status_poller), render_target=self.scanner_common_camera_image)
         else:
             page.hide()
         self.window.set_focus(None)
 
     def on_enable_injector_checkbutton_toggled(self, widget, data=None):
         self.injector_enabled = widget.get_active()
-        self.redis.hset('machine_prefs', 'injector_enabled', self.injector_enabled)
+        self.prefs.set('injector_enabled', self.injector_enabled)
         page = self.notebook.get_nth_page(INJECTOR_PAGE)
         if self.injector_enabled:
             page.show()
@@ -4183,10 +4553,10 @@ class mill(TormachUIBase):
     def on_enable_door_sw_checkbutton_toggled(self, widget, data=None):
         self.door_sw_enabled = widget.get_active()
         self.hal['enc-door-switch-configured'] = self.door_sw_enabled
-        if self.door_sw_enabled and (self.redis.hget('machine_prefs', 'door_sw_enabled') == 'False'):
+        if self.door_sw_enabled and (self.prefs.get('door_sw_enabled') == 'False'):
             # we've just gone from disabled to enabled, so show a warning next time we ref x
-            self.redis.hset('machine_prefs', 'display_door_sw_x_ref_warning', 'True')
-        self.redis.hset('machine_prefs', 'door_sw_enabled', self.door_sw_enabled)
+            self.prefs.set('display_door_sw_x_ref_warning', 'True')
+        self.prefs.set('door_sw_enabled', self.door_sw_enabled)
         self.window.set_focus(None)
         self.show_or_hide_x_limit_led()
         self.show_or_hide_door_sw_led()
@@ -4213,28 +4583,28 @@ class mill(TormachUIBase):
 
     def on_g30m998_move_z_only_checkbutton_toggled(self, widget, data=None):
         self.g30m998_move_z_only = widget.get_active()
-        self.redis.hset('machine_prefs', 'g30m998_move_z_only', self.g30m998_move_z_only)
+        self.prefs.set('g30m998_move_z_only', self.g30m998_move_z_only)
         self.window.set_focus(None)
 
     # these two radio buttons are a group
     def on_passive_probe_radiobutton_toggled(self, widget, data=None):
         if widget.get_active():
             self.probe_active_high = False
-            self.redis.hset('machine_prefs', 'probe_active_high', self.probe_active_high)
+            self.prefs.set('probe_active_high', self.probe_active_high)
             self.hal['probe-active-high'] = self.probe_active_high
             self.window.set_focus(None)
 
     def on_active_probe_radiobutton_toggled(self, widget, data=None):
         if widget.get_active():
             self.probe_active_high = True
-            self.redis.hset('machine_prefs', 'probe_active_high', self.probe_active_high)
+            self.prefs.set('probe_active_high', self.probe_active_high)
             self.hal['probe-active-high'] = self.probe_active_high
             self.window.set_focus(None)
 
     def on_fourth_axis_homing_checkbutton_toggled(self, widget, data=None):
         self.fourth_axis_homing_enabled = widget.get_active()
         self.set_4th_axis_homing_parameters(self.fourth_axis_homing_enabled)
-        self.redis.hset('machine_prefs', 'fourth_axis_homing_enabled', self.fourth_axis_homing_enabled)
+        self.prefs.set('fourth_axis_homing_enabled', self.fourth_axis_homing_enabled)
         self.window.set_focus(None)
 
     def on_use_atc_checkbutton_toggled(self, widget, data=None):
@@ -4623,6 +4993,8 @@ class mill(TormachUIBase):
         s1 = s.replace('(','[')
         s2 = s1.replace(')',']')
         model[row][1] = s2
+        if self.tool_descriptions is not None:
+            self.tool_descriptions[str(tool_number)] = s2
         self.redis.hset('tool_descriptions', str(tool_number), s2)
 
 
@@ -4729,6 +5101,8 @@ class mill(TormachUIBase):
         g10_command = "G10 L2 P%s %s%s" % (int(row)+1, axis.upper(), value)
         self.issue_mdi(g10_command)
         self.command.wait_complete()
+        # the var file has the old value until the interpreter next writes it out
+        self.work_offset_reader.set_pending(row, col - 1, float(value) / self.get_linear_scale())
 
     # ---------------------------------------------------------------------
     # end of work offset tab callbacks
@@ -6860,7 +7234,7 @@ class mill(TormachUIBase):
     def on_engrave_sn_start_button_release(self, widget, data=None):
         current_sn = ''
         try:
-            current_sn = self.redis.hget('machine_prefs', 'current_engraving_sn')
+            current_sn = self.prefs.get('current_engraving_sn')
         except:
             pass
         self.engrave_dro_list['engrave_sn_start_dro'].set_text(current_sn)
@@ -7013,7 +7387,7 @@ class mill(TormachUIBase):
         if len(current_number) > 0:
             return
         try:
-            current_sn = self.redis.hget('machine_prefs', 'current_engraving_sn')
+            current_sn = self.prefs.get('current_engraving_sn')
             current_text = widget.get_text()
             current_text_length = len(current_text)
             current_sn_length = len(current_sn)
@@ -7033,7 +7407,7 @@ class mill(TormachUIBase):
         text = number_as_text if number_as_text is not None else ''
         try:
             if len(text) > 0:
-                self.redis.hset('machine_prefs', 'current_engraving_sn', text)
+                self.prefs.set('current_engraving_sn', text)
         except:
             pass
         widget.set_text(text)
@@ -7059,7 +7433,7 @@ class mill(TormachUIBase):
         if event.state == gtk.gdk.VISIBILITY_UNOBSCURED:
             # set the tooltip to the current SN
             try:
-                current_sn = self.redis.hget('machine_prefs', 'current_engraving_sn')
+                current_sn = self.prefs.get('current_engraving_sn')
                 current_text = widget.get_text()
                 current_text_length = len(current_text)
                 current_sn_length = len(current_sn)
@@ -7230,7 +7604,7 @@ class mill(TormachUIBase):
         widget.set_text(self.dro_long_format % value)
         # store this value in machine setup untis (inches) at all times.
         self.ets_height = value/self.get_linear_scale()
-        self.redis.hset('machine_prefs', 'setter_height', self.ets_height)
+        self.prefs.set('setter_height', self.ets_height)
         widget.masked = False
         self.window.set_focus(None)
 
@@ -7271,24 +7645,21 @@ class mill(TormachUIBase):
     # -------------------------------------------------------------------------------------------------
 
     def save_conv_title(self, key):
-        if self.redis.hexists('machine_prefs',key):
+        if self.prefs.exists(key):
             value = self.conv_dro_list['conv_title_dro'].get_text()
-            self.redis.hset('machine_prefs',key,value)
+            self.prefs.set(key,value)
         else:
             print 'save_conv_title - could not find %s' % key
 
     def save_conv_parameters(self, dro_list):
-        # loop through conv dro list and save values to redis
-        for name, dro in self.conv_dro_list.iteritems():
-            val = dro.get_text()
-            self.redis.hset('conversational', name, val)
-        for name, dro in dro_list.iteritems():
-            val = dro.get_text()
-            self.redis.hset('conversational', name, val)
+        # save the conv dro list and the tab's dro list to redis, only the values that changed
+        values = dict((name, dro.get_text()) for name, dro in self.conv_dro_list.iteritems())
+        values.update((name, dro.get_text()) for name, dro in dro_list.iteritems())
+        persistent_store.save_stores(self.redis, [(self.conv_store, values)])
         return
 
     def restore_conv_parameters(self):
-        conv_dict = self.redis.hgetall('conversational')
+        conv_dict = self.conv_store.load()
         for dro_name , val in conv_dict.iteritems():
             try:
                 if 'conv' in dro_name:
@@ -7385,7 +7756,7 @@ class mill(TormachUIBase):
     def on_disable_home_switches_checkbutton_toggled(self, widget, data=None):
         self.home_switches_enabled = not widget.get_active()
         self.hal["home-switch-enable"] = self.home_switches_enabled
-        self.redis.hset('machine_prefs', 'home_switches_enabled', self.home_switches_enabled)
+        self.prefs.set('home_switches_enabled', self.home_switches_enabled)
         self.window.set_focus(None)
         if self.home_switches_enabled:
             self.enable_home_switch(0, True)
@@ -7709,15 +8080,33 @@ class mill(TormachUIBase):
 
 
     # periodic updates to LEDs, DROs, more . . .
-    def periodic_status(self):
-        # 50 ms functions is always called
-        self.status_periodic_50ms()
-        # increment loop counter and call slow period function as needed
-        self.periodic_loopcount += 1
-        if self.periodic_loopcount >= 10:
-            self.status_periodic_500ms()
-            self.periodic_loopcount = 0
-        return True
+    def setup_periodic_tasks(self):
+        # rates are (ms while machine is active, ms while idle).  Status poll is registered
+        # first so every task after it in the same tick sees fresh data.  The coolant debounce
+        # and the ATC checks count ticks, so their rates are fixed.  The limit switch and ATC
+        # hardware checks are safety checks and run from the timer, never behind slow tasks.
+        self.periodic_scheduler = periodic_scheduler.periodic_scheduler(self.periodic_machine_active)
+        sched = self.periodic_scheduler
+        # every task run goes through the profiler - see the Status page and PERIODIC_PROFILE_FILE
+        sched.run_hook = self.periodic_profiler.run_task
+        sched.add_task('status', self.status_periodic_50ms, 50, 100)
+        sched.add_task('coolant', self.coolant_periodic, 50)
+        sched.add_task('usbio', self.usb_IO_periodic, 50, 500)
+        sched.add_task('errors', self.error_periodic, 50, 100)
+        sched.add_task('gcode_display', self.update_gcode_display, 50, 250)
+        sched.add_task('jogging', self.update_jogging, 50)
+        sched.add_task('page_leds', self.page_leds_periodic, 50, 100)
+        sched.add_task('scanner', self.scanner_periodic, 65, condition=lambda: self.scanner is not None)
+        sched.add_task('limits', self.limit_switch_periodic, 500)
+        sched.add_task('atc_checks', self.atc_hardware_periodic, 500)
+        sched.add_task('slow', self.status_periodic_500ms, 500, 1000, slow=True)
+        sched.start()
+
+    def periodic_machine_active(self):
+        # poll fast while running a program, moving (MDI, probing, ATC, homing) or jogging
+        if self.program_running() or self.moving() or self.work_probe_in_progress:
+            return True
+        return self.hal['jog-ring-speed-signed'] != 0.0 or self.hal['jog-counts'] != self.prev_hal_jog_counts
 
     def update_spindle_direction_display(self):
         # update spindle direction
@@ -7767,78 +8156,7 @@ class mill(TormachUIBase):
 
 
 
-    # called every 500 milliseconds to update various slower changing DROs and button images
-    def status_periodic_500ms(self):
-        self.current_notebook_page = self.get_current_notebook_page()
-
-        # get machine state
-        machine_executing_gcode = self.program_running()
-        if machine_executing_gcode:
-            machine_busy = True
-        else:
-            # moving under MDI, probing, ATC ops, jogging, etc
-            machine_busy = self.moving()
-
-        if self.hal['mesa-watchdog-has-bit']:
-            # problem! the Mesa card watchdog has bitten
-            # high priority warning
-            if not self.mesa_watchdog_has_bit_seen:
-                # set state to ESTOP
-                self.mesa_watchdog_has_bit_seen = True
-                self.command.state(linuxcnc.STATE_ESTOP)
-                self.error_handler.write("Mesa interface card watchdog has bitten. Must press RESET.", ALARM_LEVEL_MEDIUM)
-
-            # redis-based messaging from asynchrnonous threads - DO NOT USE THIS FACILITY FROM THE MAIN GUI THREAD!!!!!!
-
-            # This is here to allow popups from threads, and NGC prompts - which run asynchronously with GUI thread.
-            # Messages requiring user tool change confirmation during a part program
-            # go to the gremlin message line.  During non-part program they get a pop-up.
-            # Font spacing in Gremlin and in popups is very different, so are the reply instructions
-            # Mesaage strings contain '*' for spaces, and '$$REPLY_TEXT$$' for requested actions
-            # at prompt time these are subtstituted with the appropriate number of spaces and phrases
-            # respectively.
-
-        try:
-            request = self.redis.lpop("TormachMessage")  #pop one off the queue
-        except Exception as e:
-            print "Error in TormachRequest", e
-
-        if (request):
-            self.hal['prompt-reply'] = 0      #set hal signal to waiting
-
-            parsed_request = request.split(':')
-            if "AnswerKey" in parsed_request[0]:   #break down "AnswerKey:key:message" structure
-                self.notify_answer_key = parsed_request [1]
-                message =  parsed_request[2]
-            else:
-                message = parsed_request[0]   #it's all just a message
-
-            if self.program_running():
-                if (message) :
-                    message = message.replace('*',' ')
-                    message = message.replace('$$REPLY_TEXT$$','Press cycle start')
-                    self.set_message_line_text(message)
-                if (self.notify_answer_key) and (message):
-                    self.notify_at_cycle_start = True
-
-                #user now presses cycle start, stop or cancel - see those callbacks for setting prompt channel hal
-            else:
-                message = message.replace('*', '    ')
-                message = message.replace('$$REPLY_TEXT$$','Click    OK    to    continue')
-                dialog = tormach_file_util.ok_cancel_popup(message)
-                dialog.run()
-                ok_cancel_response = dialog.response
-                dialog.destroy()
-                if ok_cancel_response == gtk.RESPONSE_OK:
-                    self.redis.hset("TormachAnswers",self.notify_answer_key,"Y")
-                    self.ensure_mode(linuxcnc.MODE_MDI)
-                    self.hal['prompt-reply'] = 1        #set hal to OK - need this pin incase a MDI M6 line was issued
-                else:
-                    self.redis.hset("TormachAnswers",self.notify_answer_key,"!")
-                    self.ensure_mode(linuxcnc.MODE_MDI)
-                    self.hal['prompt-reply']= 2          #set hal to CANCEL - need this pin incase a MDI M6 line was issued
-
-
+    def atc_hardware_periodic(self):
         # if the ATC does not come up while system is not in RESET  notify user and swtich to manual
         #print self.atc.operational ,self.hal['atc-device-status'],self.status.task_state == linuxcnc.STATE_ON
         if  self.atc.operational and self.hal['atc-device-status'] == False and self.status.task_state == linuxcnc.STATE_ON:
@@ -7873,23 +8191,7 @@ class mill(TormachUIBase):
             else:
                 self.atc_cable_check_count = 0    # reset checker count - not broken anymore
 
-
-        # active gcodes label
-        active_codes = " ".join(self.active_gcodes())
-        self.active_gcodes_label.set_text(active_codes)
-
-        self.update_spindle_direction_display()
-        # reset button
-        if self.status.task_state == linuxcnc.STATE_ESTOP or \
-           self.status.task_state == linuxcnc.STATE_ESTOP_RESET or \
-           self.status.task_state == linuxcnc.STATE_OFF:
-            # blink
-            self.load_reset_image('blink')
-        else:
-            # not in ESTOP or RESET or OFF
-            # load white image
-            self.load_reset_image('white')
-
+    def limit_switch_periodic(self):
         if self.hal['machine-ok'] == False:
             # machine-ok is False
             if self.estop_alarm == False and self.display_estop_msg:
@@ -7938,11 +8240,136 @@ class mill(TormachUIBase):
                     # limit not active so allow next active state to display message
                     self.display_limit_msg[axis_index] = True
 
+        if not self.program_running():
+            # temp kludge - TODO: understand limit overrides.
+            if not self.first_run:
+                # limit switch overrides
+                if (self.status.limit[0] == 3) or (self.status.limit[1] == 3) or (self.status.limit[2] == 3):
+                    self.command.override_limits()
+            if self.status.limit[0] == 3:
+                # only unhome if axis is referenced
+                if self.x_referenced and not self.status.axis[0]['homing']:
+                    self.command.unhome(0)
+                    if self.door_sw_enabled:
+                        if self.y_referenced:
+                            self.command.unhome(1)
+            if self.status.limit[1] == 3:
+                # only unhome if axis is referenced
+                if self.y_referenced and not self.status.axis[1]['homing']:
+                    self.command.unhome(1)
+                    if self.door_sw_enabled:
+                        if self.x_referenced:
+                            self.command.unhome(0)
+            if self.status.limit[2] == 3:
+                # only unhome if axis is referenced
+                if self.z_referenced and not self.status.axis[2]['homing']:
+                    self.command.unhome(2)
+
+    # redis-based messaging from asynchrnonous threads - DO NOT USE THIS FACILITY FROM THE MAIN GUI THREAD!!!!!!
+
+    # This is here to allow popups from threads, and NGC prompts - which run asynchronously with GUI thread.
+    # Messages requiring user tool change confirmation during a part program
+    # go to the gremlin message line.  During non-part program they get a pop-up.
+    # Font spacing in Gremlin and in popups is very different, so are the reply instructions
+    # Mesaage strings contain '*' for spaces, and '$$REPLY_TEXT$$' for requested actions
+    # at prompt time these are subtstituted with the appropriate number of spaces and phrases
+    # respectively.
+
+    # called on the GTK thread by the message listener with every message popped in one burst
+    def on_tormach_messages(self, batch):
+        self.tormach_message_queue.extend(batch)
+        if self.tormach_message_busy:
+            # a popup for an earlier message is up, its loop below picks these up
+            return
+        self.tormach_message_busy = True
+        try:
+            while self.tormach_message_queue:
+                request, queued_time = self.tormach_message_queue.popleft()
+                self.periodic_profiler.record('tormach_msg_latency', time.time() - queued_time)
+                if request:
+                    self.handle_tormach_message(request)
+        finally:
+            self.tormach_message_busy = False
+
+    def handle_tormach_message(self, request):
+        self.hal['prompt-reply'] = 0      #set hal signal to waiting
+
+        parsed_request = request.split(':')
+        if "AnswerKey" in parsed_request[0]:   #break down "AnswerKey:key:message" structure
+            self.notify_answer_key = parsed_request [1]
+            message =  parsed_request[2]
+        else:
+            message = parsed_request[0]   #it's all just a message
+
+        if self.program_running():
+            if (message) :
+                message = message.replace('*',' ')
+                message = message.replace('$$REPLY_TEXT$$','Press cycle start')
+                self.set_message_line_text(message)
+            if (self.notify_answer_key) and (message):
+                self.notify_at_cycle_start = True
+
+            #user now presses cycle start, stop or cancel - see those callbacks for setting prompt channel hal
+        else:
+            message = message.replace('*', '    ')
+            message = message.replace('$$REPLY_TEXT$$','Click    OK    to    continue')
+            dialog = tormach_file_util.ok_cancel_popup(message)
+            dialog.run()
+            ok_cancel_response = dialog.response
+            dialog.destroy()
+            if ok_cancel_response == gtk.RESPONSE_OK:
+                self.redis.hset("TormachAnswers",self.notify_answer_key,"Y")
+                self.ensure_mode(linuxcnc.MODE_MDI)
+                self.hal['prompt-reply'] = 1        #set hal to OK - need this pin incase a MDI M6 line was issued
+            else:
+                self.redis.hset("TormachAnswers",self.notify_answer_key,"!")
+                self.ensure_mode(linuxcnc.MODE_MDI)
+                self.hal['prompt-reply']= 2          #set hal to CANCEL - need this pin incase a MDI M6 line was issued
+
+    # called every 500 milliseconds (1 sec idle) to update various slower changing DROs and button images
+    def status_periodic_500ms(self):
+        self.current_notebook_page = self.get_current_notebook_page()
+
+        # get machine state
+        machine_executing_gcode = self.program_running()
+        if machine_executing_gcode:
+            machine_busy = True
+        else:
+            # moving under MDI, probing, ATC ops, jogging, etc
+            machine_busy = self.moving()
+
+        if self.hal['mesa-watchdog-has-bit']:
+            # problem! the Mesa card watchdog has bitten
+            # high priority warning
+            if not self.mesa_watchdog_has_bit_seen:
+                # set state to ESTOP
+                self.mesa_watchdog_has_bit_seen = True
+                self.command.state(linuxcnc.STATE_ESTOP)
+                self.error_handler.write("Mesa interface card watchdog has bitten. Must press RESET.", ALARM_LEVEL_MEDIUM)
+
+        # active gcodes label
+        active_codes = " ".join(self.active_gcodes())
+        self.widget_binding.set_text(self.active_gcodes_label, active_codes)
+
+        self.update_spindle_direction_display()
+        # reset button
+        if self.status.task_state == linuxcnc.STATE_ESTOP or \
+           self.status.task_state == linuxcnc.STATE_ESTOP_RESET or \
+           self.status.task_state == linuxcnc.STATE_OFF:
+            # blink
+            self.load_reset_image('blink')
+        else:
+            # not in ESTOP or RESET or OFF
+            # load white image
+            self.load_reset_image('white')
+
         # tool DRO
         if not self.dro_list['tool_dro'].masked:
             display_tool = self.status.tool_in_spindle
             if display_tool == -1 : display_tool = 0
-            self.dro_list['tool_dro'].set_text(self.dro_short_format % display_tool)
+            self.widget_binding.set_text(self.dro_list['tool_dro'], display_tool, self.dro_short_format)
+        else:
+            self.widget_binding.invalidate(self.dro_list['tool_dro'])
 
         # metric/imperial switch
         self.update_gui_unit_state()
@@ -7970,7 +8397,8 @@ class mill(TormachUIBase):
 
         #TODO refactor similar to home switch code, vectorize
         if not machine_executing_gcode:
-            self.refresh_gremlin_offsets()
+            with self.periodic_profiler.section('refresh_gremlin_offsets'):
+                self.refresh_gremlin_offsets()
             self.update_jog_leds()
             if self.notebook_locked:
                 self.show_enabled_notebook_tabs()
@@ -7979,18 +8407,22 @@ class mill(TormachUIBase):
             # spindle rpm dro
             if not self.dro_list['spindle_rpm_dro'].masked:
                 if self.door_sw_enabled and self.door_sw_status and self.hal['spindle-on'] and (self.s_word > self.enc_open_door_max_rpm):
-                    self.dro_list['spindle_rpm_dro'].set_text(self.dro_short_format % abs(self.hal['spindle-speed-out']))
+                    self.widget_binding.set_text(self.dro_list['spindle_rpm_dro'], abs(self.hal['spindle-speed-out']), self.dro_short_format)
                 else:
-                    self.dro_list['spindle_rpm_dro'].set_text(self.dro_short_format % abs(self.s_word))
+                    self.widget_binding.set_text(self.dro_list['spindle_rpm_dro'], abs(self.s_word), self.dro_short_format)
+            else:
+                self.widget_binding.invalidate(self.dro_list['spindle_rpm_dro'])
 
             # feed per rev and per rpm
             if not self.dro_list['feed_per_min_dro'].masked:
                 if self.moving():
                     feed_per_min = self.status.current_vel * 60 * self.get_linear_scale()
-                    self.dro_list['feed_per_min_dro'].set_text(self.dro_medium_format % feed_per_min)
+                    self.widget_binding.set_text(self.dro_list['feed_per_min_dro'], feed_per_min, self.dro_medium_format)
                 else:
                     self.f_word = abs(self.status.settings[1])
-                    self.dro_list['feed_per_min_dro'].set_text(self.dro_medium_format % abs(self.f_word))
+                    self.widget_binding.set_text(self.dro_list['feed_per_min_dro'], abs(self.f_word), self.dro_medium_format)
+            else:
+                self.widget_binding.invalidate(self.dro_list['feed_per_min_dro'])
             # display active g code on settings screen
             if self.notebook.get_current_page() == SETTINGS_PAGE:
                 self.gcodes_display.highlight_active_codes(self.active_gcodes())
@@ -8021,30 +8453,6 @@ class mill(TormachUIBase):
                 if self.usbio_enabled: self.refresh_usbio_interface()
                 if self.atc.operational: self.refresh_atc_diagnostics()
 
-            # temp kludge - TODO: understand limit overrides.
-            if not self.first_run:
-                # limit switch overrides
-                if (self.status.limit[0] == 3) or (self.status.limit[1] == 3) or (self.status.limit[2] == 3):
-                    self.command.override_limits()
-            if self.status.limit[0] == 3:
-                # only unhome if axis is referenced
-                if self.x_referenced and not self.status.axis[0]['homing']:
-                    self.command.unhome(0)
-                    if self.door_sw_enabled:
-                        if self.y_referenced:
-                            self.command.unhome(1)
-            if self.status.limit[1] == 3:
-                # only unhome if axis is referenced
-                if self.y_referenced and not self.status.axis[1]['homing']:
-                    self.command.unhome(1)
-                    if self.door_sw_enabled:
-                        if self.x_referenced:
-                            self.command.unhome(0)
-            if self.status.limit[2] == 3:
-                # only unhome if axis is referenced
-                if self.z_referenced and not self.status.axis[2]['homing']:
-                    self.command.unhome(2)
-
             # axis ref'ed button LEDs
             self.x_referenced = self.status.homed[0]
             self.y_referenced = self.status.homed[1]
@@ -8089,10 +8497,10 @@ class mill(TormachUIBase):
             # if we're running a program, use S value from HAL spindle-speed-out and F value from status.current_vel
             self.rpm = int(self.hal["spindle-speed-out"])
             feed_per_min = self.status.current_vel * 60 * self.get_linear_scale()
-            self.dro_list['spindle_rpm_dro'].set_text(self.dro_short_format % abs(self.rpm))
-            self.dro_list['feed_per_min_dro'].set_text(self.dro_medium_format % feed_per_min)
+            self.widget_binding.set_text(self.dro_list['spindle_rpm_dro'], abs(self.rpm), self.dro_short_format)
+            self.widget_binding.set_text(self.dro_list['feed_per_min_dro'], feed_per_min, self.dro_medium_format)
 
-            self.elapsed_time_label.set_text('%02d:%02d:%02d' % (self.hal['cycle-time-hours'], self.hal['cycle-time-minutes'], self.hal['cycle-time-seconds']))
+            self.widget_binding.set_text(self.elapsed_time_label, (self.hal['cycle-time-hours'], self.hal['cycle-time-minutes'], self.hal['cycle-time-seconds']), '%02d:%02d:%02d')
 
             # CS button
             if self.single_block_active or self.feedhold_active.is_set() or self.m01_break_active:
@@ -8112,12 +8520,24 @@ class mill(TormachUIBase):
                 for name, dro in self.dro_list.iteritems():
                     dro.set_can_focus(False)
         else:
-            # if gcode file is loaded and has changed on disk since loading, reload it
-            if self.current_gcode_file_path != '':
-                self.check_for_gcode_program_reload()
+            # if gcode file is loaded and its content has changed on disk since loading, reload it
+            if self.gcode_file_changed:
+                self.gcode_file_changed = False
+                if self.current_gcode_file_path != '':
+                    with self.periodic_profiler.section('gcode_reload_check'):
+                        self.check_for_gcode_program_reload()
+
+            # tool table file rewritten, by LinuxCNC after the UI changed a tool or by an edit
+            # outside it; only an outside edit, which LinuxCNC does not have yet, is loaded
+            if self.tool_table_file_changed:
+                self.tool_table_file_changed = False
+                if not self.tool_table_file_matches_status():
+                    self.command.load_tool_table()
+                self.tool_liststore_stale = 2
 
             # check custom thread files for changes, reload if necessary
-            self.thread_custom_file_reload_if_changed()
+            with self.periodic_profiler.section('thread_file_check'):
+                self.thread_custom_file_reload_if_changed()
 
             if self.dros_locked:
                 self.dros_locked = False
@@ -8168,6 +8588,23 @@ class mill(TormachUIBase):
             self.error_handler.write("CPU usage was %.1f, is now %.1f" % (self.cpu_usage, usage), ALARM_LEVEL_DEBUG)
             self.cpu_usage = usage
 
+        # ... and where it went
+        self.update_periodic_profile()
+
+    def update_periodic_profile(self):
+        if self.current_notebook_page == MILL_STATUS_PAGE:
+            lines = ['%-16s %6s %6s %4s' % ('task', 'p50', 'p99', 'over')] + self.periodic_profiler.summary_lines()
+            self.widget_binding.set_markup(self.periodic_profile_label, '\n'.join(lines), '<span foreground="white">%s</span>')
+        if time.time() - self.periodic_profile_dump_time > PERIODIC_PROFILE_DUMP_INTERVAL:
+            self.dump_periodic_profile()
+
+    def dump_periodic_profile(self):
+        self.periodic_profile_dump_time = time.time()
+        try:
+            self.periodic_profiler.dump(PERIODIC_PROFILE_FILE)
+        except (IOError, OSError) as e:
+            print 'failed to write periodic profile %s: %s' % (PERIODIC_PROFILE_FILE, e)
+
 
     def update_scanner_state(self):
         if self.scanner is None:
@@ -8194,7 +8631,7 @@ class mill(TormachUIBase):
         self.clear_jog_LEDs()
         self.set_jog_LEDs()
         # store off in redis for startup in same mode next time.
-        self.redis.hset('machine_prefs', 'g21', self.g21)
+        self.prefs.set('g21', self.g21)
         if self.g21:
             self.dro_long_format = "%3.3f"
             self.jog_metric_scalar = 10
@@ -8217,16 +8654,19 @@ class mill(TormachUIBase):
     def update_probing_dros(self):
         probing_current = self.status.probing
         # probe type is set by 'find_whatever' functions, 1 = find_x_plus, 2 = X-, 3 = Y+, 4 = Y-, 5 = ?
-        self.probe_x_plus_label.set_markup('<span foreground="white">%s</span>' % self.dro_long_format % self.status.aout[11])
-        self.probe_x_minus_label.set_markup('<span foreground="white">%s</span>' % self.dro_long_format % self.status.aout[12])
-        self.probe_y_plus_label.set_markup('<span foreground="white">%s</span>' % self.dro_long_format % self.status.aout[13])
-        self.probe_y_minus_label.set_markup('<span foreground="white">%s</span>' % self.dro_long_format % self.status.aout[14])
-        self.probe_z_minus_label.set_markup('<span foreground="white">%s</span>' % self.dro_long_format % self.status.aout[15])
-        self.probe_y_plus_a_label.set_markup('<span foreground="white">%s</span>' % self.dro_long_format % self.status.aout[16])
-        self.probe_y_plus_b_label.set_markup('<span foreground="white">%s</span>' % self.dro_long_format % self.status.aout[17])
-        self.probe_y_plus_c_label.set_markup('<span foreground="white">%s</span>' % self.dro_long_format % self.status.aout[18])
+        probe_markup_format = '<span foreground="white">%s</span>' % self.dro_long_format
+        self.widget_binding.set_markup(self.probe_x_plus_label, self.status.aout[11], probe_markup_format)
+        self.widget_binding.set_markup(self.probe_x_minus_label, self.status.aout[12], probe_markup_format)
+        self.widget_binding.set_markup(self.probe_y_plus_label, self.status.aout[13], probe_markup_format)
+        self.widget_binding.set_markup(self.probe_y_minus_label, self.status.aout[14], probe_markup_format)
+        self.widget_binding.set_markup(self.probe_z_minus_label, self.status.aout[15], probe_markup_format)
+        self.widget_binding.set_markup(self.probe_y_plus_a_label, self.status.aout[16], probe_markup_format)
+        self.widget_binding.set_markup(self.probe_y_plus_b_label, self.status.aout[17], probe_markup_format)
+        self.widget_binding.set_markup(self.probe_y_plus_c_label, self.status.aout[18], probe_markup_format)
         if not self.dro_list['ets_height_dro'].masked:
-            self.dro_list['ets_height_dro'].set_text(self.dro_long_format % (self.get_linear_scale() * self.ets_height))
+            self.widget_binding.set_text(self.dro_list['ets_height_dro'], self.get_linear_scale() * self.ets_height, self.dro_long_format)
+        else:
+            self.widget_binding.invalidate(self.dro_list['ets_height_dro'])
 
     # Utility functions for position translation
     #FIXME doesn't handle axis rotation
@@ -8261,12 +8701,18 @@ class mill(TormachUIBase):
             return [x, y, z, a]
 
     def refresh_gremlin_offsets(self):
-        if self.current_g5x_offset != self.status.g5x_offset:
+        # offset changes move the drawn program with a transform, the program is not parsed again
+        # unless it sets up offsets of its own
+        if self.current_g5x_offset != self.status.g5x_offset or \
+           self.current_g92_offset != self.status.g92_offset or \
+           self.current_rotation_xy != self.status.rotation_xy:
             self.current_g5x_offset = self.status.g5x_offset
-            self.redraw_gremlin()
-        elif self.current_g92_offset != self.status.g92_offset:
             self.current_g92_offset = self.status.g92_offset
-            self.redraw_gremlin()
+            self.current_rotation_xy = self.status.rotation_xy
+            self.gremlin.set_preview_offsets(self.current_g5x_offset, self.current_g92_offset, self.current_rotation_xy)
+            if not self.gremlin.parsed_offsets_fixed:
+                self.redraw_gremlin()
+            self.recheck_preflight()
 
     def redraw_gremlin(self):
         # redraw screen with new offset
@@ -8275,9 +8721,10 @@ class mill(TormachUIBase):
         self.ensure_mode(linuxcnc.MODE_MANUAL)
         self.ensure_mode(linuxcnc.MODE_MDI)
         self.gremlin.clear_live_plotter()
-        self.gremlin.load()
-        #Note:not catching warnings here since it's assumed the user has
+        #Note:not reporting warnings here since it's assumed the user has
         #already seen them
+        if self.current_gcode_file_path:
+            self.start_preview_load(self.current_gcode_file_path, report_warnings=False)
 
 
 
@@ -8338,7 +8785,7 @@ class mill(TormachUIBase):
                     self.error_handler.write('USBIO : Board malfunction. All boards not commnicating. ')
 
             '''
-            self.redis.hset('machine_prefs', 'usbio_enabled', 'False')
+            self.prefs.set('usbio_enabled', 'False')
             self.usbio_enabled = False
             self.checkbutton_list['enable_usbio_checkbutton'].set_active(False)
             '''
@@ -8386,13 +8833,13 @@ class mill(TormachUIBase):
 
 
 
-    # called every 50 milliseconds to update faster changing indicators
+    # called every 50 milliseconds (100 idle) to update faster changing indicators
     def status_periodic_50ms(self):
         # check button events from keyboard shortcuts
         self.check_keyboard_shortcut_fifo()
 
-        # get new info
-        self.status.poll()
+        # pick up the newest snapshot from the poller thread
+        self.status.latch()
 
         # The following updates are always performed, regardless of machine state
 
@@ -8403,16 +8850,15 @@ class mill(TormachUIBase):
         dtg_scaled = [self.status.dtg[ind] * self.get_axis_scale(ind) for ind in range(4)]
 
         #For each axis in the DRO list, check if it's masked and update the position if need be
+        #Only changed values get formatted and pushed to the widgets
         for n,dro in enumerate(self.axes.dros):
             if not self.dro_list[dro].masked:
-                self.dro_list[dro].set_text(self.dro_long_format % pos_scaled[n])
+                self.widget_binding.set_text(self.dro_list[dro], pos_scaled[n], self.dro_long_format)
+            else:
+                # user is typing into it - push the position again once unmasked
+                self.widget_binding.invalidate(self.dro_list[dro])
             #Regardless, update the DTG value
-            dtg_label = self.get_obj(self.axes.dtg_labels[n])
-            dtg_label.set_text(self.dro_long_format % dtg_scaled[n] )
-
-
-        self.coolant_periodic ()
-        self.usb_IO_periodic ()
+            self.widget_binding.set_text(self.dtg_label_list[n], dtg_scaled[n], self.dro_long_format)
 
 
         # door switch status
@@ -8429,6 +8875,7 @@ class mill(TormachUIBase):
                 if self.hal['coolant']:
                     self.hal['coolant'] = False
 
+    def error_periodic(self):
         # poll for errors
         error = self.error.poll()
         if error:
@@ -8443,11 +8890,7 @@ class mill(TormachUIBase):
                 if self.atc.in_a_thread.isSet() :
                     self.atc.general_error.set()   #abort the ATC unit of work due to errors here
 
-        # the following updates are only performed if we ARE running a g code program
-        self.update_gcode_display()
-
-        self.update_jogging()
-
+    def page_leds_periodic(self):
         # the following updates are performed only if the current page requires it
         if self.current_notebook_page == OFFSETS_PAGE:
             self.update_mill_acc_input_leds()
@@ -8578,20 +9021,19 @@ class mill(TormachUIBase):
 
         # door sw LED
         if self.door_sw_enabled:
-            self.set_indicator_led('door_sw_led', self.door_sw_status)
+            self.widget_binding.set_led('door_sw_led', self.door_sw_status, self.set_indicator_led)
         else:
-            self.set_indicator_led('door_sw_led', False)
+            self.widget_binding.set_led('door_sw_led', False, self.set_indicator_led)
 
         # limit switch virtual LED updates
         for n,sw in enumerate(self.axes.home_switches):
             if self.door_sw_enabled and (n == 0):
                 # leave X axis switch off
-                self.set_indicator_led(self.axes.limit_leds[n], False)
+                self.widget_binding.set_led(self.axes.limit_leds[n], False, self.set_indicator_led)
                 continue
             # Change button state only on change of state
-            if bool(self.hal[sw]) != self.axes.at_limit_display[n]:
-                self.axes.at_limit_display[n] = self.hal[sw]
-                self.set_indicator_led(self.axes.limit_leds[n],self.hal[sw])
+            self.axes.at_limit_display[n] = bool(self.hal[sw])
+            self.widget_binding.set_led(self.axes.limit_leds[n], self.axes.at_limit_display[n], self.set_indicator_led)
 
 
     def on_entry_loses_focus(self, widget, data=None):
@@ -8696,19 +9138,31 @@ class mill(TormachUIBase):
 
 
     def refresh_tool_liststore(self, force=False):
-        linear_scale = self.get_linear_scale()
+        # force also re-reads the descriptions from redis
+        if force or self.tool_descriptions is None:
+            try:
+                self.tool_descriptions = self.redis.hgetall('tool_descriptions')
+            except:
+                self.tool_descriptions = {}
 
-        self.tool_liststore.clear()
+        linear_scale = self.get_linear_scale()
+        tool_table = self.status.tool_table
         max_tools = MAX_NUM_MILL_TOOL_NUM
+        if len(self.tool_liststore) != max_tools:
+            self.tool_liststore.clear()
+            for pocket in range(1, max_tools + 1):
+                self.tool_liststore.append([0, '', '', ''])
+
+        # rewrite only the cells that changed so the treeview keeps its scroll position
         for pocket in range(1, max_tools + 1):
-            tool_num = self.status.tool_table[pocket].id
-            try:
-                description = self.redis.hget('tool_descriptions', str(tool_num))
-            except:
-                description = "None"
-            diameter = self.dro_long_format % (self.status.tool_table[pocket].diameter * linear_scale)
-            length = self.dro_long_format % (self.status.tool_table[pocket].zoffset * linear_scale)
-            self.tool_liststore.append([tool_num, description, diameter, length])
+            tool_num = tool_table[pocket].id
+            description = self.tool_descriptions.get(str(tool_num), '')
+            diameter = self.dro_long_format % (tool_table[pocket].diameter * linear_scale)
+            length = self.dro_long_format % (tool_table[pocket].zoffset * linear_scale)
+            row = self.tool_liststore[pocket - 1]
+            for column, value in enumerate((tool_num, description, diameter, length)):
+                if row[column] != value:
+                    row[column] = value
 
 
     def g5x_offset_gcode_from_ix(self,offset_ix):
@@ -8716,32 +9170,34 @@ class mill(TormachUIBase):
             else ("G59.%d" % (offset_ix -5))
 
     def refresh_work_offset_liststore(self):
-        # Init:  save current offset index; MDI mode; clear offset table
-        self.status.poll()
+        # Inactive offsets come from the var file, the active one from status so a
+        # fresh probe result shows up before the interp writes the var file out.
+        # What status showed for an offset, and edits made here, stay pending over the
+        # var file until it is written.  Never switches the active WCS and never waits on MDI.
+        self.status.latch()
         current_offset_ix = self.status.g5x_index - 1
-        self.command.mode(linuxcnc.MODE_MDI)
-        self.work_liststore.clear()
-        # Switch to each work offset G54-G59.3 and read offsets
-        for offset_ix in range(9):
-            offset_gcode = self.g5x_offset_gcode_from_ix(offset_ix)
-            self.command.mdi(offset_gcode)
-            self.command.wait_complete()
-            self.status.poll()
-            self.work_liststore.append(
-                [offset_gcode] +
-                ['%.4f' % (i * self.get_linear_scale())
-                 for i in self.status.g5x_offset[:4]] +
-
-                ['GREY', 'WHITE'])
-        # Restore current offset index
-        self.command.mdi(self.g5x_offset_gcode_from_ix(current_offset_ix))
-        self.command.wait_complete()
-        # highlight active work offset
-        row = self.work_liststore[current_offset_ix]
-        row[5] = BLACK
-        row[6] = ROW_HIGHLIGHT
-
-
+        if 0 <= current_offset_ix < work_offsets.G5X_COUNT:
+            for axis, value in enumerate(self.status.g5x_offset[:work_offsets.G5X_AXES]):
+                self.work_offset_reader.set_pending(current_offset_ix, axis, value)
+        offsets = self.work_offset_reader.read()
+
+        if len(self.work_liststore) != len(offsets):
+            self.work_liststore.clear()
+            for offset_ix in range(len(offsets)):
+                self.work_liststore.append([self.g5x_offset_gcode_from_ix(offset_ix), '', '', '', '', 'GREY', 'WHITE'])
+
+        # only touch the cells that changed
+        for offset_ix, offset in enumerate(offsets):
+            row = self.work_liststore[offset_ix]
+            values = ['%.4f' % (i * self.get_linear_scale()) for i in offset]
+            # highlight active work offset
+            if offset_ix == current_offset_ix:
+                values += [BLACK, ROW_HIGHLIGHT]
+            else:
+                values += ['GREY', 'WHITE']
+            for col, value in enumerate(values, 1):
+                if row[col] != value:
+                    row[col] = value
 
 
     def load_cs_image(self, color):
@@ -8860,8 +9316,24 @@ def beep():
         pass
 
 
+# program display lists that get moved when the work offsets change
+PREVIEW_PROGRAM_DLISTS = ('program_rapid', 'program_norapid', 'select_rapid', 'select_norapid')
+
+# drawn from a reduced detail copy when zoomed out; the selection lists keep every line
+PREVIEW_LOD_DLISTS = ('program_rapid', 'program_norapid')
+
 class Tormach_Mill_Gremlin(gremlin.Gremlin):
     def __init__(self, ui, width, height):
+        # offsets the loaded program was parsed under, and the current ones
+        self.parsed_offsets = None
+        # False when the program selects its own coordinate system or changes offsets, it is
+        # then parsed again on an offset change instead of being moved
+        self.parsed_offsets_fixed = True
+        self.preview_offsets = None
+        # reduced detail copies of the loaded tool path, finest first
+        self.lod_levels = []
+        # view -> what that view's grid list was drawn for
+        self.grid_keys = {}
         gremlin.Gremlin.__init__(self, ui.inifile)
         self.status = ui.status
         self.ui_view = 'p'
@@ -8874,11 +9346,39 @@ class Tormach_Mill_Gremlin(gremlin.Gremlin):
 
     def realize(self,widget):
         super(Tormach_Mill_Gremlin, self).realize(widget)
+        # the positionlogger keeps every point for the whole run, plot into a bounded live plot instead
+        logger = getattr(self, 'logger', None)
+        if logger is not None and not isinstance(logger, live_plot.live_plot):
+            logger.stop()
+            self.logger = live_plot.live_plot(self.colors)
+            if hasattr(self, 'lp'):
+                self.lp = self.logger
+            self.logger.start()
 
     def set_grid_size(self, size):
         self.grid_size = size
         self._redraw()
 
+    def draw_grid(self):
+        # gremlin works the grid lines out again on every redraw; they only change with the
+        # grid size, the limits, the work and G92 offsets and the relative display, so each
+        # view keeps its grid in a list and switching views or redrawing just calls it
+        view = self.get_view()
+        stat = self.stat
+        key = (self.get_grid_size(), tuple(stat.g5x_offset[:3]), tuple(stat.g92_offset[:3]), stat.rotation_xy,
+               self.get_show_relative(),
+               tuple((axis['min_position_limit'], axis['max_position_limit']) for axis in stat.axis[:3]))
+        name = 'grid_%d' % view
+        if self.grid_keys.get(view) != key:
+            self.grid_keys[view] = key
+            gremlin.Gremlin.stale_dlist(self, name)
+        minigl.glCallList(gremlin.Gremlin.dlist(self, name, 1, self.make_grid_list))
+
+    def make_grid_list(self, l):
+        minigl.glNewList(l, minigl.GL_COMPILE)
+        gremlin.Gremlin.draw_grid(self)
+        minigl.glEndList()
+
     # necessary to support recent changes to gremlin in 2.6.  We might want to make this configurable
     # down the road, but for now it's set to a grid of .1 inches.  The grid doesn't display for me
     # but at least the ui will load without error again.
@@ -8908,6 +9408,159 @@ class Tormach_Mill_Gremlin(gremlin.Gremlin):
         self.ui.error_handler.write(error_str)
         self.ui.interp_alarm = True
 
+    def make_preview_job(self, filename):
+        # the parse setup gremlin.load() does, for a parse in the preview worker process
+        self.stat.poll()
+        job = preview_loader.preview_job(filename)
+        job.colors = self.colors
+        job.geometry = self.get_geometry()
+        job.lathe_option = self.lathe_option
+        job.stat = self.stat
+        job.random = int(self.inifile.find("EMCIO", "RANDOM_TOOLCHANGER") or 0)
+        job.parameter_file = self.inifile.find("RS274NGC", "PARAMETER_FILE")
+        job.unitcode = "G%d" % (20 + (self.stat.linear_units == 1))
+        job.initcode = self.inifile.find("RS274NGC", "RS274NGC_STARTUP_CODE") or ""
+        # the interpreter looks in the program prefix first, then each subroutine path directory
+        dirs = [self.inifile.find("DISPLAY", "PROGRAM_PREFIX") or ""]
+        dirs.extend((self.inifile.find("RS274NGC", "SUBROUTINE_PATH") or "").split(':'))
+        job.subroutine_dirs = [os.path.abspath(os.path.expanduser(d)) for d in dirs if d]
+        return job
+
+    def load_parsed(self, parsed):
+        # the end of gremlin.load() for geometry parsed by the preview worker
+        import gcode
+        random = int(self.inifile.find("EMCIO", "RANDOM_TOOLCHANGER") or 0)
+        canon = gremlin.StatCanon(self.colors, self.get_geometry(), self.lathe_option, self.stat, random)
+        for name, segments in parsed.segments.iteritems():
+            setattr(canon, name, segments)
+        self._current_file = parsed.filename
+        self.parsed_offsets = parsed.offsets
+        self.parsed_offsets_fixed = parsed.offsets_fixed
+        # the reduced copies of this program come later, see set_lod_levels
+        self.lod_levels = []
+        self.set_canon(canon)
+        if parsed.result > gcode.MIN_ERROR:
+            self.report_gcode_error(parsed.result, parsed.seq, parsed.filename)
+        else:
+            canon.calc_extents()
+            self.stale_dlist('program_rapid')
+            self.stale_dlist('program_norapid')
+            self.stale_dlist('select_rapid')
+            self.stale_dlist('select_norapid')
+        self.set_current_view()
+
+    def set_lod_levels(self, parsed):
+        if parsed.filename != self._current_file:
+            return
+        for name in PREVIEW_LOD_DLISTS:
+            self.stale_lod_dlists(name)
+        self.lod_levels = parsed.lods
+        self._redraw()
+
+    def lod_level(self):
+        # index of the coarsest copy whose tolerance is below the size of a pixel, None for full detail
+        if not self.lod_levels:
+            return None
+        distance = getattr(self, 'distance', None)
+        height = self.allocation.height
+        if not distance or height <= 1:
+            return None
+        fovy = getattr(self, 'fovy', 30.0)
+        pixel = 2.0 * distance * math.tan(math.radians(fovy) / 2.0) / height
+        level = None
+        for ix, (tolerance, reduced) in enumerate(self.lod_levels):
+            if tolerance <= pixel:
+                level = ix
+        return level
+
+    def make_lod_list(self, l, gen, reduced):
+        # compile the list with the canon holding the reduced segments
+        canon = self.canon
+        saved = dict((name, getattr(canon, name)) for name in reduced)
+        try:
+            for name, segments in reduced.iteritems():
+                setattr(canon, name, segments)
+            gen(l)
+        finally:
+            for name, segments in saved.iteritems():
+                setattr(canon, name, segments)
+
+    def stale_lod_dlists(self, name):
+        # every level there may be lists for, not just the current program's
+        for ix in range(len(toolpath_lod.LEVELS)):
+            lod_name = '%s_lod%d' % (name, ix)
+            gremlin.Gremlin.stale_dlist(self, lod_name)
+            gremlin.Gremlin.stale_dlist(self, lod_name + '_moved')
+
+    def set_preview_offsets(self, g5x_offset, g92_offset, rotation_xy):
+        # current offsets in machine units, from status
+        offsets = (tuple(g5x_offset[:3]), tuple(g92_offset[:3]), rotation_xy)
+        if offsets == self.preview_offsets:
+            return
+        self.preview_offsets = offsets
+        for name in PREVIEW_PROGRAM_DLISTS:
+            gremlin.Gremlin.stale_dlist(self, name + '_moved')
+        for name in PREVIEW_LOD_DLISTS:
+            for ix in range(len(toolpath_lod.LEVELS)):
+                gremlin.Gremlin.stale_dlist(self, '%s_lod%d_moved' % (name, ix))
+        self._redraw()
+
+    def preview_transform(self):
+        # (translate before, z rotation in degrees, translate after) taking the geometry from the
+        # offsets it was parsed under to the current ones, in internal units; None if it has not moved
+        if self.parsed_offsets is None or self.preview_offsets is None or \
+           work_offsets.same_offsets(self.parsed_offsets, self.preview_offsets):
+            return None
+        if not self.parsed_offsets_fixed:
+            # drawn as parsed until the parse under the new offsets comes in
+            return None
+        (g5x_0, g92_0, rot_0) = self.parsed_offsets
+        (g5x_1, g92_1, rot_1) = self.preview_offsets
+        # machine = rotate(program + g92) + g5x, so the new position of a drawn point p is
+        # rotate(rot_1 - rot_0, p - g5x_0) + g5x_1 + rotate(rot_1, g92_1 - g92_0)
+        theta = math.radians(rot_1)
+        dx, dy, dz = [g92_1[i] - g92_0[i] for i in range(3)]
+        after = (g5x_1[0] + dx * math.cos(theta) - dy * math.sin(theta),
+                 g5x_1[1] + dx * math.sin(theta) + dy * math.cos(theta),
+                 g5x_1[2] + dz)
+        before = [-v for v in g5x_0]
+        return self.to_internal_units(before)[:3], rot_1 - rot_0, self.to_internal_units(after)[:3]
+
+    def dlist(self, name, n=1, gen=lambda n: None):
+        # the program lists stay in the coordinates they were parsed in; when the offsets
+        # have changed since, hand out a small list that calls them under a transform
+        if name not in PREVIEW_PROGRAM_DLISTS:
+            return gremlin.Gremlin.dlist(self, name, n, gen)
+        level = self.lod_level() if name in PREVIEW_LOD_DLISTS else None
+        if level is None:
+            inner = gremlin.Gremlin.dlist(self, name, n, gen)
+        else:
+            reduced = self.lod_levels[level][1]
+            name = '%s_lod%d' % (name, level)
+            inner = gremlin.Gremlin.dlist(self, name, n, lambda l: self.make_lod_list(l, gen, reduced))
+        transform = self.preview_transform()
+        if transform is None:
+            return inner
+        return gremlin.Gremlin.dlist(self, name + '_moved', 1, lambda l: self.make_moved_list(l, inner, transform))
+
+    def make_moved_list(self, l, inner, transform):
+        before, rotation, after = transform
+        minigl.glNewList(l, minigl.GL_COMPILE)
+        minigl.glPushMatrix()
+        minigl.glTranslatef(*after)
+        minigl.glRotatef(rotation, 0, 0, 1)
+        minigl.glTranslatef(*before)
+        minigl.glCallList(inner)
+        minigl.glPopMatrix()
+        minigl.glEndList()
+
+    def stale_dlist(self, name):
+        gremlin.Gremlin.stale_dlist(self, name)
+        if name in PREVIEW_PROGRAM_DLISTS:
+            gremlin.Gremlin.stale_dlist(self, name + '_moved')
+        if name in PREVIEW_LOD_DLISTS:
+            self.stale_lod_dlists(name)
+
     def report_gcode_warnings(self, warnings, filename, suppress_after = 3):
         """ Show the warnings from a loaded G code file.
         Accepts a list of warnings produced by the load_preview function, the
@@ -8999,7 +9652,7 @@ class Tormach_Mill_Gremlin(gremlin.Gremlin):
                 set_grid_size_large.show()
 
             try:
-                if self.ui.redis.hget('machine_prefs', 'enable_fourth_axis_toolpath') == 'True':
+                if self.ui.prefs.get('enable_fourth_axis_toolpath') == 'True':
                     disable_fourth_display.show()
                 else:
                     enable_fourth_display.show()
@@ -9056,11 +9709,11 @@ class Tormach_Mill_Gremlin(gremlin.Gremlin):
         self.set_grid_size(0.0)
 
     def enable_fourth_axis_toolpath_display(self, widget):
-        self.ui.redis.hset('machine_prefs', 'enable_fourth_axis_toolpath', 'True')
+        self.ui.prefs.set('enable_fourth_axis_toolpath', 'True')
         self.set_geometry('AXYZ')
 
     def disable_fourth_axis_toolpath_display(self, widget):
-        self.ui.redis.hset('machine_prefs', 'enable_fourth_axis_toolpath', 'False')
+        self.ui.prefs.set('enable_fourth_axis_toolpath', 'False')
         self.set_geometry('XYZ')
 
 
@@ -9108,6 +9761,8 @@ if __name__ == "__main__":
     # unbuffer stdout so print() shows up in sync with other output
     # the pipe from the redirect in operator_login causes buffering
     sys.stdout = os.fdopen(sys.stdout.fileno(), 'w', 0)
+    # the status poller thread must run while gtk.main() waits
+    gobject.threads_init()
     UI = mill()
     screen_width = gtk.gdk.Screen().get_width()
     screen_height = gtk.gdk.Screen().get_height()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Change-detection layer for the periodic status updates
+#
+# Remembers what was last pushed to each DRO, label and LED so the periodic
+# loops can skip widgets whose value has not changed.  Values are only run
+# through their format string when the raw value (or the format) changed,
+# and set_text/set_markup is only called when the resulting text differs.
+#
+
+
+class widget_binding:
+    def __init__(self):
+        # widget (or LED name) -> (raw value, format, text pushed to widget)
+        self.last = {}
+
+    def _update(self, key, value, fmt):
+        # returns the new text, or None if the widget is already showing it
+        last = self.last.get(key)
+        if last is not None and last[0] == value and last[1] == fmt:
+            return None
+        text = fmt % value
+        self.last[key] = (value, fmt, text)
+        if last is not None and last[2] == text:
+            return None
+        return text
+
+    def set_text(self, widget, value, fmt='%s'):
+        text = self._update(widget, value, fmt)
+        if text is None:
+            return False
+        widget.set_text(text)
+        return True
+
+    def set_markup(self, widget, value, fmt='%s'):
+        text = self._update(widget, value, fmt)
+        if text is None:
+            return False
+        widget.set_markup(text)
+        return True
+
+    def set_led(self, led_name, state, set_indicator_led):
+        state = bool(state)
+        last = self.last.get(led_name)
+        if last is not None and last[0] == state:
+            return False
+        self.last[led_name] = (state, None, None)
+        set_indicator_led(led_name, state)
+        return True
+
+    def invalidate(self, key=None):
+        # forget what a widget shows, e.g. after the user typed into a DRO;
+        # with no key everything is pushed again on the next update
+        if key is None:
+            self.last.clear()
+        else:
+            self.last.pop(key, None)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python2
+# coding: latin-1
+#
+# Work offset access for the offsets page
+#
+# Reads the G54..G59.3 offsets straight out of the interpreter parameter
+# (var) file instead of switching into every coordinate system with MDI.
+# Also used by the preview worker to find the offsets a parse ran under.
+#
+# The interpreter only writes the var file on a synch or mode switch, so
+# values set through it (G10 L2 from the offsets page, or a probe result
+# seen in status while that offset was active) are kept as pending and
+# shown over the var file until the var file's value changes.
+#
+
+import os
+import mmap
+
+
+# interpreter parameter numbers - same ones the probe_corner*.ngc subs read
+G5X_PARAM_FIRST = 5221      # G54 X
+G5X_PARAM_LAST = 5389       # G59.3 R
+G5X_PARAM_STRIDE = 20       # G54 X -> G55 X
+G5X_COUNT = 9               # G54, G55, G56, G57, G58, G59, G59.1, G59.2, G59.3
+G5X_AXES = 4                # X Y Z A
+G5X_ROTATION = 9            # R, G54 R is 5230
+G5X_ACTIVE_PARAM = 5220     # 1 = G54 .. 9 = G59.3
+G92_ENABLED_PARAM = 5210
+G92_PARAM_FIRST = 5211      # G92 X, through 5219 G92 W
+G92_PARAM_LAST = 5219
+
+# the var file keeps 6 decimals, offsets closer than this are the same
+OFFSET_TOLERANCE = 1e-5
+
+
+def parse_var_file(var_filename, first=0, last=None):
+    # returns {number: value} for the parameters in [first, last], None if unreadable
+    # var file lines are '<number><whitespace><value>', sorted by number
+    params = {}
+    try:
+        with open(var_filename, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                line = mm.readline()
+                while line:
+                    fields = line.split()
+                    if len(fields) >= 2:
+                        try:
+                            number = int(fields[0])
+                        except ValueError:
+                            number = 0
+                        if last is not None and number > last:
+                            break
+                        if number >= first:
+                            params[number] = float(fields[1])
+                    line = mm.readline()
+            finally:
+                mm.close()
+    except (IOError, OSError, ValueError):
+        return None
+    return params
+
+
+def active_offset_params(params):
+    # the parameter numbers holding the active G5x offset and G92
+    active = int(params.get(G5X_ACTIVE_PARAM, 1))
+    first = G5X_PARAM_FIRST + (active - 1) * G5X_PARAM_STRIDE
+    numbers = set(range(first, first + G5X_ROTATION + 1))
+    numbers.update(range(G92_ENABLED_PARAM, G92_PARAM_LAST + 1))
+    numbers.add(G5X_ACTIVE_PARAM)
+    return numbers
+
+
+def active_offsets(params):
+    # (g5x xyz, g92 xyz, xy rotation in degrees) of the active coordinate system
+    active = int(params.get(G5X_ACTIVE_PARAM, 1))
+    first = G5X_PARAM_FIRST + (active - 1) * G5X_PARAM_STRIDE
+    g5x = tuple(params.get(first + axis, 0.0) for axis in range(3))
+    if params.get(G92_ENABLED_PARAM, 1.0):
+        g92 = tuple(params.get(G92_PARAM_FIRST + axis, 0.0) for axis in range(3))
+    else:
+        g92 = (0.0, 0.0, 0.0)
+    return g5x, g92, params.get(first + G5X_ROTATION, 0.0)
+
+
+def same_offsets(a, b):
+    # two (g5x xyz, g92 xyz, xy rotation) tuples, equal to the precision of the var file
+    (g5x_a, g92_a, rot_a), (g5x_b, g92_b, rot_b) = a, b
+    pairs = zip(g5x_a, g5x_b) + zip(g92_a, g92_b) + [(rot_a, rot_b)]
+    return all(abs(x - y) <= OFFSET_TOLERANCE for x, y in pairs)
+
+
+def find_var_file(inifile, ini_file_name):
+    # PARAMETER_FILE is relative to the directory holding the .ini
+    var_file = inifile.find("RS274NGC", "PARAMETER_FILE") or "linuxcnc.var"
+    if not os.path.isabs(var_file):
+        var_file = os.path.join(os.path.dirname(os.path.abspath(ini_file_name)), var_file)
+    return var_file
+
+
+class work_offset_reader:
+    def __init__(self, var_filename):
+        self.var_filename = var_filename
+        self.file_signature = None
+        self.offsets = [(0.0,) * G5X_AXES for i in range(G5X_COUNT)]
+        # (offset_ix, axis) -> (var file value when it was set, value set)
+        self.pending = {}
+
+    def set_pending(self, offset_ix, axis, value):
+        # a value the interpreter holds that the var file may not have yet
+        var_value = self._read_file()[offset_ix][axis]
+        if abs(value - var_value) <= OFFSET_TOLERANCE:
+            self.pending.pop((offset_ix, axis), None)
+        else:
+            self.pending[(offset_ix, axis)] = (var_value, value)
+
+    def read(self):
+        """Return a list of nine (x, y, z, a) tuples in machine units, G54 first,
+        with pending values in place of the var file's until it changes.
+        """
+        offsets = self._read_file()
+        for (offset_ix, axis), (var_value, value) in self.pending.items():
+            offset = offsets[offset_ix]
+            if abs(offset[axis] - var_value) > OFFSET_TOLERANCE:
+                # written out, or changed since by something else
+                del self.pending[(offset_ix, axis)]
+            else:
+                offsets[offset_ix] = offset[:axis] + (value,) + offset[axis + 1:]
+        return offsets
+
+    def _read_file(self):
+        # the var file is only parsed again when its mtime or size has changed
+        try:
+            st = os.stat(self.var_filename)
+        except OSError:
+            return list(self.offsets)
+
+        signature = (st.st_mtime, st.st_size)
+        if signature != self.file_signature:
+            params = parse_var_file(self.var_filename, G5X_PARAM_FIRST, G5X_PARAM_LAST)
+            if params is not None:
+                self.file_signature = signature
+                self.offsets = [self._offset_from_params(params, offset_ix) for offset_ix in range(G5X_COUNT)]
+        return list(self.offsets)
+
+    def _offset_from_params(self, params, offset_ix):
+        first = G5X_PARAM_FIRST + offset_ix * G5X_PARAM_STRIDE
+        return tuple(params.get(first + axis, 0.0) for axis in range(G5X_AXES))